@@ -1,6 +1,7 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, make_response, current_app
+from quart import Quart, render_template, request, jsonify, redirect, url_for, session, make_response, current_app
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
-import requests
+from urllib.parse import quote
+import asyncio
 import json
 import logging
 import hashlib
@@ -16,8 +17,14 @@ load_dotenv()
 
 # Импорт модуля аутентификации
 from auth import DiscordAuth, require_auth, require_guild_member, can_submit_application
+from status_store import get_status_store, get_status_writer
+from permission_cache import get_permission_cache
+from session_store import create_session_interface
+from user_events import get_user_event_hub, format_sse, SSE_HEARTBEAT_INTERVAL, SSE_RETRY_MS
+from outbox import get_outbox, OutboxWorker, JOB_DONE, JOB_FAILED
+from bot_rpc import BotRPCClient
 
-app = Flask(__name__)
+app = Quart(__name__)
 
 logging.getLogger("asyncio").setLevel(logging.ERROR)
 
@@ -65,6 +72,108 @@ if not is_testing:
 else:
     print("🧪 Тестовое окружение: пропускаем проверку переменных окружения")
 
+# Серверные сессии: в cookie только ID сессии, данные - в хранилище
+# SESSION_BACKEND=memory - LRU в памяти (разработка), sqlite - база data/sessions.db
+app.session_interface = create_session_interface(
+    os.environ.get('SESSION_BACKEND', 'memory' if is_testing else 'sqlite'),
+    os.environ.get('SESSION_DB')
+)
+
+@app.before_serving
+async def start_session_sweeper():
+    """Запускает фоновое удаление истекших сессий"""
+    app.session_interface.start_sweeper()
+
+def publish_application_status_event(event, discord_id, record):
+    """Передает изменения статусов заявок в открытые вкладки пользователя"""
+    if event == 'set':
+        data = {'status': record['status'], 'reason': record.get('reason', '')}
+    else:
+        data = {'status': None, 'reason': ''}
+    get_user_event_hub().publish(discord_id, 'application_status', data)
+    # Вкладки пользователя могут быть подключены к другим воркерам сайта
+    if isinstance(getattr(app, 'bot', None), BotRPCClient):
+        app.bot.publish('application_status', discord_id, data)
+
+def apply_member_permissions(user_id, permissions):
+    """
+    Обновляет кэш прав и открытые вкладки участника, как только бот видит
+    изменение его ролей.
+    
+    Args:
+        user_id: Discord ID участника
+        permissions: Новые права (is_admin, is_minebuild_member) или None,
+            если участник покинул сервер
+    """
+    if permissions is None:
+        get_permission_cache().invalidate(user_id)
+        permissions = {'is_admin': False, 'is_minebuild_member': False}
+    else:
+        permissions = get_permission_cache().set(
+            user_id, permissions['is_admin'], permissions['is_minebuild_member']
+        )
+    get_user_event_hub().publish(user_id, 'permissions', permissions)
+
+def apply_bot_event(event, user_id, data):
+    """Применяет событие, которое бот разослал воркерам сайта"""
+    if event == 'permissions':
+        apply_member_permissions(user_id, data)
+    elif event == 'application_status':
+        get_user_event_hub().publish(user_id, 'application_status', data)
+
+@app.before_serving
+async def subscribe_user_events():
+    """Подписывает рассылку событий сайта на изменения статусов заявок"""
+    get_status_store().add_listener(publish_application_status_event)
+
+def bot_is_ready():
+    """Подключен ли бот к Discord (задачи очереди ждут подключения)"""
+    return getattr(app, 'bot', None) is not None and app.bot.is_ready()
+
+@app.before_serving
+async def connect_bot_rpc():
+    """Если бот работает в отдельном процессе (BOT_RPC_SOCKET), подключается к нему"""
+    rpc_socket = os.getenv('BOT_RPC_SOCKET')
+    if getattr(app, 'bot', None) is not None or not rpc_socket:
+        return
+    app.bot = BotRPCClient(rpc_socket, on_event=apply_bot_event)
+    await app.bot.start()
+    get_status_store().add_listener(forward_expired_status_to_bot)
+
+@app.after_serving
+async def disconnect_bot_rpc():
+    """Закрывает соединение с процессом бота"""
+    if isinstance(getattr(app, 'bot', None), BotRPCClient):
+        await app.bot.close()
+
+def forward_expired_status_to_bot(event, discord_id, record):
+    """Передает истечение статусов заявок из фонового потока хранилища в процесс бота"""
+    if event == 'expired' and app.bot.is_ready():
+        asyncio.run_coroutine_threadsafe(
+            app.bot.handle_application_expired(discord_id, record['status']), app.bot.loop
+        )
+
+@app.before_serving
+async def start_outbox_worker():
+    """
+    Запускает фоновую отправку задач очереди через бота.
+
+    Обработчик есть в каждом воркере сайта; задачи выдаются им в аренду,
+    поэтому одну задачу одновременно выполняет только один воркер.
+    """
+    app.outbox_worker = OutboxWorker(
+        get_outbox(),
+        {'application': deliver_application, 'donation': fulfill_donation},
+        is_ready=bot_is_ready,
+        on_failed=on_outbox_job_failed
+    )
+    app.outbox_worker.start()
+
+@app.after_serving
+async def stop_outbox_worker():
+    """Останавливает обработчик очереди; незавершенные задачи выполнятся после запуска"""
+    await app.outbox_worker.stop()
+
 # Инициализация Discord Auth
 discord_auth = DiscordAuth()
 discord_auth.init_app(app)
@@ -75,26 +184,30 @@ app.discord_auth = discord_auth
 # Чтобы открыть прием заявок - установите значение True
 APPLICATIONS_OPEN = False
 
+# Сколько секунд ждать надежной записи изменения статуса заявки
+STATUS_WRITE_TIMEOUT = 10.0
+
+# Сколько секунд ждать отправки заявки ботом (включая проверку прошлых попыток);
+# прерванную задачу очередь повторит, а бот не отправит заявку второй раз
+APPLICATION_DELIVERY_TIMEOUT = 60.0
+
 # Настройка логгера
-# Создаем форматтер для логов
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Запись в файл (с ротацией) и консоль выполняется фоновым потоком через очередь
+from bot.config import create_file_handler, add_root_log_handlers, set_log_sampling
 
 # Создаем хэндлер для файла
-file_handler = logging.FileHandler('main.log')
+file_handler = create_file_handler('main.log')
 file_handler.setLevel(logging.DEBUG)
-file_handler.setFormatter(formatter)
-
-# Создаем хэндлер для консоли
-console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setLevel(logging.INFO)  # INFO для консоли чтобы не было слишком много вывода
-console_handler.setFormatter(formatter)
 
-# Настраиваем корневой логгер
+# Настраиваем корневой логгер: общий конвейер с консолью (INFO) и main.log
 root_logger = logging.getLogger()
 root_logger.setLevel(logging.DEBUG)  # Общий уровень - DEBUG
-root_logger.handlers = []  # Очищаем существующие хэндлеры
-root_logger.addHandler(file_handler)
-root_logger.addHandler(console_handler)
+add_root_log_handlers([file_handler])
+
+# Однотипные сообщения горячих путей - не чаще LOG_SAMPLE_LIMIT в секунду на шаблон
+LOG_SAMPLE_LIMIT = int(os.environ.get('LOG_SAMPLE_LIMIT', 20))
+for sampled_logger in ('auth', __name__):
+    set_log_sampling(sampled_logger, LOG_SAMPLE_LIMIT)
 
 # Получаем логгер для приложения
 logger = logging.getLogger(__name__)
@@ -130,50 +243,50 @@ FAIL_URL = "https://minebuild.fun/donation-fail"        # URL для редир
 
 # Главные страницы
 @app.route('/')
-def index():
-    return render_template('index.html')
+async def index():
+    return await render_template('index.html')
 
 @app.route('/about')
-def about():
-    return render_template('about.html')
+async def about():
+    return await render_template('about.html')
 
 @app.route('/rules')
-def rules():
-    return render_template('rules.html')
+async def rules():
+    return await render_template('rules.html')
 
 @app.route('/build')
-def build():
-    return render_template('build.html')
+async def build():
+    return await render_template('build.html')
 
 @app.route('/apply')
 @require_auth
 @require_guild_member
 @can_submit_application
-def apply():
+async def apply():
     """Страница подачи заявки (требует авторизации)"""
     current_user = discord_auth.get_current_user()
-    return render_template('apply.html', 
+    return await render_template('apply.html', 
                          applications_open=APPLICATIONS_OPEN,
                          current_user=current_user)
 
 @app.route('/donate')
-def donate():
-    return render_template('donate.html')
+async def donate():
+    return await render_template('donate.html')
 
 # API для обработки платежей
 @app.route('/api/create-payment', methods=['POST'])
-def create_payment():
+async def create_payment():
     try:
         # Логируем данные запроса для отладки
-        logger.info(f"Получен запрос на создание платежа")
+        logger.info("Получен запрос на создание платежа")
         
         # Проверяем, есть ли данные запроса
         if not request.is_json:
             logger.error("Запрос не содержит JSON данных")
             return jsonify({'success': False, 'error': 'Ожидаются данные в формате JSON'}), 400
             
-        data = request.json
-        logger.debug(f"Получены данные из формы: {data}")
+        data = await request.get_json()
+        logger.debug("Получены данные из формы: %s", data)
         
         # Валидация данных
         if not data or 'amount' not in data or 'comment' not in data:
@@ -217,12 +330,12 @@ def create_payment():
         quickpay_url = "https://yoomoney.ru/quickpay/confirm.xml"
         
         # Создаем параметры URL
-        query_string = "&".join([f"{k}={requests.utils.quote(str(v))}" for k, v in quickpay_form.items()])
+        query_string = "&".join([f"{k}={quote(str(v))}" for k, v in quickpay_form.items()])
         redirect_url = f"{quickpay_url}?{query_string}"
         
         # В реальном приложении здесь можно сохранить информацию о платеже в базу данных
-        logger.info(f"Создан платеж: ID={payment_id}, Игрок={nickname}, Сумма={amount}, Токен создан")
-        logger.debug(f"Redirect URL: {redirect_url}")
+        logger.info("Создан платеж: ID=%s, Игрок=%s, Сумма=%s, Токен создан", payment_id, nickname, amount)
+        logger.debug("Redirect URL: %s", redirect_url)
         
         # Возвращаем данные для формирования URL на фронтенде
         return jsonify({
@@ -238,12 +351,12 @@ def create_payment():
 
 # API для проверки статуса платежа
 @app.route('/api/check-payment/<payment_id>', methods=['GET'])
-def check_payment(payment_id):
+async def check_payment(payment_id):
     # В текущей реализации с формой ЮMoney мы не можем проверять статус программно
     # Для этого нужно настраивать уведомления от ЮMoney
     # Возвращаем статус pending, чтобы пользователь перешел на сайт оплаты
     
-    logger.info(f"Запрос на проверку статуса платежа: {payment_id}")
+    logger.info("Запрос на проверку статуса платежа: %s", payment_id)
     return jsonify({
         'success': True,
         'status': 'pending',
@@ -252,7 +365,7 @@ def check_payment(payment_id):
 
 # Страницы успешного платежа и ошибки
 @app.route('/donation-success')
-def donation_success():
+async def donation_success():
     try:
         # Проверяем токен безопасности (если он есть)
         token = request.args.get('token')
@@ -269,7 +382,7 @@ def donation_success():
                 nickname = token_data.get('nickname')
                 amount = token_data.get('amount')
                 payment_id = token_data.get('payment_id')
-                logger.info(f"Успешная верификация токена доната: игрок={nickname}, сумма={amount}, ID={payment_id}")
+                logger.info("Успешная верификация токена доната: игрок=%s, сумма=%s, ID=%s", nickname, amount, payment_id)
             else:
                 logger.warning(f"Получен недействительный токен доната: {token}")
         
@@ -279,7 +392,7 @@ def donation_success():
             label = request.args.get('label', '')
             amount = request.args.get('sum', 0)
             nickname = request.args.get('comment', '')
-            logger.info(f"Использование параметров из URL (без токена): label={label}, сумма={amount}, игрок={nickname}")
+            logger.info("Использование параметров из URL (без токена): label=%s, сумма=%s, игрок=%s", label, amount, nickname)
             
             # Проверяем наличие данных в параметрах
             if not amount or float(amount) <= 0:
@@ -292,7 +405,7 @@ def donation_success():
         is_ajax_request = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
         
         # Логируем информацию о платеже
-        logger.info(f"Обработка страницы успешного платежа: игрок={nickname}, сумма={amount}, токен={is_token_valid}")
+        logger.info("Обработка страницы успешного платежа: игрок=%s, сумма=%s, токен=%s", nickname, amount, is_token_valid)
         
         # Проверка на уже обработанный донат
         donation_processed = request.args.get('processed', 'false') == 'true'
@@ -304,9 +417,9 @@ def donation_success():
         # 4. И это не AJAX-запрос для восстановления данных
         if not is_ajax_request and not donation_processed and nickname and float(amount) > 0:
             if is_token_valid:
-                # Если токен действителен - обрабатываем донат
-                process_donation_in_discord(nickname, float(amount))
-                logger.info(f"Обработан донат через токен: игрок={nickname}, сумма={amount}")
+                # Если токен действителен - ставим донат в очередь (повторно тот же платеж не обрабатывается)
+                enqueue_donation(nickname, float(amount), payment_id=payment_id)
+                logger.info("Донат поставлен в очередь через токен: игрок=%s, сумма=%s", nickname, amount)
                 
                 # Помечаем донат как обработанный
                 if '?' in request.url:
@@ -325,7 +438,7 @@ def donation_success():
         from datetime import datetime
         
         # Создаем ответ с рендером шаблона
-        response = make_response(render_template('donation_success.html', 
+        response = await make_response(await render_template('donation_success.html', 
                               nickname=nickname,
                               amount=amount,
                               now=datetime.now,  # Передаем функцию now
@@ -340,22 +453,22 @@ def donation_success():
     except Exception as e:
         logger.exception(f"Ошибка при обработке успешного платежа: {str(e)}")
         from datetime import datetime
-        return render_template('donation_success.html', now=datetime.now)
+        return await render_template('donation_success.html', now=datetime.now)
 
 @app.route('/donation-fail')
-def donation_fail():
+async def donation_fail():
     label = request.args.get('label', '')
-    logger.info(f"Неуспешный платеж, label: {label}")
-    return render_template('donation_fail.html')
+    logger.info("Неуспешный платеж, label: %s", label)
+    return await render_template('donation_fail.html')
 
 # API для обработки заявок
 @app.route('/api/submit-application', methods=['POST'])
 @require_auth
 @require_guild_member
 @can_submit_application
-def submit_application():
+async def submit_application():
     try:
-        logger.info(f"Получен запрос на отправку заявки")
+        logger.info("Получен запрос на отправку заявки")
         
         # Получаем данные авторизованного пользователя
         current_user = discord_auth.get_current_user()
@@ -367,8 +480,8 @@ def submit_application():
             logger.error("Запрос не содержит JSON данных")
             return jsonify({'success': False, 'error': 'Ожидаются данные в формате JSON'}), 400
             
-        data = request.json
-        logger.debug(f"Получены данные заявки: {data}")
+        data = await request.get_json()
+        logger.debug("Получены данные заявки: %s", data)
         
         # Проверка наличия всех необходимых полей
         # Поля соответствуют новой форме заявки
@@ -387,29 +500,53 @@ def submit_application():
             'discord_avatar': current_user['avatar_url']
         })
         
-        # Отправляем заявку в Discord через бота
-        success = process_application_in_discord(processed_data)
+        # Заявка сохраняется в очередь и отправляется в Discord ботом в фоне:
+        # ответ не зависит от Discord API, а при отключенном боте заявка дождется его.
+        # ID задачи передается боту как ключ идемпотентности отправки
+        submission_id = uuid.uuid4().hex
+        processed_data['submission_id'] = submission_id
+        job, _ = get_outbox().enqueue('application', processed_data, job_id=submission_id)
         
-        if success:
-            # Обновляем статус заявки в сессии
-            discord_auth.update_application_status('pending')
-            
-            # Сохраняем статус в файл статусов - это теперь источник истины
-            save_application_status(current_user['user_id'], 'pending')
-            
-            logger.info(f"Заявка успешно отправлена в Discord для пользователя {data.get('name')} (Discord: {current_user['username']})")
-            return jsonify({'success': True, 'message': 'Заявка успешно отправлена'})
-        else:
-            logger.error(f"Ошибка при отправке заявки в Discord для пользователя {data.get('name')}")
-            return jsonify({'success': False, 'error': 'Произошла ошибка при отправке заявки'}), 500
+        # Статус "на рассмотрении" сразу блокирует повторную подачу
+        discord_auth.update_application_status('pending')
+        await save_application_status(current_user['user_id'], 'pending')
+        
+        if hasattr(app, 'outbox_worker'):
+            app.outbox_worker.wake()
+        
+        logger.info("Заявка пользователя %s (Discord: %s) принята, задача %s", data.get('name'), current_user['username'], job['id'])
+        return jsonify({
+            'success': True,
+            'message': 'Заявка принята и передается кураторам',
+            'submission_id': job['id'],
+            'status_url': url_for('application_submission_status', submission_id=job['id'])
+        }), 202
             
     except Exception as e:
         logger.exception(f"Ошибка при обработке заявки: {str(e)}")
         return jsonify({'success': False, 'error': 'Произошла ошибка при обработке запроса'}), 500
 
+@app.route('/api/submit-application/<submission_id>', methods=['GET'])
+@require_auth
+async def application_submission_status(submission_id):
+    """Состояние отправки заявки в Discord (для страницы подачи заявки)"""
+    job = get_outbox().get(submission_id)
+    # Чужие задачи не показываем, как и несуществующие
+    if (job is None or job['kind'] != 'application'
+            or str(job['payload'].get('discord_id')) != str(session.get('user_id'))):
+        return jsonify({'error': 'Submission not found'}), 404
+    
+    return jsonify({
+        'submission_id': job['id'],
+        'state': job['state'],
+        'delivered': job['state'] == JOB_DONE,
+        'failed': job['state'] == JOB_FAILED,
+        'attempts': job['attempts']
+    })
+
 # API endpoint для обновления статуса заявки из Discord-бота
 @app.route('/api/update-application-status', methods=['POST'])
-def update_application_status_api():
+async def update_application_status_api():
     """API для обновления статуса заявки из Discord-бота"""
     try:
         # Проверяем API ключ для безопасности
@@ -420,7 +557,7 @@ def update_application_status_api():
             logger.warning(f"Неверный API ключ при обновлении статуса заявки: {api_key}")
             return jsonify({'error': 'Unauthorized'}), 401
         
-        data = request.get_json()
+        data = await request.get_json()
         if not data:
             return jsonify({'error': 'No JSON data provided'}), 400
             
@@ -434,32 +571,10 @@ def update_application_status_api():
         if status not in ['approved', 'rejected', 'candidate']:
             return jsonify({'error': 'Invalid status'}), 400
         
-        # Сохраняем статус заявки в файл/базу данных
-        # Для простоты используем JSON файл
-        status_file_path = os.path.join(os.path.dirname(__file__), 'application_statuses.json')
-        
-        # Загружаем существующие статусы
-        statuses = {}
-        if os.path.exists(status_file_path):
-            try:
-                with open(status_file_path, 'r', encoding='utf-8') as f:
-                    statuses = json.load(f)
-            except Exception as e:
-                logger.error(f"Ошибка при загрузке статусов заявок: {e}")
-        
-        # Обновляем статус
-        statuses[discord_id] = {
-            'status': status,
-            'timestamp': time.time(),
-            'reason': reason
-        }
-        
-        # Сохраняем обновленные статусы
+        # Сохраняем статус заявки в хранилище статусов
         try:
-            with open(status_file_path, 'w', encoding='utf-8') as f:
-                json.dump(statuses, f, ensure_ascii=False, indent=2)
-                
-            logger.info(f"Обновлен статус заявки для Discord ID {discord_id}: {status}")
+            await wait_for_status_write(get_status_writer().set(discord_id, status, reason))
+            logger.info("Обновлен статус заявки для Discord ID %s: %s", discord_id, status)
             return jsonify({'success': True, 'message': 'Status updated successfully'})
             
         except Exception as e:
@@ -472,7 +587,7 @@ def update_application_status_api():
 
 # API endpoint для очистки статуса заявки (позволяет подать заявку заново)
 @app.route('/api/clear-application-status', methods=['POST'])
-def clear_application_status_api():
+async def clear_application_status_api():
     """API для очистки статуса заявки из Discord-бота"""
     try:
         # Проверяем API ключ для безопасности
@@ -483,7 +598,7 @@ def clear_application_status_api():
             logger.warning(f"Неверный API ключ при очистке статуса заявки: {api_key}")
             return jsonify({'error': 'Unauthorized'}), 401
         
-        data = request.get_json()
+        data = await request.get_json()
         if not data:
             return jsonify({'error': 'No JSON data provided'}), 400
             
@@ -492,32 +607,16 @@ def clear_application_status_api():
         if not discord_id:
             return jsonify({'error': 'discord_id is required'}), 400
         
-        # Удаляем статус заявки из файла
-        status_file_path = os.path.join(os.path.dirname(__file__), 'application_statuses.json')
-        
-        statuses = {}
-        if os.path.exists(status_file_path):
-            try:
-                with open(status_file_path, 'r', encoding='utf-8') as f:
-                    statuses = json.load(f)
-            except Exception as e:
-                logger.error(f"Ошибка при загрузке статусов заявок: {e}")
+        # Удаляем статус заявки из хранилища
+        try:
+            cleared = await wait_for_status_write(get_status_writer().delete(discord_id))
+        except Exception as e:
+            logger.error(f"Ошибка при удалении статуса заявки: {e}")
+            return jsonify({'error': 'Failed to save status'}), 500
         
-        # Удаляем статус для данного пользователя
-        if str(discord_id) in statuses:
-            del statuses[str(discord_id)]
-            
-            # Сохраняем обновленные статусы
-            try:
-                with open(status_file_path, 'w', encoding='utf-8') as f:
-                    json.dump(statuses, f, ensure_ascii=False, indent=2)
-                    
-                logger.info(f"Очищен статус заявки для Discord ID {discord_id}")
-                return jsonify({'success': True, 'message': 'Status cleared successfully'})
-                
-            except Exception as e:
-                logger.error(f"Ошибка при сохранении статусов заявок: {e}")
-                return jsonify({'error': 'Failed to save status'}), 500
+        if cleared:
+            logger.info("Очищен статус заявки для Discord ID %s", discord_id)
+            return jsonify({'success': True, 'message': 'Status cleared successfully'})
         else:
             # Статус уже отсутствует
             return jsonify({'success': True, 'message': 'Status already cleared'})
@@ -526,8 +625,87 @@ def clear_application_status_api():
         logger.error(f"Ошибка в API очистки статуса заявки: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+# API endpoint для пакетной доставки изменений статусов из очереди бота
+@app.route('/api/application-statuses', methods=['POST'])
+async def apply_application_statuses_api():
+    """API для применения пачки изменений статусов заявок из Discord-бота"""
+    try:
+        # Проверяем API ключ для безопасности
+        api_key = request.headers.get('X-API-Key')
+        expected_api_key = os.getenv('INTERNAL_API_KEY', 'your-secret-api-key')
+
+        if api_key != expected_api_key:
+            logger.warning(f"Неверный API ключ при пакетном обновлении статусов заявок: {api_key}")
+            return jsonify({'error': 'Unauthorized'}), 401
+
+        data = await request.get_json(silent=True)
+        if not data or not isinstance(data.get('updates'), list):
+            return jsonify({'error': 'Missing updates'}), 400
+
+        updates = data['updates']
+        if len(updates) > BATCH_STATUS_LIMIT:
+            return jsonify({'error': f'Too many updates (max {BATCH_STATUS_LIMIT})'}), 400
+
+        # Проверяем всю пачку до записи: бот повторит ее целиком
+        for update in updates:
+            if not isinstance(update, dict) or not update.get('discord_id'):
+                return jsonify({'error': 'discord_id is required'}), 400
+            status = update.get('status')
+            if status is not None and status not in ['approved', 'rejected', 'candidate']:
+                return jsonify({'error': 'Invalid status'}), 400
+
+        # Изменения ставятся в поток записи подряд (в порядке очереди бота)
+        # и попадают в одну транзакцию
+        writer = get_status_writer()
+        futures = []
+        for update in updates:
+            discord_id = str(update['discord_id'])
+            if update.get('status') is None:
+                futures.append(writer.delete(discord_id))
+            else:
+                futures.append(writer.set(discord_id, update['status'], update.get('reason', '')))
+
+        try:
+            await asyncio.gather(*(wait_for_status_write(future) for future in futures))
+        except Exception as e:
+            logger.error(f"Ошибка при пакетном сохранении статусов заявок: {e}")
+            return jsonify({'error': 'Failed to save status'}), 500
+
+        logger.info("Применено изменений статусов заявок из очереди бота: %s", len(updates))
+        return jsonify({'success': True, 'applied': len(updates)})
+
+    except Exception as e:
+        logger.error(f"Ошибка в API пакетного обновления статусов заявок: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+async def deliver_application(application_data):
+    """Обработчик очереди: отправляет заявку в канал заявок через бота"""
+    if not await process_application_in_discord(application_data):
+        raise RuntimeError("Бот не отправил заявку в канал")
+    return True
+
+async def on_outbox_job_failed(job, error):
+    """
+    Задача очереди не выполнена: заявка - снимаем статус, чтобы пользователь мог
+    подать ее заново; донат - просим модераторов выдать награду вручную.
+    """
+    if job['kind'] == 'donation':
+        donation = job['payload']
+        completed = donation.get('completed_steps', [])
+        failed_step = next((step for step in app.bot.get_donation_steps(int(donation['amount']))
+                            if step not in completed), None)
+        await app.bot.report_donation_failure(donation['nickname'], failed_step)
+        return
+    if job['kind'] != 'application':
+        return
+    discord_id = str(job['payload'].get('discord_id'))
+    status = get_application_status(discord_id)
+    if status and status['status'] == 'pending':
+        await wait_for_status_write(get_status_writer().delete(discord_id))
+        logger.warning(f"Статус заявки {discord_id} снят после неудачной доставки: {error}")
+
 # Функция для передачи заявки боту Discord
-def process_application_in_discord(application_data):
+async def process_application_in_discord(application_data):
     """
     Асинхронно вызывает обработку заявки в Discord боте
     
@@ -538,13 +716,11 @@ def process_application_in_discord(application_data):
         bool: True если заявка успешно отправлена, иначе False
     """
     try:
-        logger.info(f"Обработка заявки для пользователя {application_data.get('name')}")
-        logger.debug(f"Данные заявки: {application_data}")
+        logger.info("Обработка заявки для пользователя %s", application_data.get('name'))
+        logger.debug("Данные заявки: %s", application_data)
         
         # Проверяем, есть ли доступ к экземпляру бота
         if hasattr(app, 'bot') and app.bot is not None:
-            import asyncio
-            
             # Получаем ID канала для заявок и создаем embed-сообщение
             import discord
             from bot.config import QUESTION_MAPPING
@@ -576,29 +752,23 @@ def process_application_in_discord(application_data):
                         inline=is_inline
                     )
             
-            # Используем функцию create_application_message из модуля bot
-            from bot.utils.applications import create_application_message
-            
             # Получаем Discord ID из данных заявки
             discord_id = application_data.get('discord_id')
             
-            # Создаем объект для будущего результата
-            future = asyncio.run_coroutine_threadsafe(
-                create_application_message(
-                    app.bot.channel_for_applications, 
-                    discord_id,  # Передаем Discord ID пользователя
-                    embed
-                ),
-                app.bot.loop
-            )
-            
-            # Получаем результат (с таймаутом)
+            # app.bot - бот в этом же процессе или клиент процесса бота (bot_rpc).
+            # Повтор задачи с тем же submission_id бот распознает и не публикует
+            # заявку второй раз, поэтому зависший вызов можно прервать
             try:
-                result = future.result(timeout=10.0)
-                logger.info(f"Обработка заявки успешно завершена: {result}")
+                result = await asyncio.wait_for(
+                    app.bot.create_application_message(
+                        discord_id, embed, submission_id=application_data.get('submission_id')
+                    ),
+                    timeout=APPLICATION_DELIVERY_TIMEOUT
+                )
+                logger.info("Обработка заявки успешно завершена: %s", result)
                 return result
             except asyncio.TimeoutError:
-                logger.error("Превышен таймаут обработки заявки")
+                logger.error(f"Бот не отправил заявку за {APPLICATION_DELIVERY_TIMEOUT} с")
                 return False
             except Exception as e:
                 logger.error(f"Ошибка при получении результата обработки заявки: {e}")
@@ -611,51 +781,58 @@ def process_application_in_discord(application_data):
         logger.error(f"Ошибка при обработке заявки через Discord бота: {e}")
         return False
 
-# Функция для взаимодействия с Discord ботом
-def process_donation_in_discord(nickname, amount):
+async def fulfill_donation(donation):
+    """
+    Обработчик очереди: выдает награды за донат через бота.
+    
+    Выполненные шаги отмечаются в задаче, поэтому при повторе после ошибки
+    (например, RCON недоступен) благодарность и роль не выдаются повторно.
     """
-    Асинхронно вызывает обработку доната в Discord боте
+    nickname = donation['nickname']
+    amount = int(donation['amount'])
+    completed = donation.setdefault('completed_steps', [])
+    
+    for step in app.bot.get_donation_steps(amount):
+        if step in completed:
+            continue
+        await app.bot.run_donation_step(step, nickname, amount)
+        completed.append(step)
+    
+    logger.info("Обработан донат: игрок=%s, сумма=%s, шаги=%s", nickname, amount, completed)
+    return completed
+
+def enqueue_donation(nickname, amount, payment_id=None, operation_id=None):
+    """
+    Ставит выдачу наград за донат в очередь - не более одного раза на платеж.
+    
+    Ключ идемпотентности - наш payment_id (label), а без него operation_id ЮMoney,
+    поэтому вебхук и страница успешной оплаты не выдают награды дважды.
     
     Args:
         nickname: Никнейм игрока
         amount: Сумма доната
-    """
-    try:
-        logger.info(f"Обработка доната для {nickname} на сумму {amount}")
+        payment_id: ID платежа сайта
+        operation_id: ID операции ЮMoney
         
-        # Проверяем, есть ли доступ к экземпляру бота
-        if hasattr(app, 'bot') and app.bot is not None:
-            import asyncio
-            
-            # Создаем объект для будущего результата
-            future = asyncio.run_coroutine_threadsafe(
-                app.bot.handle_donation(nickname, int(amount)),
-                app.bot.loop
-            )
-            
-            # Получаем результат (с таймаутом)
-            try:
-                result = future.result(timeout=10.0)
-                logger.info(f"Обработка доната успешно завершена: {result}")
-            except asyncio.TimeoutError:
-                logger.error("Превышен таймаут обработки доната")
-            except Exception as e:
-                logger.error(f"Ошибка при получении результата обработки доната: {e}")
-            
-            logger.info(f"Запрос на обработку доната для {nickname} на сумму {amount} отправлен в бота")
-        else:
-            logger.warning("Экземпляр бота недоступен. Донат не будет обработан через Discord.")
-            
-    except Exception as e:
-        logger.error(f"Ошибка при обработке доната через Discord бота: {e}")
-        # Не поднимаем исключение, чтобы не прерывать обработку успешного платежа
+    Returns:
+        tuple: (задача, True если донат поставлен в очередь впервые)
+    """
+    job, created = get_outbox().enqueue('donation', {
+        'nickname': nickname,
+        'amount': amount,
+        'payment_id': payment_id,
+        'operation_id': operation_id
+    }, dedup_key=payment_id or operation_id)
+    if created and hasattr(app, 'outbox_worker'):
+        app.outbox_worker.wake()
+    return job, created
 
 # Обработка вебхуков от ЮMoney
 @app.route('/yoomoney-notification', methods=['POST'])
-def yoomoney_notification():
+async def yoomoney_notification():
     try:
-        data = request.form.to_dict()
-        logger.debug(f"Получено уведомление от ЮMoney: {data}")
+        data = (await request.form).to_dict()
+        logger.debug("Получено уведомление от ЮMoney: %s", data)
         
         # Проверка подлинности запроса
         if not verify_yoomoney_notification(data):
@@ -669,20 +846,16 @@ def yoomoney_notification():
         comment = data.get('comment', '')  # Это никнейм игрока
         
         # Проверяем, не был ли платеж уже обработан
-        if payment_already_processed(operation_id):
-            logger.info(f"Платеж {operation_id} уже был обработан ранее. Пропускаем.")
+        if payment_already_processed(label, operation_id):
+            logger.info("Платеж %s уже был обработан ранее. Пропускаем.", operation_id)
             return 'OK', 200
         
-        logger.info(f"Валидное уведомление от ЮMoney: тип={notification_type}, операция={operation_id}, платеж={label}, сумма={amount}, комментарий={comment}")
+        logger.info("Валидное уведомление от ЮMoney: тип=%s, операция=%s, платеж=%s, сумма=%s, комментарий=%s", notification_type, operation_id, label, amount, comment)
         
-        # Обрабатываем донат через бота (только для операций payment.succeeded)
+        # Донат сохраняется в очередь и обрабатывается ботом в фоне - ЮMoney получает ответ сразу
         if notification_type == 'payment.succeeded' and comment and float(amount) > 0:
-            process_donation_in_discord(comment, float(amount))
-            
-            # Сохраняем операцию как обработанную
-            mark_payment_as_processed(operation_id)
-            
-            logger.info(f"Обработан донат через вебхук: игрок={comment}, сумма={amount}")
+            job, _ = enqueue_donation(comment, float(amount), payment_id=label, operation_id=operation_id)
+            logger.info("Донат поставлен в очередь через вебхук: игрок=%s, сумма=%s, задача=%s", comment, amount, job['id'])
         
         return 'OK', 200
     except Exception as e:
@@ -725,29 +898,19 @@ def verify_yoomoney_notification(data):
         logger.error(f"Ошибка при проверке подписи ЮMoney: {e}")
         return False
 
-# Хранилище для отслеживания обработанных платежей
-processed_payments = set()
-
-def payment_already_processed(operation_id):
+def payment_already_processed(payment_id=None, operation_id=None):
     """
-    Проверяет, был ли платеж уже обработан
+    Проверяет, был ли платеж уже принят в обработку (сохраняется между перезапусками)
     
     Args:
+        payment_id: ID платежа сайта (label)
         operation_id: ID операции ЮMoney
         
     Returns:
         bool: True если платеж уже обработан, иначе False
     """
-    return operation_id in processed_payments
-
-def mark_payment_as_processed(operation_id):
-    """
-    Помечает платеж как обработанный
-    
-    Args:
-        operation_id: ID операции ЮMoney
-    """
-    processed_payments.add(operation_id)
+    dedup_key = payment_id or operation_id
+    return bool(dedup_key) and get_outbox().find('donation', dedup_key) is not None
 
 # Создаем сериализатор для защищенных токенов
 serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'])
@@ -791,16 +954,16 @@ def verify_donation_token(token):
 # ==========================================
 
 @app.route('/login')
-def login():
+async def login():
     """Страница входа через Discord"""
     if discord_auth.is_authenticated():
         return redirect(url_for('apply'))
     
     auth_url = discord_auth.get_authorization_url()
-    return render_template('login.html', auth_url=auth_url)
+    return await render_template('login.html', auth_url=auth_url)
 
 @app.route('/auth/discord/callback')
-def discord_callback():
+async def discord_callback():
     """Обработка callback от Discord OAuth"""
     logger.info("[DISCORD] Получен Discord OAuth callback")
     
@@ -808,7 +971,7 @@ def discord_callback():
     state = request.args.get('state')
     error = request.args.get('error')
     
-    logger.info(f"[DISCORD] Параметры callback: code={code[:10] if code else None}..., state={state[:10] if state else None}..., error={error}")
+    logger.info("[DISCORD] Параметры callback: code=%s..., state=%s..., error=%s", code[:10] if code else None, state[:10] if state else None, error)
     
     if error:
         logger.error(f"[DISCORD] Discord OAuth ошибка: {error}")
@@ -821,25 +984,31 @@ def discord_callback():
     try:
         logger.info("[DISCORD] Обмен кода на токен...")
         # Обмениваем код на токен
-        token_data = discord_auth.exchange_code_for_token(code, state)
+        token_data = await discord_auth.exchange_code_for_token(code, state)
         access_token = token_data['access_token']
         
-        logger.info("[DISCORD] Получение информации о пользователе...")
-        # Получаем информацию о пользователе
-        user_data = discord_auth.get_user_info(access_token)
-        
-        logger.info("[DISCORD] Проверка членства в сервере...")
-        # Проверяем членство в сервере
-        is_guild_member = discord_auth.check_guild_membership(access_token, user_data['id'])
+        logger.info("[DISCORD] Получение пользователя, серверов и ролей...")
+        # Пользователь, список серверов и запись участника загружаются параллельно
+        login_data = await discord_auth.fetch_login_data(access_token)
+        user_data = login_data['user']
+        is_guild_member = login_data['guild_member']
+        # Токены хранятся на сервере: refresh token продлевает доступ без повторного входа
+        discord_auth.store_tokens(user_data['id'], token_data)
+        get_permission_cache().set(user_data['id'], login_data['is_admin'], login_data['is_minebuild_member'])
         
         logger.info("[DISCORD] Создание сессии пользователя...")
-        # Создаем сессию
-        discord_auth.create_user_session(user_data, is_guild_member, access_token)
+        # Создаем сессию с уже вычисленными правами
+        await discord_auth.create_user_session(
+            user_data, is_guild_member, access_token,
+            is_admin=login_data['is_admin'],
+            is_minebuild_member=login_data['is_minebuild_member']
+        )
         
-        logger.info(f"[DISCORD] Успешная авторизация пользователя: {user_data['username']}")
+        logger.info("[DISCORD] Успешная авторизация пользователя: %s", user_data['username'])
         
         # Проверим сессию после создания
-        logger.info(f"[DISCORD] Session сразу после создания: {dict(session)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[DISCORD] Ключи сессии сразу после создания: %s", list(session.keys()))
         
         # Перенаправляем в зависимости от членства в сервере
         if is_guild_member:
@@ -857,7 +1026,7 @@ def discord_callback():
 
 @app.route('/join-server')
 @require_auth
-def join_server():
+async def join_server():
     """Страница для присоединения к Discord серверу"""
     current_user = discord_auth.get_current_user()
     
@@ -866,26 +1035,26 @@ def join_server():
         return redirect(url_for('apply'))
     
     discord_invite_url = "https://discord.com/invite/yNz87pJZPh"  # Обновите на вашу ссылку
-    return render_template('join_server.html', 
+    return await render_template('join_server.html', 
                          current_user=current_user,
                          discord_invite_url=discord_invite_url)
 
 @app.route('/check-membership')
 @require_auth
-def check_membership():
+async def check_membership():
     """Проверка членства в Discord сервере"""
-    if discord_auth.refresh_guild_membership():
+    if await discord_auth.refresh_guild_membership():
         return redirect(url_for('apply'))
     else:
         return redirect(url_for('join_server'))
 
 @app.route('/application-pending')
 @require_auth
-def application_pending():
+async def application_pending():
     """Страница ожидающей заявки"""
     current_user = discord_auth.get_current_user()
     
-    # Получаем актуальный статус заявки из файла
+    # Получаем актуальный статус заявки из хранилища
     if current_user:
         application_status_data = get_application_status(current_user['user_id'])
         if application_status_data:
@@ -893,33 +1062,33 @@ def application_pending():
             current_user['application_reason'] = application_status_data.get('reason', '')
             current_user['application_timestamp'] = application_status_data.get('timestamp')
         else:
-            # Если статуса нет в файле, очищаем сессию и перенаправляем на подачу заявки
+            # Если статуса нет в хранилище, очищаем сессию и перенаправляем на подачу заявки
             if 'application_status' in session:
                 session.pop('application_status', None)
-                logger.info(f"Очищен устаревший статус заявки из сессии для пользователя {current_user['user_id']}")
+                logger.info("Очищен устаревший статус заявки из сессии для пользователя %s", current_user['user_id'])
             return redirect(url_for('apply'))
     
-    return render_template('application_pending.html', current_user=current_user)
+    return await render_template('application_pending.html', current_user=current_user)
 
 @app.route('/logout')
-def logout():
+async def logout():
     """Выход из системы"""
     discord_auth.logout()
     return redirect(url_for('index'))
 
 @app.route('/admin')
 @require_auth
-def admin_panel():
+async def admin_panel():
     """Панель администратора"""
     # Проверяем и обновляем права доступа (только для доступа к админ-панели)
-    if not check_and_update_admin_permissions():
+    if not await check_and_update_admin_permissions():
         return redirect(url_for('index'))
     
-    return render_template('admin_panel.html')
+    return await render_template('admin_panel.html')
 
 @app.route('/download')
 @require_auth
-def download():
+async def download():
     """Скачивание модпака для участников MineBuild"""
     current_user = discord_auth.get_current_user()
     
@@ -929,7 +1098,7 @@ def download():
         return redirect(url_for('index'))
 
     # Отдаём архив как attachment
-    from flask import send_file
+    from quart import send_file
     import os
     
     try:
@@ -937,20 +1106,20 @@ def download():
         if not os.path.exists(zip_path):
             logger.error(f"[DOWNLOAD] Файл не найден: {zip_path}")
             return "Файл не найден", 404
-        return send_file(zip_path, as_attachment=True)
+        return await send_file(zip_path, as_attachment=True)
     except Exception as e:
         logger.error(f"[DOWNLOAD] Ошибка при отправке файла: {e}")
         return "Ошибка при отправке файла", 500
 
 # Тестовый маршрут для админ-панели (без авторизации)
 @app.route('/admin-test')
-def admin_panel_test():
+async def admin_panel_test():
     """Тестовая панель администратора без авторизации"""
-    return render_template('admin_panel.html')
+    return await render_template('admin_panel.html')
 
 # Тестовый API для админ-панели (без авторизации)
 @app.route('/api/config-test')
-def get_bot_config_test():
+async def get_bot_config_test():
     """Тестовый API для конфигурации бота без авторизации"""
     try:
         from bot.config_manager import get_config
@@ -964,15 +1133,12 @@ def get_bot_config_test():
 
 # Context processor для передачи информации о пользователе во все шаблоны
 @app.context_processor
-def inject_user():
+async def inject_user():
     """Добавляет информацию о текущем пользователе во все шаблоны с автообновлением ролей"""
-    logger.debug(f"[CONTEXT] Context processor: session = {dict(session)}")
-    logger.debug(f"[CONTEXT] Context processor: is_authenticated = {discord_auth.is_authenticated()}")
-    
     current_user = None
     if discord_auth.is_authenticated():
         # Обновляем права пользователя при каждом запросе (с кэшированием)
-        updated_permissions = check_and_update_user_permissions()
+        updated_permissions = await check_and_update_user_permissions()
         
         # Получаем информацию о пользователе
         current_user = discord_auth.get_current_user()
@@ -982,53 +1148,49 @@ def inject_user():
             current_user['is_admin'] = updated_permissions['is_admin']
             current_user['is_minebuild_member'] = updated_permissions['is_minebuild_member']
         
-        logger.debug(f"[CONTEXT] Context processor: current_user = {current_user}")
-        logger.debug(f"[CONTEXT] Updated permissions: admin={updated_permissions['is_admin']}, member={updated_permissions['is_minebuild_member']}")
+        logger.debug("[CONTEXT] Права пользователя %s: admin=%s, member=%s",
+                     current_user and current_user['user_id'],
+                     updated_permissions['is_admin'], updated_permissions['is_minebuild_member'])
     
     return {'current_user': current_user}
 
 def get_application_status(discord_id):
     """Получает статус заявки для указанного Discord ID"""
     try:
-        status_file_path = os.path.join(os.path.dirname(__file__), 'application_statuses.json')
-        
-        if not os.path.exists(status_file_path):
-            return None
-            
-        with open(status_file_path, 'r', encoding='utf-8') as f:
-            statuses = json.load(f)
-            
-        return statuses.get(str(discord_id))
+        return get_status_store().get(discord_id)
         
     except Exception as e:
         logger.error(f"Ошибка при получении статуса заявки для {discord_id}: {e}")
         return None
 
 
-def save_application_status(discord_id, status, reason=""):
+async def not_modified(etag):
+    """
+    Возвращает ответ 304, если у клиента уже есть версия etag (If-None-Match).
+    
+    Args:
+        etag: Текущий ETag ресурса
+        
+    Returns:
+        Response 304 или None, если нужно отдать полный ответ
+    """
+    if request.if_none_match.contains(etag):
+        response = await make_response('', 304)
+        response.set_etag(etag)
+        return response
+    return None
+
+
+async def wait_for_status_write(future):
+    """Ожидает надежной записи изменения статуса, не блокируя цикл событий"""
+    return await asyncio.wait_for(asyncio.wrap_future(future), timeout=STATUS_WRITE_TIMEOUT)
+
+
+async def save_application_status(discord_id, status, reason=""):
     """Сохраняет статус заявки для указанного Discord ID"""
     try:
-        status_file_path = os.path.join(os.path.dirname(__file__), 'application_statuses.json')
-        
-        # Читаем существующие статусы или создаем пустой словарь
-        if os.path.exists(status_file_path):
-            with open(status_file_path, 'r', encoding='utf-8') as f:
-                statuses = json.load(f)
-        else:
-            statuses = {}
-        
-        # Добавляем/обновляем статус
-        statuses[str(discord_id)] = {
-            'status': status,
-            'timestamp': time.time(),
-            'reason': reason
-        }
-        
-        # Сохраняем обратно в файл
-        with open(status_file_path, 'w', encoding='utf-8') as f:
-            json.dump(statuses, f, ensure_ascii=False, indent=2)
-            
-        logger.info(f"Сохранен статус заявки для Discord ID {discord_id}: {status}")
+        await wait_for_status_write(get_status_writer().set(discord_id, status, reason))
+        logger.info("Сохранен статус заявки для Discord ID %s: %s", discord_id, status)
         return True
         
     except Exception as e:
@@ -1037,7 +1199,7 @@ def save_application_status(discord_id, status, reason=""):
 
 
 @app.route('/api/application-status', methods=['POST'])
-def api_get_application_status():
+async def api_get_application_status():
     """API endpoint для получения статуса заявки"""
     try:
         # Проверка авторизации
@@ -1047,36 +1209,101 @@ def api_get_application_status():
             return jsonify({'error': 'Invalid API key'}), 401
         
         # Получение данных из запроса
-        data = request.get_json()
+        data = await request.get_json()
         if not data or 'discord_id' not in data:
             return jsonify({'error': 'Missing discord_id'}), 400
         
         discord_id = str(data['discord_id'])
         
-        # Получение статуса заявки
-        status_data = get_application_status(discord_id)
+        store = get_status_store()
+        etag_suffix = f"-{discord_id}{'-h' if data.get('include_history') else ''}"
+        
+        # ETag по версии хранилища: если статусы не менялись - 304 без чтения и сериализации
+        cached_response = await not_modified(f"{store.version()}{etag_suffix}")
+        if cached_response is not None:
+            return cached_response
+        
+        # Статус и версия читаются из одного снимка базы (мимо кэша процесса,
+        # который может отставать от других процессов): ETag всегда
+        # соответствует отданному телу ответа
+        version, statuses = store.get_many([discord_id])
+        status_data = statuses[discord_id]
+        etag = f"{version}{etag_suffix}"
         
         if status_data is None:
-            return jsonify({'status': None, 'has_application': False}), 200
+            response = jsonify({'status': None, 'has_application': False})
+            response.set_etag(etag)
+            return response
         
-        return jsonify({
+        response_data = {
             'status': status_data.get('status'),
             'has_application': True,
             'timestamp': status_data.get('timestamp'),
             'reason': status_data.get('reason', '')
-        }), 200
+        }
+
+        # История переходов статуса - только по явному запросу
+        if data.get('include_history'):
+            response_data['history'] = store.history(discord_id)
+
+        response = jsonify(response_data)
+        response.set_etag(etag)
+        return response
         
     except Exception as e:
         logger.error(f"Ошибка в API получения статуса заявки: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+# Максимальное количество Discord ID в одном пакетном запросе статусов
+BATCH_STATUS_LIMIT = 500
+
+@app.route('/api/application-status/batch', methods=['POST'])
+async def api_get_application_statuses_batch():
+    """API endpoint для пакетного получения статусов заявок (для бота и админских инструментов)"""
+    try:
+        # Проверка авторизации
+        api_key = request.headers.get('X-API-Key')
+        expected_api_key = os.getenv('INTERNAL_API_KEY', 'your-secret-api-key')
+        if api_key != expected_api_key:
+            return jsonify({'error': 'Invalid API key'}), 401
+        
+        data = await request.get_json(silent=True)
+        if not data or not isinstance(data.get('discord_ids'), list):
+            return jsonify({'error': 'Missing discord_ids'}), 400
+        
+        discord_ids = [str(discord_id) for discord_id in data['discord_ids']]
+        if len(discord_ids) > BATCH_STATUS_LIMIT:
+            return jsonify({'error': f'Too many discord_ids (max {BATCH_STATUS_LIMIT})'}), 400
+        
+        store = get_status_store()
+        
+        # ETag зависит от версии хранилища и набора запрошенных ID:
+        # если с прошлого опроса ничего не менялось - отвечаем 304 без чтения статусов
+        ids_digest = hashlib.sha1(','.join(sorted(set(discord_ids))).encode('utf-8')).hexdigest()
+        cached_response = await not_modified(f"{store.version()}-{ids_digest}")
+        if cached_response is not None:
+            return cached_response
+        
+        version, statuses = store.get_many(discord_ids)
+        
+        response = jsonify({
+            'version': version,
+            'statuses': statuses
+        })
+        response.set_etag(f"{version}-{ids_digest}")
+        return response
+        
+    except Exception as e:
+        logger.error(f"Ошибка в API пакетного получения статусов заявок: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/debug/dropdown')
-def debug_dropdown():
+async def debug_dropdown():
     """Debug page for dropdown functionality"""
-    return render_template('debug_dropdown.html')
+    return await render_template('debug_dropdown.html')
 
 @app.route('/debug/dropdown-with-user')
-def debug_dropdown_with_user():
+async def debug_dropdown_with_user():
     """Debug page for dropdown functionality with a fake user"""
     # Create fake user data for testing
     fake_user = {
@@ -1088,74 +1315,130 @@ def debug_dropdown_with_user():
         'application_status': None,
         'login_time': '2025-06-28T16:48:00'
     }
-    return render_template('debug_dropdown.html', current_user=fake_user)
+    return await render_template('debug_dropdown.html', current_user=fake_user)
 
 
 # === API ДЛЯ АДМИН-ПАНЕЛИ ===
 
-from bot.config_manager import get_config, reload_config
+from bot.config_manager import get_config, reload_config, get_permission_refresh_windows
 
-def check_and_update_admin_permissions():
+async def check_and_update_admin_permissions():
     """Проверяет и обновляет права администратора текущего пользователя"""
-    return check_and_update_user_permissions().get('is_admin', False)
+    return (await check_and_update_user_permissions()).get('is_admin', False)
 
-def check_and_update_user_permissions():
-    """Проверяет и обновляет все права пользователя (админ и майнбилдовец)"""
-    if 'access_token' not in session or 'user_id' not in session:
+async def check_and_update_user_permissions(force=False):
+    """
+    Проверяет и обновляет все права пользователя (админ и майнбилдовец).
+    
+    Свежие права берутся из кэша. Устаревшие, но попадающие в окно
+    stale_window, отдаются сразу, а обновление идет в фоне - рендер страницы
+    не ждет Discord API. Ждать проверки приходится только если прав нет
+    или они старше окна.
+    
+    Args:
+        force: Пропустить кэш и сессию и дождаться новой проверки прав
+    """
+    if 'user_id' not in session:
         return {'is_admin': False, 'is_minebuild_member': False}
     
-    # Используем кэшированные значения, если они есть и не устарели
-    is_admin_cached = session.get('is_admin', False)
-    is_member_cached = session.get('is_minebuild_member', False)
+    user_id = session['user_id']
+    windows = get_permission_refresh_windows()
+    
+    if force:
+        get_permission_cache().invalidate(user_id)
+    
+    # Общий кэш прав процесса: одна проверка на пользователя для всех его сессий
+    cached_permissions = None if force else get_permission_cache().get(user_id)
+    if cached_permissions is not None:
+        age = get_permissions_age()
+        if (session.get('is_admin') != cached_permissions['is_admin']
+                or session.get('is_minebuild_member') != cached_permissions['is_minebuild_member']
+                or age is None or age >= windows['refresh_interval']):
+            remember_permissions(cached_permissions)
+        return cached_permissions
+    
+    # Используем кэшированные значения сессии, если они есть
+    session_permissions = {
+        'is_admin': session.get('is_admin', False),
+        'is_minebuild_member': session.get('is_minebuild_member', False)
+    }
+    age = None if force else get_permissions_age()
+    
+    if age is not None:
+        if age < windows['refresh_interval']:
+            app.logger.debug("Используем кэшированные значения прав пользователя")
+            return session_permissions
+        if age < windows['refresh_interval'] + windows['stale_window']:
+            # Отдаем последние известные права, результат фоновой проверки попадет в общий кэш
+            discord_auth.flights.start(('permissions', str(user_id)), lambda: fetch_user_permissions(user_id))
+            return session_permissions
+    
+    # Прав в сессии нет или они слишком старые - ждем проверки
+    try:
+        # Одновременные запросы одного пользователя (вкладки, админ-панель) ждут одну проверку
+        permissions = await discord_auth.flights.run(
+            ('permissions', str(user_id)), lambda: fetch_user_permissions(user_id)
+        )
+        if permissions is None:
+            # Проверка не удалась (например, токен отозван): оставляем права из сессии
+            return session_permissions
+        
+        remember_permissions(permissions)
+        return permissions
+    except Exception as e:
+        app.logger.error(f"Ошибка при проверке прав пользователя: {e}")
+        # Если произошла ошибка, используем кэшированные значения
+        return session_permissions
+
+def get_permissions_age():
+    """Возвращает время с последней проверки прав в сессии (секунды) или None"""
     last_check = session.get('permissions_check_time')
+    if not last_check:
+        return None
+    try:
+        return (datetime.now() - datetime.fromisoformat(last_check)).total_seconds()
+    except (ValueError, TypeError):
+        return None  # Если время некорректное, делаем новую проверку
+
+def remember_permissions(permissions):
+    """Сохраняет права в сессии с временной меткой"""
+    session['is_admin'] = permissions['is_admin']
+    session['is_minebuild_member'] = permissions['is_minebuild_member']
+    session['permissions_check_time'] = datetime.now().isoformat()
+    # Удаляем старую временную метку для совместимости
+    if 'admin_check_time' in session:
+        session.pop('admin_check_time', None)
+    session.modified = True
+
+async def fetch_user_permissions(user_id):
+    """
+    Запрашивает права пользователя у Discord и сохраняет их в общий кэш прав.
     
-    if last_check:
-        try:
-            last_check_time = datetime.fromisoformat(last_check)
-            # Если последняя проверка была менее 1 минуты назад, используем кэшированные значения
-            if datetime.now() - last_check_time < timedelta(minutes=1):
-                app.logger.debug("Используем кэшированные значения прав пользователя")
-                return {
-                    'is_admin': is_admin_cached,
-                    'is_minebuild_member': is_member_cached
-                }
-        except (ValueError, TypeError):
-            pass  # Если время некорректное, делаем новую проверку
+    Может выполняться в фоне после ответа на запрос, поэтому не обращается к сессии.
     
-    # Только если кэш устарел, делаем новую проверку
+    Args:
+        user_id: Discord ID пользователя
+        
+    Returns:
+        dict: is_admin и is_minebuild_member или None, если проверить права не удалось
+    """
     try:
-        discord_auth = current_app.discord_auth
-        user_id = session['user_id']
-        access_token = session['access_token']
+        access_token = await discord_auth.get_access_token(user_id)
+        if not access_token:
+            app.logger.warning(f"[PERMISSIONS] Нет действующего токена пользователя {user_id}")
+            return None
         
         # Проверяем админские права
-        is_admin = discord_auth.check_admin_permissions(access_token, user_id)
+        is_admin = await discord_auth.check_admin_permissions(access_token, user_id)
         
         # Проверяем роль майнбилдовца
-        is_member = discord_auth.check_minebuild_member(user_id, access_token)
-        
-        # Сохраняем в сессии с временной меткой
-        session['is_admin'] = is_admin
-        session['is_minebuild_member'] = is_member
-        session['permissions_check_time'] = datetime.now().isoformat()
-        # Удаляем старую временную метку для совместимости
-        if 'admin_check_time' in session:
-            session.pop('admin_check_time', None)
-        session.modified = True
-        
-        app.logger.info(f"[PERMISSIONS] Обновлены права пользователя {user_id}: admin={is_admin}, member={is_member}")
-        
-        return {
-            'is_admin': is_admin,
-            'is_minebuild_member': is_member
-        }
+        is_member = await discord_auth.check_minebuild_member(user_id, access_token)
+        
+        app.logger.info("[PERMISSIONS] Обновлены права пользователя %s: admin=%s, member=%s", user_id, is_admin, is_member)
+        return get_permission_cache().set(user_id, is_admin, is_member)
     except Exception as e:
-        app.logger.error(f"Ошибка при проверке прав пользователя: {e}")
-        # Если произошла ошибка, используем кэшированные значения
-        return {
-            'is_admin': is_admin_cached,
-            'is_minebuild_member': is_member_cached
-        }
+        app.logger.error(f"[PERMISSIONS] Ошибка при обновлении прав пользователя {user_id}: {e}")
+        return None
 
 def is_admin_cached():
     """Проверяет права администратора только из кэша сессии, без обращения к Discord API"""
@@ -1166,7 +1449,7 @@ def is_minebuild_member_cached():
     return session.get('is_minebuild_member', False)
 
 @app.route('/api/user', methods=['GET'])
-def get_current_user_api():
+async def get_current_user_api():
     """Получение информации о текущем пользователе с обновлением ролей"""
     try:
         # Проверяем, есть ли авторизованный пользователь
@@ -1178,10 +1461,19 @@ def get_current_user_api():
             return jsonify({'error': 'No user ID in session'}), 401
         
         # Обновляем права пользователя
-        updated_permissions = check_and_update_user_permissions()
+        updated_permissions = await check_and_update_user_permissions()
+        
+        # ETag по времени проверки прав и самим правам: навбар получает 304, пока ничего не изменилось
+        etag = hashlib.sha1(
+            f"{user_id}|{session.get('login_time')}|{session.get('permissions_check_time')}|"
+            f"{updated_permissions['is_admin']}|{updated_permissions['is_minebuild_member']}".encode('utf-8')
+        ).hexdigest()
+        cached_response = await not_modified(etag)
+        if cached_response is not None:
+            return cached_response
         
         # Возвращаем информацию о пользователе из сессии с обновленными правами
-        return jsonify({
+        response = jsonify({
             'id': user_id,
             'username': session.get('username', 'Unknown'),
             'display_name': session.get('display_name', 'Unknown'),
@@ -1191,22 +1483,53 @@ def get_current_user_api():
             'authenticated': True,
             'permissions_updated': session.get('permissions_check_time')
         })
+        response.set_etag(etag)
+        return response
     
     except Exception as e:
         app.logger.error(f"Ошибка при получении информации о пользователе: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/events', methods=['GET'])
+@require_auth
+async def user_events_stream():
+    """Поток событий текущего пользователя (Server-Sent Events): роли и статус заявки"""
+    user_id = session['user_id']
+    # Текущие права отправляются сразу: вкладка получает актуальное состояние и после переподключения
+    permissions = await check_and_update_user_permissions()
+    hub = get_user_event_hub()
+    queue = hub.subscribe(user_id)
+    
+    async def stream():
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            yield format_sse('permissions', permissions)
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield format_sse(None)
+                    continue
+                yield format_sse(event, data)
+        finally:
+            hub.unsubscribe(user_id, queue)
+    
+    response = await make_response(stream(), 200, {
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Поток живет, пока открыта вкладка
+    response.timeout = None
+    return response
+
 @app.route('/api/user/refresh-permissions', methods=['POST'])
 @require_auth
-def refresh_user_permissions():
+async def refresh_user_permissions():
     """Принудительное обновление прав пользователя"""
     try:
-        # Сбрасываем кэш времени, чтобы форсировать обновление
-        if 'permissions_check_time' in session:
-            session.pop('permissions_check_time', None)
-        
-        # Обновляем права пользователя
-        updated_permissions = check_and_update_user_permissions()
+        # Обновляем права пользователя в обход кэша прав и сессии
+        updated_permissions = await check_and_update_user_permissions(force=True)
         
         return jsonify({
             'success': True,
@@ -1221,7 +1544,7 @@ def refresh_user_permissions():
 
 @app.route('/api/config', methods=['GET'])
 @require_auth
-def get_bot_config():
+async def get_bot_config():
     """Получение конфигурации бота для админ-панели"""
     try:
         # Проверяем права доступа только из кэша
@@ -1229,10 +1552,19 @@ def get_bot_config():
             return jsonify({'error': 'Insufficient permissions'}), 403
         
         config = get_config()
+        
+        # ETag по версии конфигурации: неизмененный конфиг не собирается заново
+        etag = f"config-{config.version()}"
+        cached_response = await not_modified(etag)
+        if cached_response is not None:
+            return cached_response
+        
         # Используем упрощенную структуру для совместимости с JavaScript
         simple_config = config.get_simple_config()
         
-        return jsonify(simple_config)
+        response = jsonify(simple_config)
+        response.set_etag(etag)
+        return response
     except Exception as e:
         app.logger.error(f"Ошибка при получении конфигурации: {e}")
         return jsonify({'error': 'Failed to retrieve configuration'}), 500
@@ -1240,14 +1572,14 @@ def get_bot_config():
 
 @app.route('/api/config', methods=['POST'])
 @require_auth
-def update_bot_config():
+async def update_bot_config():
     """Обновление конфигурации бота через админ-панель"""
     try:
         # Проверяем права доступа только из кэша
         if not is_admin_cached():
             return jsonify({'error': 'Insufficient permissions'}), 403
         
-        data = request.get_json()
+        data = await request.get_json()
         if not data:
             return jsonify({'error': 'Invalid request data'}), 400
         
@@ -1295,6 +1627,10 @@ def update_bot_config():
             if 'application' in system:
                 for app_name, app_value in system['application'].items():
                     updates[f'system.application.{app_name}'] = app_value
+            
+            if 'permissions' in system:
+                for permission_name, permission_value in system['permissions'].items():
+                    updates[f'system.permissions.{permission_name}'] = permission_value
         
         # Обновляем настройки
         if updates:
@@ -1321,7 +1657,7 @@ def update_bot_config():
 
 @app.route('/api/config/reload', methods=['POST'])
 @require_auth
-def reload_bot_config():
+async def reload_bot_config():
     """Перезагрузка конфигурации бота из файла"""
     try:
         # Проверяем права доступа только из кэша
@@ -1344,7 +1680,7 @@ def reload_bot_config():
 
 @app.route('/api/config/validate', methods=['GET'])
 @require_auth
-def validate_bot_config():
+async def validate_bot_config():
     """Валидация конфигурации бота"""
     try:
         # Проверяем права доступа только из кэша
@@ -1373,5 +1709,63 @@ def validate_bot_config():
         return jsonify({'error': 'Failed to validate configuration'}), 500
 
 
+@app.route('/api/applications', methods=['GET'])
+@require_auth
+async def list_applications():
+    """Очередь заявок с указанным статусом для админ-панели (keyset-пагинация)"""
+    try:
+        # Проверяем права доступа только из кэша
+        if not is_admin_cached():
+            return jsonify({'error': 'Insufficient permissions'}), 403
+        
+        status = request.args.get('status')
+        after = request.args.get('after') or None
+        try:
+            limit = min(max(int(request.args.get('limit', 50)), 1), 200)
+        except ValueError:
+            return jsonify({'error': 'Invalid limit'}), 400
+        
+        store = get_status_store()
+        try:
+            items, next_cursor = store.list_by_status(status, after=after, limit=limit)
+        except ValueError:
+            return jsonify({'error': 'Invalid status or cursor'}), 400
+        
+        return jsonify({
+            'status': status,
+            'items': items,
+            'next_cursor': next_cursor,
+            'counts': store.counts()
+        })
+        
+    except Exception as e:
+        app.logger.error(f"Ошибка при получении списка заявок: {e}")
+        return jsonify({'error': 'Failed to retrieve applications'}), 500
+
+
+@app.route('/api/metrics', methods=['GET'])
+@require_auth
+async def get_metrics():
+    """Внутренние метрики сайта (кэши, очереди) для админ-панели"""
+    try:
+        # Проверяем права доступа только из кэша
+        if not is_admin_cached():
+            return jsonify({'error': 'Insufficient permissions'}), 403
+        
+        return jsonify({
+            'status_cache': get_status_store().cache_stats(),
+            'status_writer': get_status_writer().metrics(),
+            'permission_cache': get_permission_cache().stats(),
+            'discord_rate_limits': discord_auth.rate_limiter.headroom(),
+            'discord_single_flight': discord_auth.flights.stats(),
+            'event_subscribers': get_user_event_hub().subscriber_count(),
+            'outbox': get_outbox().stats()
+        })
+        
+    except Exception as e:
+        app.logger.error(f"Ошибка при получении метрик: {e}")
+        return jsonify({'error': 'Failed to retrieve metrics'}), 500
+
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -3,20 +3,69 @@
 Обеспечивает авторизацию пользователей и проверку членства в Discord сервере
 """
 
-import requests
+import json
+import time
+import asyncio
 import secrets
 import logging
+import aiohttp
 from datetime import datetime, timedelta
-from urllib.parse import urlencode
-from flask import session, redirect, url_for, current_app
+from urllib.parse import urlencode, urlparse
+from quart import session, redirect, url_for, current_app
 from functools import wraps
 
 # Импорты для работы с Discord API
 from bot.config_manager import get_whitelist_role_id
+from status_store import get_status_store
+from discord_ratelimit import DiscordRateLimiter
+from token_store import get_token_store
+from single_flight import SingleFlight, single_flight
+from bot_rpc import BotRPCClient, member_info
 
 # Настройка логгера
 logger = logging.getLogger(__name__)
 
+# Настройки HTTP клиента для Discord API
+DISCORD_HTTP_TIMEOUT = aiohttp.ClientTimeout(total=15, connect=5)  # Таймауты запроса в секундах
+DISCORD_HTTP_POOL_SIZE = 10        # Максимум keep-alive соединений к одному хосту
+DISCORD_MAX_RETRIES = 3            # Повторы запроса при 429 Too Many Requests
+DISCORD_MAX_RETRY_AFTER = 10.0     # Максимальная пауза перед повтором (секунды)
+TOKEN_REFRESH_MARGIN = 24 * 3600   # За сколько секунд до истечения токен обновляется в фоне
+TOKEN_REFRESH_ATTEMPTS = 2         # Попытки обновления, если токен одновременно обновил другой процесс
+
+
+class DiscordHTTPError(aiohttp.ClientError):
+    """Ответ Discord с кодом ошибки"""
+    
+    def __init__(self, response):
+        super().__init__(f"{response.status_code} для {response.url}")
+        self.response = response
+
+
+class DiscordResponse:
+    """Прочитанный ответ Discord API (тело загружается целиком до освобождения соединения)"""
+    
+    def __init__(self, url, status_code, headers, body):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+    
+    @property
+    def text(self):
+        return self.body.decode('utf-8', errors='replace')
+    
+    def json(self):
+        return json.loads(self.body)
+    
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise DiscordHTTPError(self)
+
+
+# Ошибки сети и HTTP, которые возможны при обращении к Discord
+DISCORD_HTTP_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, ValueError)
+
 class DiscordAuth:
     """Класс для работы с Discord OAuth 2.0"""
     
@@ -35,11 +84,21 @@ class DiscordAuth:
         self.OAUTH_URL = "https://discord.com/api/oauth2/authorize"
         self.TOKEN_URL = "https://discord.com/api/oauth2/token"
         
+        # Общая HTTP сессия: одно TLS соединение переиспользуется всеми запросами.
+        # Создается при первом запросе, внутри цикла событий приложения
+        self.http = None
+        # Общий для всех запросов учет лимитов Discord по маршрутам
+        self.rate_limiter = DiscordRateLimiter()
+        # Серверное хранилище OAuth токенов (access/refresh) по user_id
+        self.token_store = None
+        # Одновременные одинаковые запросы к Discord (по пользователю) выполняются один раз
+        self.flights = SingleFlight()
+        
         if app is not None:
             self.init_app(app, bot_instance)
     
     def init_app(self, app, bot_instance=None):
-        """Инициализация с Flask приложением"""
+        """Инициализация с Quart приложением"""
         self.app = app
         self.bot = bot_instance
         
@@ -57,19 +116,102 @@ class DiscordAuth:
         if not app.config.get('PERMANENT_SESSION_LIFETIME'):
             app.permanent_session_lifetime = timedelta(days=30)
         
+        # Закрываем HTTP сессию вместе с приложением
+        app.after_serving(self.close)
+        
         logger.info("Discord Auth модуль инициализирован")
     
+    def _get_http(self):
+        """Возвращает общую HTTP сессию с ограниченным пулом keep-alive соединений"""
+        if self.http is None or self.http.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=DISCORD_HTTP_POOL_SIZE)
+            self.http = aiohttp.ClientSession(connector=connector, timeout=DISCORD_HTTP_TIMEOUT)
+        return self.http
+    
+    async def close(self):
+        """Закрывает HTTP сессию"""
+        if self.http is not None and not self.http.closed:
+            await self.http.close()
+        self.http = None
+    
+    def _get_token_store(self):
+        """Возвращает хранилище OAuth токенов"""
+        if self.token_store is None:
+            self.token_store = get_token_store()
+        return self.token_store
+    
+    async def _send(self, method, url, **kwargs):
+        """Отправляет запрос и полностью читает ответ"""
+        async with self._get_http().request(method, url, **kwargs) as response:
+            body = await response.read()
+            return DiscordResponse(url, response.status, response.headers, body)
+    
+    async def _request(self, method, url, **kwargs):
+        """
+        Выполняет запрос к Discord через общую сессию.
+        
+        Перед отправкой ждет, если bucket маршрута (или глобальный лимит)
+        уже исчерпан. При ответе 429 ждет время из Retry-After и повторяет запрос.
+        Время выполнения каждого запроса пишется в лог.
+        
+        Args:
+            method: HTTP метод
+            url: URL запроса
+            **kwargs: Параметры для aiohttp (headers, data, ...)
+            
+        Returns:
+            DiscordResponse: Ответ Discord (последний, если повторы исчерпаны)
+        """
+        path = urlparse(url).path.replace('/api/v10', '', 1)
+        route = self.rate_limiter.route_key(method, path, (kwargs.get('headers') or {}).get('Authorization'))
+        
+        for attempt in range(DISCORD_MAX_RETRIES + 1):
+            await self.rate_limiter.acquire(route)
+            started = time.perf_counter()
+            response = await self._send(method, url, **kwargs)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            logger.info("[DISCORD_HTTP] %s %s -> %d за %.0f мс", method, path, response.status_code, elapsed_ms)
+            
+            retry_after = self._get_retry_after(response) if response.status_code == 429 else None
+            self.rate_limiter.update(route, response.headers, response.status_code, retry_after)
+            
+            if response.status_code != 429 or attempt == DISCORD_MAX_RETRIES:
+                return response
+            
+            logger.warning(f"[DISCORD_HTTP] Rate limit на {path}, повтор через {retry_after:.2f} с "
+                           f"(попытка {attempt + 1}/{DISCORD_MAX_RETRIES})")
+            await asyncio.sleep(retry_after)
+        
+        return response
+    
+    @staticmethod
+    def _get_retry_after(response):
+        """Извлекает паузу перед повтором из заголовка Retry-After или тела ответа 429"""
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is None:
+            try:
+                retry_after = response.json().get('retry_after')
+            except ValueError:
+                retry_after = None
+        try:
+            retry_after = float(retry_after)
+        except (TypeError, ValueError):
+            retry_after = 1.0
+        return min(max(retry_after, 0.0), DISCORD_MAX_RETRY_AFTER)
+    
     def get_authorization_url(self):
         """Генерирует URL для авторизации Discord"""
         state = secrets.token_urlsafe(32)
-        logger.info(f"[AUTH] Создание нового state: {state}")
-        logger.info(f"[AUTH] Session до сохранения state: {dict(session)}")
+        logger.info("[AUTH] Создание нового state: %s", state)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[AUTH] Ключи сессии до сохранения state: %s", list(session.keys()))
         
         session['oauth_state'] = state
         session.permanent = True  # Убедимся что сессия permanent
         session.modified = True   # Принудительно помечаем как измененную
         
-        logger.info(f"[AUTH] Session после сохранения state: {dict(session)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[AUTH] Ключи сессии после сохранения state: %s", list(session.keys()))
         
         params = {
             'client_id': self.CLIENT_ID,
@@ -81,17 +223,18 @@ class DiscordAuth:
         }
         
         auth_url = f"{self.OAUTH_URL}?{urlencode(params)}"
-        logger.info(f"Создан URL авторизации:")
-        logger.info(f"  Client ID: {self.CLIENT_ID}")
-        logger.info(f"  Redirect URI: {self.REDIRECT_URI}")
-        logger.info(f"  State: {state}")
-        logger.info(f"  Полный URL: {auth_url}")
+        logger.info("Создан URL авторизации:")
+        logger.info("  Client ID: %s", self.CLIENT_ID)
+        logger.info("  Redirect URI: %s", self.REDIRECT_URI)
+        logger.info("  State: %s", state)
+        logger.info("  Полный URL: %s", auth_url)
         return auth_url
     
-    def exchange_code_for_token(self, code, state):
+    async def exchange_code_for_token(self, code, state):
         """Обменивает authorization code на access token"""
-        logger.info(f"[AUTH] Проверка state: получен={state}, в сессии={session.get('oauth_state')}")
-        logger.info(f"[AUTH] Session содержимое при проверке state: {dict(session)}")
+        logger.info("[AUTH] Проверка state: получен=%s, в сессии=%s", state, session.get('oauth_state'))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[AUTH] Ключи сессии при проверке state: %s", list(session.keys()))
         
         # Проверяем state для защиты от CSRF
         if state != session.get('oauth_state'):
@@ -114,18 +257,115 @@ class DiscordAuth:
         }
         
         try:
-            response = requests.post(self.TOKEN_URL, data=data, headers=headers, timeout=10)
+            response = await self._request('POST', self.TOKEN_URL, data=data, headers=headers)
             response.raise_for_status()
             
             token_data = response.json()
             logger.info("Успешно получен access token")
             return token_data
             
-        except requests.RequestException as e:
+        except DISCORD_HTTP_ERRORS as e:
             logger.error(f"Ошибка при получении токена: {e}")
             raise
     
-    def get_user_info(self, access_token):
+    def store_tokens(self, user_id, token_data):
+        """
+        Сохраняет токены пользователя на сервере.
+        
+        Args:
+            user_id: Discord ID пользователя
+            token_data: Ответ token endpoint Discord
+        """
+        self._get_token_store().save(user_id, token_data)
+    
+    async def get_access_token(self, user_id):
+        """
+        Возвращает действующий access token пользователя.
+        
+        Токен, который скоро истечет, обновляется в фоне, а текущий запрос
+        использует старый. Истекший токен обновляется перед возвратом.
+        
+        Args:
+            user_id: Discord ID пользователя
+            
+        Returns:
+            str: Access token или None, если токена нет или его не удалось обновить
+        """
+        tokens = self._get_token_store().get(user_id)
+        if not tokens:
+            return None
+        
+        remaining = tokens['expires_at'] - time.time()
+        if remaining <= 0:
+            return await self.refresh_access_token(user_id)
+        
+        if remaining <= TOKEN_REFRESH_MARGIN and tokens['refresh_token']:
+            self._start_token_refresh(user_id)
+        return tokens['access_token']
+    
+    def _start_token_refresh(self, user_id):
+        """Запускает обновление токена, если для пользователя оно еще не идет"""
+        key = str(user_id)
+        return self.flights.start(('refresh_token', key), lambda: self._refresh_tokens(key))
+    
+    async def refresh_access_token(self, user_id):
+        """
+        Обновляет access token по refresh token (одно обновление на пользователя).
+        
+        Args:
+            user_id: Discord ID пользователя
+            
+        Returns:
+            str: Новый access token или None
+        """
+        return await asyncio.shield(self._start_token_refresh(user_id))
+    
+    async def _refresh_tokens(self, user_id):
+        """
+        Выполняет запрос refresh_token к Discord и сохраняет новые токены.
+        
+        Refresh token одноразовый: если воркер сайта в другом процессе успел
+        обновить токены раньше, Discord отклонит старый токен. Тогда токены
+        не удаляются, а берутся новые из хранилища.
+        """
+        store = self._get_token_store()
+        tokens = store.get(user_id)
+        for _ in range(TOKEN_REFRESH_ATTEMPTS):
+            if not tokens or not tokens['refresh_token']:
+                return None
+            
+            data = {
+                'client_id': self.CLIENT_ID,
+                'client_secret': self.CLIENT_SECRET,
+                'grant_type': 'refresh_token',
+                'refresh_token': tokens['refresh_token']
+            }
+            headers = {
+                'Content-Type': 'application/x-www-form-urlencoded'
+            }
+            
+            try:
+                response = await self._request('POST', self.TOKEN_URL, data=data, headers=headers)
+                if response.status_code not in (400, 401):
+                    response.raise_for_status()
+                    record = store.save(user_id, response.json())
+                    logger.info("[TOKEN] Обновлен access token пользователя %s", user_id)
+                    return record['access_token']
+            except DISCORD_HTTP_ERRORS as e:
+                logger.error(f"[TOKEN] Ошибка при обновлении токена пользователя {user_id}: {e}")
+                return None
+            
+            # refresh token отозван, истек или уже обменян другим процессом
+            if store.delete(user_id, refresh_token=tokens['refresh_token']):
+                logger.warning(f"[TOKEN] Refresh token пользователя {user_id} недействителен")
+                return None
+            tokens = store.get(user_id)
+            if tokens and tokens['expires_at'] > time.time():
+                logger.info("[TOKEN] Access token пользователя %s уже обновлен другим процессом", user_id)
+                return tokens['access_token']
+        return None
+    
+    async def get_user_info(self, access_token):
         """Получает информацию о пользователе"""
         headers = {
             'Authorization': f'Bearer {access_token}',
@@ -134,19 +374,19 @@ class DiscordAuth:
         
         try:
             # Получаем основную информацию о пользователе
-            response = requests.get(f"{self.DISCORD_API_BASE}/users/@me", 
-                                  headers=headers, timeout=10)
+            response = await self._request('GET', f"{self.DISCORD_API_BASE}/users/@me", headers=headers)
             response.raise_for_status()
             user_data = response.json()
             
-            logger.info(f"Получена информация о пользователе: {user_data['username']}")
+            logger.info("Получена информация о пользователе: %s", user_data['username'])
             return user_data
             
-        except requests.RequestException as e:
+        except DISCORD_HTTP_ERRORS as e:
             logger.error(f"Ошибка при получении информации о пользователе: {e}")
             raise
     
-    def check_guild_membership(self, access_token, user_id):
+    @single_flight(key=lambda access_token, user_id: str(user_id))
+    async def check_guild_membership(self, access_token, user_id):
         """Проверяет членство пользователя в Discord сервере"""
         headers = {
             'Authorization': f'Bearer {access_token}',
@@ -154,28 +394,27 @@ class DiscordAuth:
         }
         
         try:
-            logger.info(f"[GUILD_CHECK] Проверка членства для пользователя {user_id} в сервере {self.GUILD_ID}")
+            logger.info("[GUILD_CHECK] Проверка членства для пользователя %s в сервере %s", user_id, self.GUILD_ID)
             
             # Получаем список серверов пользователя
-            response = requests.get(f"{self.DISCORD_API_BASE}/users/@me/guilds", 
-                                  headers=headers, timeout=10)
+            response = await self._request('GET', f"{self.DISCORD_API_BASE}/users/@me/guilds", headers=headers)
             response.raise_for_status()
             guilds = response.json()
             
-            logger.info(f"[GUILD_CHECK] Пользователь состоит в {len(guilds)} серверах")
-            logger.info(f"[GUILD_CHECK] Список серверов пользователя:")
-            for guild in guilds:
-                logger.info(f"[GUILD_CHECK]   - {guild['name']} (ID: {guild['id']})")
+            logger.info("[GUILD_CHECK] Пользователь состоит в %d серверах", len(guilds))
+            if logger.isEnabledFor(logging.DEBUG):
+                for guild in guilds:
+                    logger.debug("[GUILD_CHECK]   - %s (ID: %s)", guild['name'], guild['id'])
             
             # Проверяем, есть ли наш сервер в списке
             target_guild_id = str(self.GUILD_ID)
             is_member = any(guild['id'] == target_guild_id for guild in guilds)
             
-            logger.info(f"[GUILD_CHECK] Ищем сервер с ID: {target_guild_id}")
-            logger.info(f"[GUILD_CHECK] Результат проверки: {'УЧАСТНИК' if is_member else 'НЕ УЧАСТНИК'}")
+            logger.info("[GUILD_CHECK] Ищем сервер с ID: %s", target_guild_id)
+            logger.info("[GUILD_CHECK] Результат проверки: %s", 'УЧАСТНИК' if is_member else 'НЕ УЧАСТНИК')
             
             if is_member:
-                logger.info(f"Пользователь {user_id} является участником сервера")
+                logger.info("Пользователь %s является участником сервера", user_id)
             else:
                 logger.warning(f"Пользователь {user_id} НЕ является участником сервера {target_guild_id}")
                 logger.warning(f"Возможные причины:")
@@ -185,15 +424,104 @@ class DiscordAuth:
             
             return is_member
             
-        except requests.RequestException as e:
+        except DISCORD_HTTP_ERRORS as e:
             logger.error(f"Ошибка при проверке членства в сервере: {e}")
             if hasattr(e, 'response') and e.response is not None:
                 logger.error(f"HTTP статус: {e.response.status_code}")
                 logger.error(f"Ответ: {e.response.text}")
             return False
     
-    def create_user_session(self, user_data, guild_member, access_token):
-        """Создает сессию пользователя"""
+    async def get_user_guilds(self, access_token):
+        """Получает список серверов пользователя вместе с его правами на них"""
+        headers = {
+            'Authorization': f'Bearer {access_token}',
+            'Content-Type': 'application/json'
+        }
+        response = await self._request('GET', f"{self.DISCORD_API_BASE}/users/@me/guilds", headers=headers)
+        response.raise_for_status()
+        return response.json()
+    
+    async def get_guild_member(self, access_token):
+        """
+        Получает запись пользователя на нашем сервере (роли, ник) по OAuth токену.
+        
+        Returns:
+            dict: Данные участника или None, если пользователь не на сервере
+        """
+        headers = {
+            'Authorization': f'Bearer {access_token}',
+            'Content-Type': 'application/json'
+        }
+        response = await self._request('GET', f"{self.DISCORD_API_BASE}/users/@me/guilds/{self.GUILD_ID}/member",
+                                 headers=headers)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+    
+    async def fetch_login_data(self, access_token):
+        """
+        Параллельно загружает всё, что нужно для входа: пользователя, список
+        серверов и запись участника сервера, и вычисляет по ним права.
+        
+        Args:
+            access_token: OAuth токен доступа
+            
+        Returns:
+            dict: user, guild_member, is_admin, is_minebuild_member
+        """
+        user_data, guilds, member = await asyncio.gather(
+            self.get_user_info(access_token),
+            self.get_user_guilds(access_token),
+            self.get_guild_member(access_token),
+            return_exceptions=True
+        )
+        
+        # Без пользователя вход невозможен - ошибка пробрасывается наверх
+        if isinstance(user_data, BaseException):
+            raise user_data
+        user_id = user_data['id']
+        
+        if isinstance(guilds, BaseException):
+            logger.error(f"[LOGIN] Не удалось получить список серверов пользователя {user_id}: {guilds}")
+            guilds = []
+        
+        member_fetched = True
+        if isinstance(member, BaseException):
+            logger.warning(f"[LOGIN] Не удалось получить запись участника {user_id}: {member}")
+            member, member_fetched = None, False
+        
+        target_guild_id = str(self.GUILD_ID)
+        target_guild = next((guild for guild in guilds if guild['id'] == target_guild_id), None)
+        is_member = target_guild is not None or member is not None
+        
+        # ADMINISTRATOR (0x8) берем из прав в списке серверов
+        is_admin = bool(target_guild) and (int(target_guild.get('permissions', '0')) & 0x8) == 0x8
+        
+        if member is not None:
+            is_minebuild = str(get_whitelist_role_id()) in member.get('roles', [])
+        elif is_member and not member_fetched:
+            # Запись участника недоступна (например, из-за лимитов) - проверяем токеном бота
+            is_minebuild = await self.check_minebuild_member(user_id, access_token)
+        else:
+            is_minebuild = False
+        
+        logger.info("[LOGIN] Пользователь %s: участник=%s, админ=%s, майнбилдовец=%s", user_id, is_member, is_admin, is_minebuild)
+        
+        return {
+            'user': user_data,
+            'guild_member': is_member,
+            'is_admin': is_admin,
+            'is_minebuild_member': is_minebuild
+        }
+    
+    async def create_user_session(self, user_data, guild_member, access_token, is_admin=None, is_minebuild_member=None):
+        """
+        Создает сессию пользователя
+        
+        Права, уже вычисленные при входе (is_admin, is_minebuild_member),
+        используются как есть; если они не переданы - запрашиваются у Discord.
+        """
         # Обрабатываем новый формат Discord username (без discriminator)
         discriminator = user_data.get('discriminator', '0')
         if discriminator == '0' or discriminator is None:
@@ -201,8 +529,9 @@ class DiscordAuth:
         else:
             username_display = f"{user_data['username']}#{discriminator}"
         
-        logger.info(f"[SESSION] Создание сессии для пользователя {username_display}")
-        logger.info(f"[SESSION] Session до изменений: {dict(session)}")
+        logger.info("[SESSION] Создание сессии для пользователя %s", username_display)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[SESSION] Ключи сессии до изменений: %s", list(session.keys()))
         
         session.permanent = True
         
@@ -220,29 +549,40 @@ class DiscordAuth:
                 default_avatar = int(discriminator) % 5
             avatar_url = f"https://cdn.discordapp.com/embed/avatars/{default_avatar}.png"
         
+        if not guild_member:
+            is_admin = is_minebuild_member = False
+        if is_admin is None:
+            is_admin = await self.check_admin_permissions(access_token, user_data['id'])
+        if is_minebuild_member is None:
+            is_minebuild_member = await self.check_minebuild_member(user_data['id'], access_token)
+        
         session_data = {
             'user_id': user_data['id'],
             'username': username_display,
             'display_name': user_data['username'],
             'avatar_url': avatar_url,
             'guild_member': guild_member,
-            'is_admin': self.check_admin_permissions(access_token, user_data['id']) if guild_member else False,
-            'is_minebuild_member': self.check_minebuild_member(user_data['id'], access_token) if guild_member else False,
+            'is_admin': is_admin,
+            'is_minebuild_member': is_minebuild_member,
             'admin_check_time': datetime.now().isoformat(),  # Время последней проверки прав
             'last_check': datetime.now().isoformat(),
             'login_time': datetime.now().isoformat(),
-            'application_status': self.get_application_status(user_data['id']),
-            'access_token': access_token  # Сохраняем для периодических проверок
+            'application_status': self.get_application_status(user_data['id'])
         }
         
         # Очищаем сессию и добавляем новые данные
         session.clear()
         session.update(session_data)
         
-        logger.info(f"[SESSION] Создана сессия для пользователя {username_display}")
-        logger.info(f"[SESSION] Данные сессии: {list(session_data.keys())}")
-        logger.info(f"[SESSION] Session permanent: {session.permanent}")
-        logger.info(f"[SESSION] Session data после обновления: {dict(session)}")
+        # После входа выдаем новый ID сессии, чтобы ID до авторизации стал недействителен
+        if hasattr(session, 'regenerate'):
+            session.regenerate()
+        
+        logger.info("[SESSION] Создана сессия для пользователя %s", username_display)
+        logger.info("[SESSION] Данные сессии: %s", list(session_data.keys()))
+        logger.info("[SESSION] Session permanent: %s", session.permanent)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[SESSION] Ключи сессии после обновления: %s", list(session.keys()))
         
         # Принудительно сохраняем сессию
         session.modified = True
@@ -257,27 +597,29 @@ class DiscordAuth:
         
         return None
     
-    def refresh_guild_membership(self):
+    async def refresh_guild_membership(self):
         """Обновляет информацию о членстве в сервере"""
-        if 'access_token' not in session:
-            logger.warning("[MEMBERSHIP] Нет access token для обновления членства")
+        user_id = session.get('user_id')
+        access_token = await self.get_access_token(user_id) if user_id else None
+        if not access_token:
+            # Refresh token отозван или утерян - без выхода require_auth и /login
+            # перенаправляли бы друг на друга бесконечно
+            logger.warning("[MEMBERSHIP] Нет access token для обновления членства, разлогинивание")
+            self.logout()
             return False
         
         try:
-            user_id = session['user_id']
-            access_token = session['access_token']
-            
-            logger.info(f"[MEMBERSHIP] Обновление статуса членства для пользователя {user_id}")
+            logger.info("[MEMBERSHIP] Обновление статуса членства для пользователя %s", user_id)
             
             # Проверяем актуальность токена и членство
-            is_member = self.check_guild_membership(access_token, user_id)
+            is_member = await self.check_guild_membership(access_token, user_id)
             
             # Обновляем данные в сессии
             session['guild_member'] = is_member
             session['last_check'] = datetime.now().isoformat()
             session.modified = True
             
-            logger.info(f"[MEMBERSHIP] Обновлен статус членства: {'УЧАСТНИК' if is_member else 'НЕ УЧАСТНИК'}")
+            logger.info("[MEMBERSHIP] Обновлен статус членства: %s", 'УЧАСТНИК' if is_member else 'НЕ УЧАСТНИК')
             
             # ИЗМЕНЕНИЕ: НЕ разлогиниваем пользователя, если он не участник сервера
             # Пользователь может быть авторизован, но еще не присоединился к серверу
@@ -296,7 +638,7 @@ class DiscordAuth:
         """Выход из системы"""
         user_id = session.get('user_id', 'unknown')
         session.clear()
-        logger.info(f"Пользователь {user_id} разлогинен")
+        logger.info("Пользователь %s разлогинен", user_id)
     
     def is_authenticated(self):
         """Проверяет, авторизован ли пользователь"""
@@ -306,8 +648,59 @@ class DiscordAuth:
         """Проверяет, является ли пользователь участником сервера"""
         return session.get('guild_member', False)
     
-    def check_admin_permissions(self, access_token, user_id):
+    def get_cached_member(self, user_id):
+        """
+        Получает участника сервера из кэша запущенного в этом же процессе бота.
+        
+        Кэш участников бота синхронизируется через gateway (intents.members),
+        поэтому чтение из него не требует обращений к Discord API.
+        
+        Args:
+            user_id: ID пользователя Discord
+            
+        Returns:
+            discord.Member: Участник или None, если бот недоступен или участника нет в кэше
+        """
+        bot = getattr(self.app, 'bot', None) or self.bot
+        if bot is None or not self.GUILD_ID:
+            return None
+        
+        try:
+            if not bot.is_ready():
+                return None
+            guild = bot.get_guild(int(self.GUILD_ID))
+            return guild.get_member(int(user_id)) if guild else None
+        except Exception as e:
+            logger.warning(f"[MEMBER_CACHE] Не удалось прочитать кэш участников бота: {e}")
+            return None
+    
+    async def get_member_info(self, user_id):
+        """
+        Получает права и роли участника из кэша бота - в этом же процессе
+        или в процессе бота через bot_rpc.
+        
+        Args:
+            user_id: ID пользователя Discord
+            
+        Returns:
+            dict: is_admin и role_ids или None, если бот недоступен или участника нет в кэше
+        """
+        bot = getattr(self.app, 'bot', None) or self.bot
+        if isinstance(bot, BotRPCClient):
+            return await bot.get_member_info(user_id) if bot.is_ready() else None
+        
+        member = self.get_cached_member(user_id)
+        return member_info(member) if member is not None else None
+    
+    @single_flight(key=lambda access_token, user_id: str(user_id))
+    async def check_admin_permissions(self, access_token, user_id):
         """Проверяет, имеет ли пользователь права администратора на сервере Discord."""
+        member = await self.get_member_info(user_id)
+        if member is not None:
+            has_admin = member['is_admin']
+            logger.info("[ADMIN_CHECK] Права администратора %s из кэша бота: %s", user_id, 'ДА' if has_admin else 'НЕТ')
+            return has_admin
+        
         try:
             headers = {
                 'Authorization': f'Bearer {access_token}',
@@ -315,11 +708,7 @@ class DiscordAuth:
             }
             
             # Получаем список серверов пользователя с его правами
-            response = requests.get(
-                f"{self.DISCORD_API_BASE}/users/@me/guilds",
-                headers=headers,
-                timeout=10
-            )
+            response = await self._request('GET', f"{self.DISCORD_API_BASE}/users/@me/guilds", headers=headers)
             
             if response.status_code == 200:
                 guilds = response.json()
@@ -345,9 +734,9 @@ class DiscordAuth:
                 # Проверяем битовую маску
                 has_admin = (permissions & 0x8) == 0x8
                 
-                logger.info(f"[ADMIN_CHECK] Пользователь {user_id} на сервере {target_guild['name']}")
-                logger.info(f"[ADMIN_CHECK] Права пользователя (битовая маска): {permissions}")
-                logger.info(f"[ADMIN_CHECK] Права администратора: {'ДА' if has_admin else 'НЕТ'}")
+                logger.info("[ADMIN_CHECK] Пользователь %s на сервере %s", user_id, target_guild['name'])
+                logger.info("[ADMIN_CHECK] Права пользователя (битовая маска): %s", permissions)
+                logger.info("[ADMIN_CHECK] Права администратора: %s", 'ДА' if has_admin else 'НЕТ')
                 
                 return has_admin
             else:
@@ -361,7 +750,8 @@ class DiscordAuth:
             logger.exception(e)
             return False
     
-    def check_minebuild_member(self, user_id, access_token):
+    @single_flight(key=lambda user_id, access_token: str(user_id))
+    async def check_minebuild_member(self, user_id, access_token):
         """
         Проверяет, является ли пользователь участником MineBuild (имеет роль whitelist)
         
@@ -373,11 +763,18 @@ class DiscordAuth:
             bool: True если пользователь имеет роль whitelist, False - если нет
         """
         try:
-            logger.info(f"[MEMBER_CHECK] Проверка роли майнбилдовца для пользователя {user_id}")
+            logger.info("[MEMBER_CHECK] Проверка роли майнбилдовца для пользователя %s", user_id)
             
             # Получаем ID роли whitelist из конфигурации бота
             whitelist_role_id = get_whitelist_role_id()
-            logger.info(f"[MEMBER_CHECK] ID роли whitelist: {whitelist_role_id}")
+            logger.info("[MEMBER_CHECK] ID роли whitelist: %s", whitelist_role_id)
+            
+            # Сначала смотрим в кэш участников бота - без сетевых запросов
+            member = await self.get_member_info(user_id)
+            if member is not None:
+                has_whitelist_role = int(whitelist_role_id) in member['role_ids']
+                logger.info("[MEMBER_CHECK] Роль майнбилдовца из кэша бота: %s", 'ДА' if has_whitelist_role else 'НЕТ')
+                return has_whitelist_role
             
             # Проверяем, что у нас есть токен бота
             if not self.BOT_TOKEN:
@@ -385,13 +782,13 @@ class DiscordAuth:
                 return False
             
             # Получаем информацию о пользователе на сервере
-            url = f"https://discord.com/api/v10/guilds/{self.GUILD_ID}/members/{user_id}"
+            url = f"{self.DISCORD_API_BASE}/guilds/{self.GUILD_ID}/members/{user_id}"
             headers = {'Authorization': f'Bot {self.BOT_TOKEN}'}
             
-            logger.debug(f"[MEMBER_CHECK] Запрос к: {url}")
-            logger.debug(f"[MEMBER_CHECK] Headers: Bot {self.BOT_TOKEN[:10]}...")
+            logger.debug("[MEMBER_CHECK] Запрос к: %s", url)
+            logger.debug("[MEMBER_CHECK] Headers: Bot %s...", self.BOT_TOKEN[:10])
             
-            response = requests.get(url, headers=headers)
+            response = await self._request('GET', url, headers=headers)
             
             if response.status_code == 200:
                 member_data = response.json()
@@ -400,9 +797,9 @@ class DiscordAuth:
                 # Проверяем, есть ли у пользователя роль whitelist
                 has_whitelist_role = str(whitelist_role_id) in user_roles
                 
-                logger.info(f"[MEMBER_CHECK] Роли пользователя: {user_roles}")
-                logger.info(f"[MEMBER_CHECK] Ищем роль: {whitelist_role_id}")
-                logger.info(f"[MEMBER_CHECK] Роль майнбилдовца: {'ДА' if has_whitelist_role else 'НЕТ'}")
+                logger.info("[MEMBER_CHECK] Роли пользователя: %s", user_roles)
+                logger.info("[MEMBER_CHECK] Ищем роль: %s", whitelist_role_id)
+                logger.info("[MEMBER_CHECK] Роль майнбилдовца: %s", 'ДА' if has_whitelist_role else 'НЕТ')
                 
                 return has_whitelist_role
             else:
@@ -444,22 +841,22 @@ class DiscordAuth:
     def update_application_status(self, status):
         """Обновляет статус заявки в сессии"""
         session['application_status'] = status
-        logger.info(f"Обновлен статус заявки для пользователя {session.get('user_id')}: {status}")
+        logger.info("Обновлен статус заявки для пользователя %s: %s", session.get('user_id'), status)
 
 # Декораторы для проверки авторизации
 def require_auth(f):
     """Декоратор для маршрутов, требующих авторизации"""
     @wraps(f)
-    def decorated_function(*args, **kwargs):
+    async def decorated_function(*args, **kwargs):
         auth = current_app.discord_auth
         
-        logger.info(f"[AUTH] Проверка авторизации для {f.__name__}")
-        logger.info(f"[AUTH] Session содержимое: {dict(session)}")
-        logger.info(f"[AUTH] is_authenticated(): {auth.is_authenticated()}")
-        logger.info(f"[AUTH] user_id в сессии: {'user_id' in session}")
+        # Горячий путь: сообщения с ленивыми %-аргументами, содержимое сессии - только на DEBUG
+        logger.debug("[AUTH] Проверка авторизации для %s", f.__name__)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[AUTH] Ключи сессии: %s", list(session.keys()))
         
         if not auth.is_authenticated():
-            logger.info("[AUTH] Неавторизованный доступ, перенаправление на логин")
+            logger.info("[AUTH] Неавторизованный доступ к %s, перенаправление на логин", f.__name__)
             return redirect(url_for('login'))
         
         # Проверяем, не нужно ли обновить информацию о членстве
@@ -469,17 +866,17 @@ def require_auth(f):
             # Проверяем каждый час
             if datetime.now() - last_check_time > timedelta(hours=1):
                 logger.info("[AUTH] Обновление информации о членстве в сервере")
-                if not auth.refresh_guild_membership():
+                if not await auth.refresh_guild_membership():
                     return redirect(url_for('login'))
         
-        logger.info(f"[AUTH] Авторизация пройдена для {f.__name__}")
-        return f(*args, **kwargs)
+        logger.debug("[AUTH] Авторизация пройдена для %s", f.__name__)
+        return await f(*args, **kwargs)
     return decorated_function
 
 def require_guild_member(f):
     """Декоратор для маршрутов, требующих членства в Discord сервере"""
     @wraps(f)
-    def decorated_function(*args, **kwargs):
+    async def decorated_function(*args, **kwargs):
         auth = current_app.discord_auth
         
         if not auth.is_authenticated():
@@ -489,35 +886,38 @@ def require_guild_member(f):
             logger.info("Пользователь не является участником сервера")
             return redirect(url_for('join_server'))
         
-        return f(*args, **kwargs)
+        return await f(*args, **kwargs)
     return decorated_function
 
 def can_submit_application(f):
     """Декоратор для проверки возможности подать заявку"""
     @wraps(f)
-    def decorated_function(*args, **kwargs):
+    async def decorated_function(*args, **kwargs):
         auth = current_app.discord_auth
         current_user = auth.get_current_user()
         
         if not current_user:
             return redirect(url_for('login'))
         
-        # Проверяем актуальный статус заявки из файла
-        from app import get_application_status
-        application_status_data = get_application_status(current_user['user_id'])
+        # Проверяем актуальный статус заявки из хранилища статусов
+        try:
+            application_status_data = get_status_store().get(current_user['user_id'])
+        except Exception as e:
+            logger.error(f"Ошибка при получении статуса заявки для {current_user['user_id']}: {e}")
+            application_status_data = None
         
         if application_status_data:
             app_status = application_status_data['status']
             # Блокируем подачу заявки если статус: pending или candidate
             # Разрешаем только если: approved, rejected, или нет статуса
             if app_status in ['pending', 'candidate']:
-                logger.info(f"Пользователь {current_user['user_id']} пытается подать заявку повторно (статус: {app_status})")
+                logger.info("Пользователь %s пытается подать заявку повторно (статус: %s)", current_user['user_id'], app_status)
                 return redirect(url_for('application_pending'))
         else:
-            # Если статуса нет в файле, очищаем сессию
+            # Если статуса нет в хранилище, очищаем сессию
             if 'application_status' in session:
                 session.pop('application_status', None)
-                logger.info(f"Очищен устаревший статус заявки из сессии для пользователя {current_user['user_id']}")
+                logger.info("Очищен устаревший статус заявки из сессии для пользователя %s", current_user['user_id'])
         
-        return f(*args, **kwargs)
+        return await f(*args, **kwargs)
     return decorated_function
@@ -3,10 +3,15 @@
 """
 
 import os
-import logging
 import sys
+import time
+import queue
+import atexit
+import logging
 import platform
+import threading
 from collections import defaultdict
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from dotenv import load_dotenv
 
 # Настройка кодировки вывода для Windows
@@ -19,6 +24,163 @@ if platform.system() == 'Windows':
 load_dotenv()
 
 
+# Формат логов и ротация файлов по размеру
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_MAX_BYTES = 10 * 1024 * 1024   # Размер файла лога до ротации
+LOG_BACKUP_COUNT = 5               # Сколько старых файлов хранить
+
+# Запущенные фоновые обработчики очередей логов
+_log_listeners = []
+# Общий конвейер корневого логгера (сайт и бот в одном процессе пишут через него)
+_root_listener = None
+_root_lock = threading.Lock()
+
+
+def create_file_handler(path: str) -> RotatingFileHandler:
+    """Создает файловый обработчик с ротацией по размеру."""
+    handler = RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    return handler
+
+
+def start_queue_logging(logger: logging.Logger, handlers) -> QueueListener:
+    """
+    Переводит логгер на очередь: вызывающий поток только кладет запись
+    в очередь, а запись в консоль и файлы выполняет фоновый QueueListener.
+
+    Args:
+        logger: Логгер, к которому подключается QueueHandler
+        handlers: Обработчики, которые будут писать записи из очереди
+
+    Returns:
+        QueueListener: Запущенный обработчик очереди
+    """
+    log_queue = queue.SimpleQueue()
+    for handler in handlers:
+        if handler.formatter is None:
+            handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    logger.addHandler(QueueHandler(log_queue))
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _log_listeners.append(listener)
+    return listener
+
+
+def add_root_log_handlers(handlers) -> QueueListener:
+    """
+    Подключает обработчики к общему конвейеру корневого логгера.
+
+    Конвейер (QueueHandler на корневом логгере, консоль и фоновый QueueListener)
+    создается при первом вызове; следующие точки входа только добавляют свои
+    файлы, не отключая уже подключенные.
+
+    Args:
+        handlers: Дополнительные обработчики (например, файлы логов)
+
+    Returns:
+        QueueListener: Обработчик очереди корневого логгера
+    """
+    global _root_listener
+    with _root_lock:
+        if _root_listener is None:
+            for handler in list(logging.root.handlers):
+                logging.root.removeHandler(handler)
+            console_handler = logging.StreamHandler(sys.stdout)
+            console_handler.setLevel(logging.INFO)
+            _root_listener = start_queue_logging(logging.root, [console_handler])
+        # Повторная настройка (setup_logging вызывается при импорте и из main.py)
+        # не должна писать в один файл дважды
+        attached = {getattr(handler, 'baseFilename', None) for handler in _root_listener.handlers}
+        added = []
+        for handler in handlers:
+            path = getattr(handler, 'baseFilename', None)
+            if path is not None and path in attached:
+                handler.close()
+                continue
+            if handler.formatter is None:
+                handler.setFormatter(logging.Formatter(LOG_FORMAT))
+            added.append(handler)
+        # Поток обработчика читает кортеж handlers целиком, замена атомарна
+        _root_listener.handlers = _root_listener.handlers + tuple(added)
+        return _root_listener
+
+
+def stop_logging():
+    """Дописывает накопленные записи и останавливает фоновые обработчики логов."""
+    global _root_listener
+    with _root_lock:
+        if _root_listener is not None:
+            for handler in list(logging.root.handlers):
+                if isinstance(handler, QueueHandler):
+                    logging.root.removeHandler(handler)
+            _root_listener = None
+    while _log_listeners:
+        listener = _log_listeners.pop()
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+atexit.register(stop_logging)
+
+
+class LogSamplingFilter(logging.Filter):
+    """
+    Ограничивает частоту однотипных сообщений логгера.
+
+    Одинаковые шаблоны сообщений ниже WARNING пропускаются не чаще
+    max_records раз за interval секунд; предупреждения и ошибки не отбрасываются.
+    """
+
+    def __init__(self, max_records: int, interval: float = 1.0):
+        super().__init__()
+        self.max_records = max_records
+        self.interval = interval
+        self.dropped = 0
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        now = time.monotonic()
+        key = (record.name, record.msg)
+        with self._lock:
+            started, count = self._windows.get(key, (now, 0))
+            if now - started >= self.interval:
+                started, count = now, 0
+            if count >= self.max_records:
+                self.dropped += 1
+                return False
+            self._windows[key] = (started, count + 1)
+            if len(self._windows) > 1000:
+                self._windows = {key: self._windows[key]}
+            return True
+
+
+def set_log_sampling(logger_name: str, max_records: int, interval: float = 1.0) -> LogSamplingFilter:
+    """
+    Ограничивает частоту однотипных сообщений указанного логгера.
+
+    Args:
+        logger_name: Имя логгера
+        max_records: Максимум одинаковых сообщений за интервал
+        interval: Интервал (секунды)
+
+    Returns:
+        LogSamplingFilter: Подключенный фильтр
+    """
+    logger = logging.getLogger(logger_name)
+    for existing in list(logger.filters):
+        if isinstance(existing, LogSamplingFilter):
+            logger.removeFilter(existing)
+    sampling_filter = LogSamplingFilter(max_records, interval)
+    logger.addFilter(sampling_filter)
+    return sampling_filter
+
+
 def setup_logging():
     """Настройка системы логирования для бота"""
     
@@ -32,26 +194,20 @@ def setup_logging():
         use_file_logging = False
         print(f"⚠️ Не удалось создать директорию {logs_dir}, логи будут выводиться только в консоль")
     
-    # Отключаем существующие обработчики корневого логгера
-    for handler in logging.root.handlers:
-        logging.root.removeHandler(handler)
-
-    # Создаем список обработчиков
-    handlers = [logging.StreamHandler(sys.stdout)]
+    # Консоль и main.log сайта уже могут быть подключены к общему конвейеру -
+    # бот добавляет к ним свой файл
+    handlers = []
     
     # Добавляем файловый обработчик только если возможно
     if use_file_logging:
         try:
-            handlers.append(logging.FileHandler("bot/logs/bot.log", encoding='utf-8'))
+            handlers.append(create_file_handler("bot/logs/bot.log"))
         except (PermissionError, OSError):
             print("⚠️ Не удалось создать файл лога, используется только консольный вывод")
 
-    # Настройка основного логирования
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=handlers
-    )
+    # Настройка основного логирования: запись в консоль и файл - в фоновом потоке
+    logging.root.setLevel(logging.INFO)
+    add_root_log_handlers(handlers)
     
     # Создаем основной логгер бота
     logger = logging.getLogger("MineBuildBot")
@@ -60,17 +216,14 @@ def setup_logging():
     discord_logger = logging.getLogger('discord')
     discord_logger.setLevel(logging.INFO)
     if not discord_logger.handlers:
-        discord_logger.addHandler(logging.StreamHandler(sys.stdout))
+        discord_handlers = [logging.StreamHandler(sys.stdout)]
         # Добавляем файловый обработчик для Discord логов только если возможно
         if use_file_logging:
             try:
-                discord_file_handler = logging.FileHandler("bot/logs/discord.log", encoding='utf-8')
-                discord_file_handler.setFormatter(
-                    logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-                )
-                discord_logger.addHandler(discord_file_handler)
+                discord_handlers.append(create_file_handler("bot/logs/discord.log"))
             except (PermissionError, OSError):
                 pass  # Игнорируем ошибку, используем только консольный вывод
+        start_queue_logging(discord_logger, discord_handlers)
     
     return logger
 
@@ -89,6 +242,9 @@ DONATOR_ROLE_ID = 1153006749218000918
 # Глобальный кэш для отслеживания заявок
 recent_applications = defaultdict(list)
 DEDUP_WINDOW = 60  # Окно в секундах для дедупликации
+# Сколько бот ждет отправки заявки в канал (секунды). Попытку, прерванную
+# позже этого срока, бот считает завершенной и ищет ее сообщение в канале
+APPLICATION_SEND_TIMEOUT = 30
 
 # Словарь соответствий ID вопросов их названиям
 QUESTION_MAPPING = {
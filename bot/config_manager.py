@@ -24,6 +24,8 @@ class BotConfig:
         """
         self.config_path = Path(config_path)
         self.config_data = {}
+        # Счетчик изменений в памяти (в т.ч. без сохранения в файл)
+        self.revision = 0
         
         # Создаем директорию data если не существует
         self.config_path.parent.mkdir(exist_ok=True)
@@ -91,7 +93,13 @@ class BotConfig:
                     "api_request": 10               # Таймаут API запросов
                 },
                 "application": {
-                    "deduplication_window": 60      # Окно дедупликации заявок (секунды)
+                    "deduplication_window": 60,     # Окно дедупликации заявок (секунды)
+                    "pending_ttl_days": 30,         # Срок жизни статуса "на рассмотрении" (дни, 0 - бессрочно)
+                    "candidate_ttl_days": 60        # Срок жизни статуса "кандидат" (дни, 0 - бессрочно)
+                },
+                "permissions": {
+                    "refresh_interval": 60,         # Как часто перепроверять права пользователя на сайте (секунды)
+                    "stale_window": 3600            # Сколько отдавать старые права, обновляя их в фоне (секунды)
                 }
             },
             
@@ -230,6 +238,7 @@ class BotConfig:
             
             # Устанавливаем значение
             target[keys[-1]] = value
+            self.revision += 1
             
             if save:
                 self._save_config()
@@ -263,6 +272,13 @@ class BotConfig:
         
         return success
     
+    def version(self) -> str:
+        """
+        Возвращает версию конфигурации для ETag: время последнего сохранения
+        и номер изменения в памяти.
+        """
+        return f"{self.config_data.get('_metadata', {}).get('updated_at')}-{self.revision}"
+    
     def validate_discord_ids(self) -> Dict[str, bool]:
         """
         Проверяет валидность Discord ID в конфигурации.
@@ -489,7 +505,13 @@ class BotConfig:
                     "api_request": self.get("system.timeouts.api_request")
                 },
                 "application": {
-                    "deduplication_window": self.get("system.application.deduplication_window")
+                    "deduplication_window": self.get("system.application.deduplication_window"),
+                    "pending_ttl_days": self.get("system.application.pending_ttl_days"),
+                    "candidate_ttl_days": self.get("system.application.candidate_ttl_days")
+                },
+                "permissions": {
+                    "refresh_interval": self.get("system.permissions.refresh_interval"),
+                    "stale_window": self.get("system.permissions.stale_window")
                 }
             }
         }
@@ -593,6 +615,34 @@ def get_shutdown_timeouts() -> Dict[str, int]:
     }
 
 
+def get_application_status_ttls() -> Dict[str, float]:
+    """Получает сроки жизни статусов заявок в секундах (0 - бессрочно)."""
+    config = get_config()
+    ttls = {}
+    for status, default_days in (("pending", 30), ("candidate", 60)):
+        value = config.get(f"system.application.{status}_ttl_days", default_days)
+        try:
+            ttls[status] = max(float(value), 0) * 86400
+        except (TypeError, ValueError):
+            logger.warning(f"Не удалось преобразовать срок жизни статуса {status} '{value}' в число")
+            ttls[status] = default_days * 86400
+    return ttls
+
+
+def get_permission_refresh_windows() -> Dict[str, float]:
+    """Получает интервал перепроверки прав и окно выдачи устаревших прав (секунды)."""
+    config = get_config()
+    windows = {}
+    for name, default in (("refresh_interval", 60), ("stale_window", 3600)):
+        value = config.get(f"system.permissions.{name}", default)
+        try:
+            windows[name] = max(float(value), 0)
+        except (TypeError, ValueError):
+            logger.warning(f"Не удалось преобразовать настройку прав {name} '{value}' в число")
+            windows[name] = float(default)
+    return windows
+
+
 def get_minebuild_member_role_id() -> int:
     """Получает ID роли майнбилдовца."""
     value = get_config().get("discord.roles.minebuild_member", 0)
@@ -3,6 +3,7 @@
 """
 
 import os
+import time
 import logging
 import signal
 import asyncio
@@ -12,13 +13,15 @@ from discord.ext import commands
 from .config import (
     setup_logging,
     DISCORD_TOKEN,
-    GUILD_ID
+    GUILD_ID,
+    APPLICATION_SEND_TIMEOUT
 )
 from .config_manager import (
     get_whitelist_role_id,
     get_log_channel_id,
     get_donation_channel_id,
-    get_donator_role_id
+    get_donator_role_id,
+    get_candidate_role_id
 )
 from .ui.views import (
     PersistentApplicationView, 
@@ -26,6 +29,12 @@ from .ui.views import (
     PersistentViewManager
 )
 from .utils.minecraft import execute_minecraft_command
+from .utils.applications import (
+    create_application_message as send_application_message,
+    find_application_message,
+    get_application_deliveries
+)
+from .utils.status_sync import get_status_sync
 
 # Настройка логирования (только если не в тестовом режиме)
 import sys
@@ -76,6 +85,9 @@ class MineBuildBot(commands.Bot):
         # Менеджер персистентных представлений
         self.persistent_view_manager = PersistentViewManager(self)
         
+        # Сервер вызовов бота для отдельных процессов сайта (если задан BOT_RPC_SOCKET)
+        self.rpc_server = None
+        
     async def setup_hook(self) -> None:
         """Хук настройки для инициализации необходимых компонентов."""
         # Загружаем расширения (cogs)
@@ -85,6 +97,20 @@ class MineBuildBot(commands.Bot):
         except Exception as e:
             logger.error(f"Ошибка при загрузке модуля admin: {e}")
         
+        # Запускаем отправку статусов заявок на сайт (в том числе оставшихся с прошлого запуска)
+        await get_status_sync().start()
+        
+        # Принимаем вызовы воркеров сайта, запущенных отдельными процессами
+        rpc_socket = os.getenv('BOT_RPC_SOCKET')
+        if rpc_socket:
+            from bot_rpc import BotRPCServer
+            try:
+                self.rpc_server = BotRPCServer(self, rpc_socket)
+                await self.rpc_server.start()
+            except Exception as e:
+                self.rpc_server = None
+                logger.error(f"Не удалось открыть сокет вызовов бота {rpc_socket}: {e}")
+        
         # Регистрируем персистентные представления
         self.persistent_view_manager.register_view(PersistentApplicationView, "ApplicationView")
         self.persistent_view_manager.register_view(PersistentMemberLeaveView, "MemberLeaveView")
@@ -190,29 +216,128 @@ class MineBuildBot(commands.Bot):
         except Exception as e:
             logger.error(f"Ошибка при обработке выхода пользователя: {e}", exc_info=True)
     
-    async def handle_donation(self, nickname: str, amount: int) -> bool:
+    async def create_application_message(self, discord_id, embed: discord.Embed,
+                                         submission_id: str = None) -> bool:
         """
-        Обрабатывает донат в зависимости от суммы и выполняет соответствующие действия:
-        - Благодарственное сообщение для всех донатов от 100₽
-        - Выдача роли донатера за донаты от 300₽
-        - Установка суффикса через RCON за донаты от 500₽
+        Отправляет заявку с сайта в канал заявок.
+
+        Повтор заявки с тем же submission_id (очередь сайта повторяет задачу после
+        таймаута или перезапуска) не создает второе сообщение: бот сверяется с
+        журналом отправки, а если исход прошлой попытки неизвестен - ищет
+        сообщение заявки в канале.
         
         Args:
-            nickname: Никнейм игрока
-            amount: Сумма доната в рублях
+            discord_id: Discord ID автора заявки
+            embed: Embed с данными заявки
+            submission_id: ID заявки в очереди сайта (ключ идемпотентности)
             
         Returns:
-            bool: True если обработка прошла успешно, False в случае ошибки
+            bool: True если сообщение отправлено (или это повтор уже отправленной заявки)
+
+        Raises:
+            RuntimeError: Прошлая попытка отправки этой заявки еще может выполняться
+            asyncio.TimeoutError: Discord не принял заявку за APPLICATION_SEND_TIMEOUT
+        """
+        channel = self.channel_for_applications
+        if channel is None:
+            logger.error("Канал для заявок не найден, заявка не отправлена")
+            return False
+        if submission_id is None:
+            message_id = await asyncio.wait_for(
+                send_application_message(channel, discord_id, embed), APPLICATION_SEND_TIMEOUT
+            )
+            return message_id is not None
+
+        deliveries = get_application_deliveries()
+        delivery = await asyncio.to_thread(deliveries.get, submission_id)
+        if delivery is not None:
+            if delivery['message_id'] is not None:
+                logger.info("Заявка %s уже отправлена (сообщение %s)", submission_id, delivery['message_id'])
+                return True
+            if time.time() - delivery['started_at'] < APPLICATION_SEND_TIMEOUT:
+                raise RuntimeError(f"Исход прошлой отправки заявки {submission_id} еще неизвестен")
+            message_id = await find_application_message(channel, submission_id)
+            if message_id is not None:
+                logger.info("Заявка %s найдена в канале (сообщение %s)", submission_id, message_id)
+                await asyncio.to_thread(deliveries.mark_sent, submission_id, message_id)
+                return True
+
+        await asyncio.to_thread(deliveries.begin, submission_id)
+        message_id = await asyncio.wait_for(
+            send_application_message(channel, discord_id, embed, submission_id=submission_id),
+            APPLICATION_SEND_TIMEOUT
+        )
+        if message_id is None:
+            return False
+        await asyncio.to_thread(deliveries.mark_sent, submission_id, message_id)
+        return True
+
+    async def handle_application_expired(self, discord_id: str, status: str) -> None:
+        """
+        Обрабатывает истечение срока статуса заявки: снимает роль кандидата
+        и сообщает об этом в лог-канал.
+
+        Args:
+            discord_id: Discord ID пользователя
+            status: Статус, срок которого истек
         """
         try:
-            # Получаем канал для отправки сообщений о донатах
-            donation_channel = self.get_channel(get_donation_channel_id())
-            if not donation_channel:
-                logger.error(f"Не удалось найти канал для донатов с ID {get_donation_channel_id()}")
-                return False
+            log_channel = self.get_channel(get_log_channel_id())
+            guild = log_channel.guild if log_channel else self.get_guild(int(GUILD_ID))
+
+            if status == 'candidate' and guild:
+                member = guild.get_member(int(discord_id))
+                candidate_role = guild.get_role(get_candidate_role_id())
+                if member and candidate_role and candidate_role in member.roles:
+                    await member.remove_roles(candidate_role, reason="Истек срок статуса кандидата")
+                    logger.info(f"Снята роль кандидата с пользователя {discord_id} по истечении срока")
+
+            if log_channel:
+                await log_channel.send(
+                    f"⌛ Истек срок статуса заявки **{status}** пользователя <@{discord_id}>, статус сброшен"
+                )
+            logger.info(f"Обработано истечение статуса {status} пользователя {discord_id}")
+        except Exception as e:
+            logger.error(f"Ошибка при обработке истечения статуса заявки {discord_id}: {e}", exc_info=True)
+
+    @staticmethod
+    def get_donation_steps(amount: int) -> list:
+        """
+        Возвращает шаги выдачи наград за донат в порядке выполнения:
+        - announce: благодарственное сообщение для всех донатов от 100₽
+        - role: роль донатера за донаты от 300₽
+        - suffix: суффикс через RCON за донаты от 500₽
+        
+        Args:
+            amount: Сумма доната в рублях
+            
+        Returns:
+            list: Названия шагов
+        """
+        steps = ['announce']
+        if amount >= 300:
+            steps.append('role')
+        if amount >= 500:
+            steps.append('suffix')
+        return steps
 
-            logger.info(f"Обработка доната: игрок={nickname}, сумма={amount}₽")
+    async def run_donation_step(self, step: str, nickname: str, amount: int) -> None:
+        """
+        Выполняет один шаг выдачи наград за донат. Шаги можно повторять по отдельности.
+        
+        Args:
+            step: Название шага (см. get_donation_steps)
+            nickname: Никнейм игрока
+            amount: Сумма доната в рублях
+            
+        Raises:
+            RuntimeError: Если шаг не выполнен и его стоит повторить
+        """
+        donation_channel = self.get_channel(get_donation_channel_id())
+        if not donation_channel:
+            raise RuntimeError(f"Не удалось найти канал для донатов с ID {get_donation_channel_id()}")
 
+        if step == 'announce':
             # Создаем красивое embed-сообщение с благодарностью
             embed = discord.Embed(
                 title="Новый донат!",
@@ -244,48 +369,87 @@ class MineBuildBot(commands.Bot):
             await donation_channel.send(embed=embed)
             logger.info(f"Отправлено сообщение о донате игрока {nickname} на сумму {amount}₽")
 
-            # Если сумма доната 300₽ и больше - выдаем роль Благодеятеля
-            if amount >= 300:
-                # Получаем сервер
-                guild = donation_channel.guild
-                
-                # Найти пользователя по нику
-                member = None
-                for m in guild.members:
-                    member_nick = m.nick or m.name
-                    if member_nick.lower() == nickname.lower():
-                        member = m
-                        break
-                
-                if member:
-                    # Выдаем роль Благодеятеля
-                    donator_role = guild.get_role(get_donator_role_id())
-                    if donator_role:
-                        await member.add_roles(donator_role)
-                        logger.info(f"Выдана роль Благодеятеля пользователю {nickname}")
-                    else:
-                        logger.error(f"Не удалось найти роль Благодеятеля с ID {get_donator_role_id()}")
+        elif step == 'role':
+            # Получаем сервер
+            guild = donation_channel.guild
+            
+            # Найти пользователя по нику
+            member = None
+            for m in guild.members:
+                member_nick = m.nick or m.name
+                if member_nick.lower() == nickname.lower():
+                    member = m
+                    break
+            
+            if member:
+                # Выдаем роль Благодеятеля
+                donator_role = guild.get_role(get_donator_role_id())
+                if donator_role:
+                    await member.add_roles(donator_role)
+                    logger.info(f"Выдана роль Благодеятеля пользователю {nickname}")
                 else:
-                    logger.warning(f"Не удалось найти пользователя с ником {nickname} для выдачи роли Благодеятеля")
+                    logger.error(f"Не удалось найти роль Благодеятеля с ID {get_donator_role_id()}")
+            else:
+                logger.warning(f"Не удалось найти пользователя с ником {nickname} для выдачи роли Благодеятеля")
 
-            # Если сумма доната 500₽ и больше - выдаем суффикс через RCON
-            if amount >= 500:
-                # Выполняем команду на сервере Minecraft через RCON
-                success = await execute_minecraft_command(f"lp user {nickname} permission set title.u.donate")
-                
-                if success:
-                    logger.info(f"Выдан суффикс донатера игроку {nickname}")
-                else:
-                    logger.error(f"Не удалось выдать суффикс донатера игроку {nickname}")
-                    
-                    # Отправляем сообщение о проблеме
-                    error_embed = discord.Embed(
-                        title="⚠️ Внимание!",
-                        description=f"Не удалось выдать суффикс игроку **{nickname}**. Требуется ручная выдача.",
-                        color=0xFF0000
-                    )
-                    await donation_channel.send(embed=error_embed)
+        elif step == 'suffix':
+            # Выполняем команду на сервере Minecraft через RCON
+            success = await execute_minecraft_command(f"lp user {nickname} permission set title.u.donate")
+            if not success:
+                raise RuntimeError(f"Не удалось выдать суффикс донатера игроку {nickname}")
+            logger.info(f"Выдан суффикс донатера игроку {nickname}")
 
+        else:
+            raise ValueError(f"Неизвестный шаг обработки доната: {step}")
+
+    async def report_donation_failure(self, nickname: str, step: str) -> None:
+        """
+        Сообщает в канал донатов, что шаг выдачи наград требует ручного вмешательства.
+        
+        Args:
+            nickname: Никнейм игрока
+            step: Невыполненный шаг
+        """
+        descriptions = {
+            'announce': f"Не удалось отправить благодарность за донат игрока **{nickname}**.",
+            'role': f"Не удалось выдать роль Благодеятеля игроку **{nickname}**. Требуется ручная выдача.",
+            'suffix': f"Не удалось выдать суффикс игроку **{nickname}**. Требуется ручная выдача.",
+        }
+        donation_channel = self.get_channel(get_donation_channel_id())
+        if not donation_channel:
+            logger.error(f"Не удалось сообщить о проблеме с донатом {nickname}: канал донатов не найден")
+            return
+
+        # Отправляем сообщение о проблеме
+        error_embed = discord.Embed(
+            title="⚠️ Внимание!",
+            description=descriptions.get(step, f"Не удалось обработать донат игрока **{nickname}**."),
+            color=0xFF0000
+        )
+        await donation_channel.send(embed=error_embed)
+
+    async def handle_donation(self, nickname: str, amount: int) -> bool:
+        """
+        Обрабатывает донат целиком: выполняет все шаги выдачи наград без повторов.
+        
+        Args:
+            nickname: Никнейм игрока
+            amount: Сумма доната в рублях
+            
+        Returns:
+            bool: True если обработка прошла успешно, False в случае ошибки
+        """
+        logger.info(f"Обработка доната: игрок={nickname}, сумма={amount}₽")
+        try:
+            for step in self.get_donation_steps(amount):
+                try:
+                    await self.run_donation_step(step, nickname, amount)
+                except RuntimeError as e:
+                    # Суффикс можно выдать вручную - сообщаем об этом и не считаем донат ошибочным
+                    if step != 'suffix':
+                        raise
+                    logger.error(str(e))
+                    await self.report_donation_failure(nickname, step)
             return True
 
         except Exception as e:
@@ -297,6 +461,11 @@ class MineBuildBot(commands.Bot):
         logger.info("🔄 Начинается корректное завершение работы бота...")
         
         try:
+            # Закрываем сокет вызовов бота и соединения синхронизации статусов с сайтом
+            if self.rpc_server is not None:
+                await self.rpc_server.close()
+            await get_status_sync().close()
+            
             # Закрываем персистентные представления
             if hasattr(self, 'persistent_view_manager'):
                 logger.info("Завершение работы менеджера персистентных представлений...")
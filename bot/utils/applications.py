@@ -2,10 +2,13 @@
 Модуль для работы с заявками на сервер MineBuild
 """
 
+import os
 import time
+import sqlite3
 import logging
+import threading
 import discord
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 from ..config import (
     recent_applications,
@@ -15,6 +18,114 @@ from ..config_manager import get_moderator_role_id
 
 logger = logging.getLogger("MineBuildBot.Applications")
 
+# Журнал отправленных заявок с сайта (ключ - submission_id задачи очереди)
+APPLICATION_DELIVERIES_DB_PATH = os.path.join('data', 'application_deliveries.db')
+# Сколько хранить записи журнала (секунды); очередь сайта столько не повторяет
+APPLICATION_DELIVERIES_RETENTION = 30 * 86400
+# Сколько последних сообщений канала просматривать в поисках заявки, отправка
+# которой прервалась без ответа Discord
+APPLICATION_SEARCH_LIMIT = 100
+
+
+class ApplicationDeliveries:
+    """
+    Журнал отправки заявок с сайта на базе SQLite.
+
+    Запись создается перед отправкой в канал (started_at) и дополняется ID
+    сообщения после нее (message_id). Запись без message_id означает, что
+    исход прошлой попытки неизвестен: сообщение могло уйти в Discord.
+    """
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS application_deliveries (
+        submission_id TEXT PRIMARY KEY,
+        message_id INTEGER,
+        started_at REAL NOT NULL,
+        sent_at REAL
+    ) WITHOUT ROWID;
+    """
+
+    def __init__(self, db_path: str = APPLICATION_DELIVERIES_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(self._SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Возвращает соединение текущего потока."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, submission_id: str) -> Optional[Dict[str, Any]]:
+        """Возвращает запись об отправке заявки или None, если отправка не начиналась."""
+        row = self._connection().execute(
+            "SELECT submission_id, message_id, started_at, sent_at FROM application_deliveries "
+            "WHERE submission_id = ?", (submission_id,)
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def begin(self, submission_id: str) -> None:
+        """Отмечает начало попытки отправки (до обращения к Discord)."""
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT INTO application_deliveries (submission_id, started_at) VALUES (?, ?) "
+            "ON CONFLICT(submission_id) DO UPDATE SET started_at = excluded.started_at",
+            (submission_id, now)
+        )
+        conn.execute(
+            "DELETE FROM application_deliveries WHERE started_at < ?",
+            (now - APPLICATION_DELIVERIES_RETENTION,)
+        )
+
+    def mark_sent(self, submission_id: str, message_id: int) -> None:
+        """Отмечает заявку отправленной."""
+        self._connection().execute(
+            "UPDATE application_deliveries SET message_id = ?, sent_at = ? WHERE submission_id = ?",
+            (message_id, time.time(), submission_id)
+        )
+
+
+_deliveries_instance: Optional[ApplicationDeliveries] = None
+
+
+def get_application_deliveries() -> ApplicationDeliveries:
+    """Получить глобальный журнал отправки заявок."""
+    global _deliveries_instance
+    if _deliveries_instance is None:
+        _deliveries_instance = ApplicationDeliveries()
+    return _deliveries_instance
+
+
+def submission_footer(submission_id: str) -> str:
+    """Подпись сообщения заявки, по которой ее можно найти в канале."""
+    return f"Заявка {submission_id}"
+
+
+async def find_application_message(channel: discord.TextChannel, submission_id: str) -> Optional[int]:
+    """
+    Ищет среди последних сообщений канала заявку с указанным submission_id.
+
+    Returns:
+        int: ID найденного сообщения или None
+    """
+    footer = submission_footer(submission_id)
+    async for message in channel.history(limit=APPLICATION_SEARCH_LIMIT):
+        if message.author != channel.guild.me:
+            continue
+        if any(item.footer and item.footer.text == footer for item in message.embeds):
+            return message.id
+    return None
+
 
 def create_embed_with_fields(title: str, fields_data: List[Dict[str, Any]], timestamp=None) -> discord.Embed:
     """
@@ -44,8 +155,9 @@ def create_embed_with_fields(title: str, fields_data: List[Dict[str, Any]], time
 async def create_application_message(
     channel: discord.TextChannel, 
     user_identifier: str, 
-    embed: discord.Embed
-) -> bool:
+    embed: discord.Embed,
+    submission_id: Optional[str] = None
+) -> Optional[int]:
     """
     Создает сообщение с заявкой в указанном канале.
     
@@ -53,19 +165,22 @@ async def create_application_message(
         channel: Канал Discord для отправки заявки
         user_identifier: Идентификатор пользователя (может быть None для новой формы)
         embed: Embed с данными заявки
+        submission_id: ID заявки в очереди сайта; повторы такой заявки отсеивает
+            вызывающий код по журналу отправки, а ID попадает в подпись сообщения
         
     Returns:
-        bool: True если сообщение успешно отправлено, иначе False
+        int: ID отправленного сообщения или None, если заявка не отправлена
+        (в том числе как дубликат без submission_id)
     """
     try:
         # Если user_identifier не передан, это ошибка
         if user_identifier is None:
             logger.error("user_identifier не может быть None для создания заявки")
-            return False
+            return None
         
-        # Проверяем на дубликаты (упрощенная проверка для веб-заявок)
+        # Проверяем на дубликаты (упрощенная проверка для заявок без submission_id)
         current_time = time.time()
-        if user_identifier in recent_applications:
+        if submission_id is None and user_identifier in recent_applications:
             recent_apps = recent_applications[user_identifier]
             
             # Очищаем старые записи
@@ -74,12 +189,12 @@ async def create_application_message(
             # Если есть недавние заявки, пропускаем
             if recent_apps:
                 logger.warning(f"Обнаружен дубликат заявки для пользователя {user_identifier}. Пропускаем.")
-                return False
+                return None
                 
             # Добавляем текущую заявку в список
             recent_apps.append(current_time)
             recent_applications[user_identifier] = recent_apps
-        else:
+        elif submission_id is None:
             recent_applications[user_identifier] = [current_time]
 
         # Разделяем поля на основную и подробную информацию
@@ -136,7 +251,10 @@ async def create_application_message(
         # Проверяем, есть ли хоть один embed для отправки
         if not embeds:
             logger.error(f"Отсутствуют поля для отображения в заявке пользователя {user_identifier}")
-            return False
+            return None
+
+        if submission_id is not None:
+            embeds[-1].set_footer(text=submission_footer(submission_id))
 
         # Отправляем заявку в канал
         view = None
@@ -209,7 +327,7 @@ async def create_application_message(
             except Exception as e:
                 logger.error(f"Ошибка при отправке копии заявки пользователю: {e}", exc_info=True)
 
-        return True
+        return message.id
     except Exception as e:
         logger.error(f"Ошибка при отправке заявки: {e}", exc_info=True)
-        return False
+        return None
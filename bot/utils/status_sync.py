@@ -0,0 +1,454 @@
+"""
+Синхронизация статусов заявок бота с сайтом
+
+Варианты доставки с общим интерфейсом:
+- LocalStatusSync - бот и сайт в одном процессе (main.py): запись идет прямо
+  в хранилище статусов через его поток записи;
+- HTTPStatusSync - сайт на другом хосте: асинхронные запросы к API сайта
+  через общий пул соединений;
+- QueuedStatusSync - сайт на другом хосте, изменения сначала пишутся в
+  локальную очередь (SQLite) и отправляются пачками, переживая недоступность
+  сайта и перезапуск бота.
+
+Ни один вариант не блокирует цикл событий бота.
+"""
+
+import os
+import abc
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+logger = logging.getLogger("MineBuildBot.StatusSync")
+
+# Таймауты запросов к API сайта (секунды)
+STATUS_SYNC_HTTP_TIMEOUT = aiohttp.ClientTimeout(total=10, connect=3)
+# Максимум keep-alive соединений к сайту
+STATUS_SYNC_POOL_SIZE = 4
+
+# Локальная очередь изменений статусов для удаленного сайта
+STATUS_OUTBOX_DB_PATH = os.path.join('data', 'status_outbox.db')
+STATUS_OUTBOX_BATCH = 100          # Максимум изменений в одном запросе
+STATUS_OUTBOX_RETRY_BASE = 2       # Пауза после первой неудачи (секунды)
+STATUS_OUTBOX_RETRY_MAX = 300      # Максимальная пауза между попытками (секунды)
+# Ответы 4xx, после которых пачка повторяется: таймаут, лимит запросов и
+# ошибки ключа API (исправляются настройкой, изменения терять нельзя).
+# Остальные 4xx означают, что сайт отверг изменение, и оно не повторяется
+STATUS_SYNC_RETRY_CODES = (401, 403, 408, 429)
+
+
+def is_rejected(http_status: Optional[int]) -> bool:
+    """Отверг ли сайт изменение окончательно (повтор не поможет)."""
+    return http_status is not None and 400 <= http_status < 500 and http_status not in STATUS_SYNC_RETRY_CODES
+
+
+class StatusSync(abc.ABC):
+    """Интерфейс синхронизации статусов заявок с сайтом."""
+
+    @abc.abstractmethod
+    async def update(self, discord_id: str, status: str, reason: str = '') -> bool:
+        """
+        Сохраняет статус заявки на сайте.
+
+        Args:
+            discord_id: ID пользователя Discord
+            status: Новый статус ('approved', 'rejected', 'candidate')
+            reason: Причина (для отказов)
+
+        Returns:
+            bool: True если статус сохранен
+        """
+
+    @abc.abstractmethod
+    async def clear(self, discord_id: str) -> bool:
+        """
+        Очищает статус заявки на сайте, позволяя подать новую заявку.
+
+        Args:
+            discord_id: ID пользователя Discord
+
+        Returns:
+            bool: True если статус очищен (или его уже не было)
+        """
+
+    async def start(self) -> None:
+        """Запускает фоновую доставку (если она нужна реализации)."""
+
+    async def close(self) -> None:
+        """Освобождает ресурсы (соединения)."""
+
+
+class LocalStatusSync(StatusSync):
+    """Запись статусов напрямую в хранилище сайта в том же процессе."""
+
+    def __init__(self, writer=None):
+        """
+        Args:
+            writer: Поток записи статусов (по умолчанию глобальный StatusWriter сайта)
+        """
+        self._writer = writer
+
+    def _get_writer(self):
+        if self._writer is None:
+            from status_store import get_status_writer
+            self._writer = get_status_writer()
+        return self._writer
+
+    async def update(self, discord_id: str, status: str, reason: str = '') -> bool:
+        try:
+            # Запись выполняет поток хранилища; цикл событий только ожидает ее завершения
+            await asyncio.wrap_future(self._get_writer().set(str(discord_id), status, reason))
+            logger.info(f"Статус заявки сохранен для пользователя {discord_id}: {status}")
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении статуса заявки {discord_id}: {e}")
+            return False
+
+    async def clear(self, discord_id: str) -> bool:
+        try:
+            await asyncio.wrap_future(self._get_writer().delete(str(discord_id)))
+            logger.info(f"Статус заявки очищен для пользователя {discord_id}")
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при очистке статуса заявки {discord_id}: {e}")
+            return False
+
+
+class HTTPStatusSync(StatusSync):
+    """Доставка статусов во внутреннее API удаленного сайта."""
+
+    def __init__(self, web_url: Optional[str] = None, api_key: Optional[str] = None):
+        """
+        Args:
+            web_url: Адрес сайта (по умолчанию WEB_URL)
+            api_key: Ключ внутреннего API (по умолчанию INTERNAL_API_KEY)
+        """
+        self.web_url = (web_url or os.getenv('WEB_URL', 'http://127.0.0.1:5000')).rstrip('/')
+        self.api_key = api_key or os.getenv('INTERNAL_API_KEY', 'your-secret-api-key')
+        self._http: Optional[aiohttp.ClientSession] = None
+
+    def _get_http(self) -> aiohttp.ClientSession:
+        """Возвращает общую HTTP сессию, создавая ее в текущем цикле событий."""
+        if self._http is None or self._http.closed:
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=STATUS_SYNC_POOL_SIZE),
+                timeout=STATUS_SYNC_HTTP_TIMEOUT,
+                headers={'X-API-Key': self.api_key}
+            )
+        return self._http
+
+    async def _send(self, path: str, data: dict) -> Optional[int]:
+        """Отправляет запрос; возвращает HTTP статус ответа или None, если сайт недоступен."""
+        try:
+            async with self._get_http().post(f"{self.web_url}{path}", json=data) as response:
+                if response.status != 200:
+                    logger.error(f"Ошибка API сайта {path}: {response.status} - {await response.text()}")
+                return response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Сайт недоступен ({path}): {e}")
+            return None
+
+    async def _post(self, path: str, data: dict) -> bool:
+        return await self._send(path, data) == 200
+
+    async def update(self, discord_id: str, status: str, reason: str = '') -> bool:
+        success = await self._post('/api/update-application-status',
+                                   {'discord_id': discord_id, 'status': status, 'reason': reason})
+        if success:
+            logger.info(f"Статус заявки успешно обновлен на сайте для пользователя {discord_id}: {status}")
+        return success
+
+    async def clear(self, discord_id: str) -> bool:
+        success = await self._post('/api/clear-application-status', {'discord_id': discord_id})
+        if success:
+            logger.info(f"Статус заявки успешно очищен на сайте для пользователя {discord_id}")
+        return success
+
+    async def send_batch(self, updates: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        Отправляет пачку изменений одним запросом к /api/application-statuses.
+
+        Args:
+            updates: Изменения в порядке применения (status None - очистка)
+
+        Returns:
+            int: HTTP статус ответа (200 - сайт применил все изменения) или None,
+            если сайт недоступен
+        """
+        return await self._send('/api/application-statuses', {'updates': updates})
+
+    async def close(self) -> None:
+        if self._http is not None and not self._http.closed:
+            await self._http.close()
+        self._http = None
+
+
+class StatusOutbox:
+    """
+    Локальная очередь изменений статусов на базе SQLite.
+
+    Для каждого пользователя хранится только последнее изменение: после
+    недоступности сайта отправляется итоговый статус, а не вся история.
+    Порядковый номер seq задает порядок отправки. Изменения, которые сайт
+    отверг, переносятся в rejected_status_updates для разбора вручную.
+    """
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS pending_status_updates (
+        discord_id TEXT PRIMARY KEY,
+        status TEXT,
+        reason TEXT NOT NULL DEFAULT '',
+        seq INTEGER NOT NULL,
+        queued_at REAL NOT NULL
+    ) WITHOUT ROWID;
+
+    CREATE INDEX IF NOT EXISTS idx_pending_status_updates_seq ON pending_status_updates (seq);
+
+    CREATE TABLE IF NOT EXISTS rejected_status_updates (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        discord_id TEXT NOT NULL,
+        status TEXT,
+        reason TEXT NOT NULL DEFAULT '',
+        http_status INTEGER NOT NULL,
+        rejected_at REAL NOT NULL
+    );
+    """
+
+    def __init__(self, db_path: str = STATUS_OUTBOX_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(self._SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Возвращает соединение текущего потока."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    def put(self, discord_id: str, status: Optional[str], reason: str = '') -> None:
+        """
+        Ставит изменение в очередь, заменяя предыдущее неотправленное изменение пользователя.
+
+        Args:
+            discord_id: ID пользователя Discord
+            status: Новый статус или None для очистки
+            reason: Причина (для отказов)
+        """
+        conn = self._connection()
+        conn.execute(
+            "INSERT INTO pending_status_updates (discord_id, status, reason, seq, queued_at) "
+            "VALUES (?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM pending_status_updates), ?) "
+            "ON CONFLICT(discord_id) DO UPDATE SET status = excluded.status, reason = excluded.reason, "
+            "seq = excluded.seq, queued_at = excluded.queued_at",
+            (str(discord_id), status, reason or '', time.time())
+        )
+
+    def peek(self, limit: int = STATUS_OUTBOX_BATCH) -> List[Dict[str, Any]]:
+        """Возвращает самые старые изменения в порядке постановки в очередь."""
+        rows = self._connection().execute(
+            "SELECT discord_id, status, reason, seq FROM pending_status_updates ORDER BY seq LIMIT ?", (limit,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def ack(self, updates: List[Dict[str, Any]]) -> None:
+        """
+        Удаляет доставленные изменения. Изменение, замененное более новым во время
+        отправки, остается в очереди.
+        """
+        self._connection().executemany(
+            "DELETE FROM pending_status_updates WHERE discord_id = ? AND seq = ?",
+            [(update['discord_id'], update['seq']) for update in updates]
+        )
+
+    def reject(self, update: Dict[str, Any], http_status: int) -> None:
+        """
+        Переносит изменение, которое сайт отверг, из очереди в таблицу отвергнутых.
+        Изменение, замененное более новым во время отправки, остается в очереди.
+
+        Args:
+            update: Изменение из peek()
+            http_status: Ответ сайта
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            deleted = conn.execute(
+                "DELETE FROM pending_status_updates WHERE discord_id = ? AND seq = ?",
+                (update['discord_id'], update['seq'])
+            ).rowcount
+            if deleted:
+                conn.execute(
+                    "INSERT INTO rejected_status_updates (discord_id, status, reason, http_status, rejected_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (update['discord_id'], update['status'], update['reason'], http_status, time.time())
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def count(self) -> int:
+        """Возвращает количество неотправленных изменений."""
+        return self._connection().execute("SELECT COUNT(*) FROM pending_status_updates").fetchone()[0]
+
+
+class QueuedStatusSync(StatusSync):
+    """
+    Доставка статусов на удаленный сайт через локальную очередь.
+
+    update/clear только записывают изменение в очередь; фоновая задача
+    отправляет очередь пачками и при недоступности сайта повторяет попытки
+    с экспоненциальной паузой. Запросы к SQLite очереди (fsync, ожидание
+    блокировки) выполняются в потоках через asyncio.to_thread.
+    """
+
+    def __init__(self, transport: Optional[HTTPStatusSync] = None, outbox: Optional[StatusOutbox] = None,
+                 batch_size: int = STATUS_OUTBOX_BATCH):
+        self.transport = transport or HTTPStatusSync()
+        self.outbox = outbox or StatusOutbox()
+        self.batch_size = batch_size
+        # Фоновая задача и явный вызов flush не отправляют очередь одновременно
+        self._flush_lock = asyncio.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def update(self, discord_id: str, status: str, reason: str = '') -> bool:
+        await asyncio.to_thread(self.outbox.put, discord_id, status, reason)
+        logger.info(f"Статус заявки {discord_id} ({status}) поставлен в очередь отправки на сайт")
+        self._wake()
+        return True
+
+    async def clear(self, discord_id: str) -> bool:
+        await asyncio.to_thread(self.outbox.put, discord_id, None)
+        logger.info(f"Очистка статуса заявки {discord_id} поставлена в очередь отправки на сайт")
+        self._wake()
+        return True
+
+    def _wake(self):
+        if self._task is None:
+            self._start_task()
+        self._wakeup.set()
+
+    def _start_task(self):
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._start_task()
+        # Изменения, оставшиеся в очереди с прошлого запуска, отправляются сразу
+        self._wakeup.set()
+
+    async def flush(self) -> bool:
+        """
+        Отправляет очередь пачками до опустошения.
+
+        Если сайт отверг пачку (4xx, кроме STATUS_SYNC_RETRY_CODES), ее изменения
+        отправляются по одному: отвергнутые переносятся в таблицу отвергнутых и
+        не задерживают остальные.
+
+        Returns:
+            bool: True если очередь отправлена полностью, False если сайт недоступен
+        """
+        async with self._flush_lock:
+            return await self._flush()
+
+    async def _flush(self) -> bool:
+        while True:
+            updates = await asyncio.to_thread(self.outbox.peek, self.batch_size)
+            if not updates:
+                return True
+            http_status = await self.transport.send_batch(updates)
+            if http_status == 200:
+                await asyncio.to_thread(self.outbox.ack, updates)
+                logger.info(f"Отправлено на сайт изменений статусов: {len(updates)}")
+                continue
+            if not is_rejected(http_status):
+                return False
+
+            # Сайт проверяет пачку целиком - ищем отвергнутые изменения по одному
+            for update in updates:
+                if len(updates) > 1:
+                    http_status = await self.transport.send_batch([update])
+                if http_status == 200:
+                    await asyncio.to_thread(self.outbox.ack, [update])
+                elif is_rejected(http_status):
+                    await asyncio.to_thread(self.outbox.reject, update, http_status)
+                    logger.error(f"Сайт отверг изменение статуса заявки {update['discord_id']} "
+                                 f"({update['status']}): {http_status}; изменение снято с отправки")
+                else:
+                    return False
+
+    async def _run(self):
+        delay = 0.0
+        while True:
+            if delay:
+                # После неудачи ждем паузу, но новое изменение не ускоряет повтор
+                await asyncio.sleep(delay)
+            else:
+                await self._wakeup.wait()
+            self._wakeup.clear()
+
+            try:
+                delivered = await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка отправки очереди статусов на сайт: {e}")
+                delivered = False
+
+            if delivered:
+                delay = 0.0
+            else:
+                delay = min(max(delay * 2, STATUS_OUTBOX_RETRY_BASE), STATUS_OUTBOX_RETRY_MAX)
+                pending = await asyncio.to_thread(self.outbox.count)
+                logger.warning(f"Сайт недоступен, в очереди {pending} изменений статусов; "
+                               f"повтор через {delay:.0f} с")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.transport.close()
+
+
+# Глобальный экземпляр синхронизации
+_status_sync_instance: Optional[StatusSync] = None
+
+
+def configure_status_sync(sync: StatusSync) -> None:
+    """
+    Задает способ синхронизации статусов (например, LocalStatusSync в main.py).
+
+    Args:
+        sync: Реализация StatusSync
+    """
+    global _status_sync_instance
+    _status_sync_instance = sync
+    logger.info(f"Синхронизация статусов с сайтом: {type(sync).__name__}")
+
+
+def get_status_sync() -> StatusSync:
+    """Получает синхронизацию статусов; по умолчанию - очередь с отправкой на сайт из WEB_URL."""
+    global _status_sync_instance
+    if _status_sync_instance is None:
+        _status_sync_instance = QueuedStatusSync()
+    return _status_sync_instance
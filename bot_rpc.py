@@ -0,0 +1,438 @@
+"""
+Вызовы бота из процессов сайта через Unix-сокет
+
+Сайт обращается к боту через app.bot. В одном процессе (main.py) это сам
+бот; если сайт запущен отдельно (например, несколько воркеров hypercorn),
+app.bot - BotRPCClient, который передает вызовы единственному процессу
+бота, владеющему подключением к Discord.
+
+Формат кадра: 4 байта длины (big-endian) и компактный JSON в UTF-8.
+Запрос: {"id", "method", "params"}; ответ: {"id", "result"} или {"id", "error"}.
+Событие: {"event", "user_id", "data"} - без ответа. Бот рассылает события
+(изменение прав участника) всем воркерам сайта, а событие воркера (изменение
+статуса заявки) пересылает остальным воркерам. Пока бот недоступен, события
+теряются: страницы получат актуальное состояние при следующей загрузке.
+
+Unix-сокеты недоступны на Windows - там сайт и бот работают в одном процессе.
+"""
+
+import os
+import json
+import struct
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Путь к сокету бота по умолчанию
+BOT_RPC_SOCKET_PATH = os.path.join('data', 'bot.sock')
+# Максимальный размер кадра (байты)
+BOT_RPC_MAX_FRAME = 1024 * 1024
+# Предел неотправленных данных соединения (байты): воркер, который не успевает
+# читать события, отключается, а событие без соединения с ботом отбрасывается
+BOT_RPC_MAX_BUFFER = 4 * BOT_RPC_MAX_FRAME
+# Таймаут одного вызова (секунды); больше APPLICATION_SEND_TIMEOUT бота, чтобы
+# ответ об отправке заявки успел дойти. Повтор заявки после таймаута бот
+# распознает по submission_id и не отправляет второй раз
+BOT_RPC_TIMEOUT = 60
+# Интервал проверки соединения и готовности бота (секунды)
+BOT_RPC_PING_INTERVAL = 5
+
+_FRAME_HEADER = struct.Struct('>I')
+
+
+class BotRPCError(RuntimeError):
+    """Вызов бота не выполнен: бот недоступен или вернул ошибку."""
+
+
+def encode_frame(message: Dict[str, Any]) -> bytes:
+    """
+    Кодирует сообщение в кадр.
+
+    Args:
+        message: Сообщение (сериализуемое в JSON)
+
+    Returns:
+        bytes: Заголовок с длиной и тело кадра
+    """
+    payload = json.dumps(message, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if len(payload) > BOT_RPC_MAX_FRAME:
+        raise BotRPCError(f"Слишком большое сообщение: {len(payload)} байт")
+    return _FRAME_HEADER.pack(len(payload)) + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+    """
+    Читает один кадр из потока.
+
+    Returns:
+        dict: Сообщение или None, если соединение закрыто
+    """
+    try:
+        header = await reader.readexactly(_FRAME_HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+    (size,) = _FRAME_HEADER.unpack(header)
+    if size > BOT_RPC_MAX_FRAME:
+        raise BotRPCError(f"Слишком большой кадр: {size} байт")
+    return json.loads(await reader.readexactly(size))
+
+
+def member_info(member) -> Dict[str, Any]:
+    """Права и роли участника сервера в виде, пригодном для передачи между процессами."""
+    return {
+        'is_admin': member.guild_permissions.administrator,
+        'role_ids': [role.id for role in member.roles],
+    }
+
+
+def member_permissions(member) -> Dict[str, bool]:
+    """Права участника на сайте: администратор и наличие роли вайтлиста."""
+    from bot.config_manager import get_whitelist_role_id
+    whitelist_role_id = int(get_whitelist_role_id())
+    return {
+        'is_admin': member.guild_permissions.administrator,
+        'is_minebuild_member': any(role.id == whitelist_role_id for role in member.roles),
+    }
+
+
+class BotRPCServer:
+    """Сервер вызовов бота; запускается в процессе бота."""
+
+    def __init__(self, bot, path: Optional[str] = None):
+        """
+        Args:
+            bot: Экземпляр MineBuildBot
+            path: Путь к сокету (по умолчанию BOT_RPC_SOCKET_PATH)
+        """
+        self.bot = bot
+        self.path = path or BOT_RPC_SOCKET_PATH
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: Set[asyncio.StreamWriter] = set()
+        self._methods = {
+            'ping': self._ping,
+            'create_application_message': self._create_application_message,
+            'handle_donation': self.bot.handle_donation,
+            'run_donation_step': self.bot.run_donation_step,
+            'report_donation_failure': self.bot.report_donation_failure,
+            'handle_application_expired': self.bot.handle_application_expired,
+            'get_member_info': self._get_member_info,
+        }
+
+    async def start(self):
+        """Открывает сокет; файл сокета от прошлого запуска удаляется."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._serve_client, path=self.path)
+        # Вызывать бота могут только процессы того же пользователя
+        os.chmod(self.path, 0o600)
+        self.bot.add_listener(self._on_member_update, 'on_member_update')
+        self.bot.add_listener(self._on_member_remove, 'on_member_remove')
+        logger.info(f"Сервер вызовов бота слушает {self.path}")
+
+    async def close(self):
+        """Закрывает сокет и соединения воркеров."""
+        if self._server is not None:
+            self.bot.remove_listener(self._on_member_update, 'on_member_update')
+            self.bot.remove_listener(self._on_member_remove, 'on_member_remove')
+            self._server.close()
+            for writer in list(self._clients):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._clients.add(writer)
+        try:
+            while True:
+                request = await read_frame(reader)
+                if request is None:
+                    break
+                if 'event' in request:
+                    self.broadcast(request['event'], request.get('user_id'), request.get('data'), exclude=writer)
+                    continue
+                # Вызовы одного воркера выполняются параллельно; начатая отправка
+                # в Discord завершается, даже если воркер отключился
+                asyncio.ensure_future(self._dispatch(request, writer))
+        except (ConnectionError, asyncio.IncompleteReadError, BotRPCError, ValueError) as e:
+            logger.warning(f"Соединение с воркером сайта прервано: {e}")
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+    async def _dispatch(self, request: Dict[str, Any], writer: asyncio.StreamWriter):
+        response = {'id': request.get('id')}
+        method = self._methods.get(request.get('method'))
+        try:
+            if method is None:
+                raise BotRPCError(f"Неизвестный метод: {request.get('method')}")
+            response['result'] = await method(**request.get('params', {}))
+        except Exception as e:
+            logger.error(f"Ошибка вызова бота {request.get('method')}: {e}")
+            response = {'id': request.get('id'), 'error': str(e)}
+
+        if writer.is_closing():
+            return
+        try:
+            writer.write(encode_frame(response))
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    def broadcast(self, event: str, user_id, data: Any, exclude: Optional[asyncio.StreamWriter] = None):
+        """
+        Рассылает событие подключенным воркерам сайта.
+
+        Args:
+            event: Имя события
+            user_id: Discord ID пользователя
+            data: Данные события
+            exclude: Соединение воркера-отправителя (ему событие не возвращается)
+        """
+        frame = encode_frame({'event': event, 'user_id': str(user_id), 'data': data})
+        for writer in list(self._clients):
+            if writer is exclude or writer.is_closing():
+                continue
+            if writer.transport.get_write_buffer_size() > BOT_RPC_MAX_BUFFER:
+                # Воркер не читает сокет: отключаем его, он переподключится сам
+                logger.warning("Воркер сайта не успевает получать события, соединение закрыто")
+                self._clients.discard(writer)
+                writer.close()
+                continue
+            writer.write(frame)
+
+    async def _on_member_update(self, before, after):
+        if before.roles != after.roles or before.guild_permissions != after.guild_permissions:
+            self.broadcast('permissions', after.id, member_permissions(after))
+
+    async def _on_member_remove(self, member):
+        # None - участник покинул сервер
+        self.broadcast('permissions', member.id, None)
+
+    async def _ping(self) -> Dict[str, bool]:
+        return {'ready': self.bot.is_ready()}
+
+    async def _create_application_message(self, discord_id, embed: Dict[str, Any],
+                                          submission_id: Optional[str] = None) -> bool:
+        import discord
+        return await self.bot.create_application_message(
+            discord_id, discord.Embed.from_dict(embed), submission_id=submission_id
+        )
+
+    async def _get_member_info(self, user_id) -> Optional[Dict[str, Any]]:
+        from bot.config import GUILD_ID
+        guild = self.bot.get_guild(int(GUILD_ID)) if GUILD_ID else None
+        member = guild.get_member(int(user_id)) if guild else None
+        return member_info(member) if member is not None else None
+
+
+class BotRPCClient:
+    """
+    Клиент вызовов бота для процессов сайта.
+
+    Повторяет методы MineBuildBot, которые использует сайт, поэтому подставляется
+    в app.bot вместо бота. Соединение восстанавливается в фоне; пока бот
+    недоступен, is_ready() возвращает False и очередь задач ждет.
+    События от бота передаются в on_event(event, user_id, data).
+    """
+
+    def __init__(self, path: Optional[str] = None, timeout: float = BOT_RPC_TIMEOUT,
+                 ping_interval: float = BOT_RPC_PING_INTERVAL,
+                 on_event: Optional[Callable[[str, str, Any], None]] = None):
+        self.path = path or BOT_RPC_SOCKET_PATH
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.on_event = on_event
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._bot_ready = False
+        self._closed = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Запускает фоновое подключение к боту."""
+        self.loop = asyncio.get_running_loop()
+        self._closed = False
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._maintain())
+
+    async def close(self):
+        """Закрывает соединение."""
+        # Флаг останавливает цикл, даже если отмену поглотил завершившийся
+        # одновременно wait_for (так ведет себя asyncio в Python 3.11)
+        self._closed = True
+        for task in (self._task, self._reader_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._reader_task = None
+        self._disconnect()
+
+    def is_ready(self) -> bool:
+        """Подключен ли бот к Discord (по последней проверке)."""
+        return self._writer is not None and self._bot_ready
+
+    async def _maintain(self):
+        while not self._closed:
+            if self._writer is None:
+                try:
+                    await self._connect()
+                except OSError as e:
+                    logger.debug(f"Бот недоступен по {self.path}: {e}")
+            if self._writer is not None:
+                try:
+                    self._bot_ready = (await self.call('ping'))['ready']
+                except BotRPCError as e:
+                    logger.warning(f"Бот не ответил на проверку соединения: {e}")
+                    self._bot_ready = False
+            await asyncio.sleep(self.ping_interval)
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_unix_connection(self.path)
+        self._writer = writer
+        self._reader_task = asyncio.ensure_future(self._read_responses(reader, writer))
+        logger.info(f"Подключено к боту по {self.path}")
+
+    async def _read_responses(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                response = await read_frame(reader)
+                if response is None:
+                    break
+                if 'event' in response:
+                    self._handle_event(response)
+                    continue
+                future = self._pending.pop(response.get('id'), None)
+                if future is None or future.done():
+                    continue
+                if 'error' in response:
+                    future.set_exception(BotRPCError(response['error']))
+                else:
+                    future.set_result(response.get('result'))
+        except (ConnectionError, asyncio.IncompleteReadError, BotRPCError, ValueError) as e:
+            logger.warning(f"Соединение с ботом прервано: {e}")
+        finally:
+            if self._writer is writer:
+                self._disconnect()
+
+    def _handle_event(self, message: Dict[str, Any]):
+        if self.on_event is None:
+            return
+        try:
+            self.on_event(message['event'], message.get('user_id'), message.get('data'))
+        except Exception as e:
+            logger.error(f"Ошибка обработки события бота {message.get('event')}: {e}")
+
+    def publish(self, event: str, user_id, data: Any):
+        """
+        Передает событие остальным воркерам сайта через бота. Безопасно вызывать
+        из любого потока; без соединения с ботом событие теряется.
+
+        Args:
+            event: Имя события
+            user_id: Discord ID пользователя
+            data: Данные события
+        """
+        if self.loop is None or self.loop.is_closed():
+            return
+        frame = encode_frame({'event': event, 'user_id': str(user_id), 'data': data})
+        self.loop.call_soon_threadsafe(self._send_frame, frame)
+
+    def _send_frame(self, frame: bytes):
+        writer = self._writer
+        if writer is None or writer.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() > BOT_RPC_MAX_BUFFER:
+            logger.warning("Бот не успевает получать события, событие отброшено")
+            return
+        writer.write(frame)
+
+    def _disconnect(self):
+        writer, self._writer = self._writer, None
+        self._bot_ready = False
+        if writer is not None:
+            writer.close()
+            logger.warning("Соединение с ботом закрыто")
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(BotRPCError("Соединение с ботом потеряно"))
+
+    async def call(self, method: str, **params) -> Any:
+        """
+        Вызывает метод бота.
+
+        Args:
+            method: Имя метода
+            **params: Аргументы метода
+
+        Returns:
+            Результат метода
+
+        Raises:
+            BotRPCError: Бот недоступен, не ответил вовремя или вернул ошибку
+        """
+        if self._writer is None:
+            raise BotRPCError("Бот недоступен")
+
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            self._writer.write(encode_frame({'id': request_id, 'method': method, 'params': params}))
+            await self._writer.drain()
+            return await asyncio.wait_for(future, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise BotRPCError(f"Бот не ответил на {method} за {self.timeout} с")
+        except ConnectionError as e:
+            raise BotRPCError(f"Соединение с ботом потеряно: {e}")
+        finally:
+            self._pending.pop(request_id, None)
+
+    @staticmethod
+    def get_donation_steps(amount: int) -> list:
+        """Шаги выдачи наград за донат (вычисляются без обращения к боту)."""
+        from bot.main import MineBuildBot
+        return MineBuildBot.get_donation_steps(amount)
+
+    async def create_application_message(self, discord_id, embed, submission_id: Optional[str] = None) -> bool:
+        return await self.call('create_application_message', discord_id=discord_id, embed=embed.to_dict(),
+                               submission_id=submission_id)
+
+    async def handle_donation(self, nickname: str, amount: int) -> bool:
+        return await self.call('handle_donation', nickname=nickname, amount=amount)
+
+    async def run_donation_step(self, step: str, nickname: str, amount: int) -> None:
+        await self.call('run_donation_step', step=step, nickname=nickname, amount=amount)
+
+    async def report_donation_failure(self, nickname: str, step: str) -> None:
+        await self.call('report_donation_failure', nickname=nickname, step=step)
+
+    async def handle_application_expired(self, discord_id: str, status: str) -> None:
+        await self.call('handle_application_expired', discord_id=discord_id, status=status)
+
+    async def get_member_info(self, user_id) -> Optional[Dict[str, Any]]:
+        """
+        Права и роли участника из кэша бота.
+
+        Returns:
+            dict: is_admin и role_ids или None, если бот недоступен или участника нет в кэше
+        """
+        try:
+            return await self.call('get_member_info', user_id=str(user_id))
+        except BotRPCError as e:
+            logger.warning(f"Не удалось получить участника {user_id} у бота: {e}")
+            return None
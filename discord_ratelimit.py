@@ -0,0 +1,194 @@
+"""
+Учет лимитов Discord API для REST запросов сайта
+
+Отслеживает заголовки X-RateLimit-* по маршрутам и глобальный лимит,
+и придерживает запрос, если известно, что его bucket уже исчерпан,
+вместо того чтобы получать 429 и повторять запрос.
+"""
+
+import re
+import time
+import asyncio
+import hashlib
+import threading
+import logging
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Максимальное время ожидания освобождения лимита одним запросом (секунды)
+RATE_LIMIT_MAX_WAIT = 10.0
+# Количество отслеживаемых bucket'ов, после которого удаляются устаревшие
+RATE_LIMIT_PRUNE_THRESHOLD = 1000
+
+# Числовые сегменты пути, которые Discord считает "major" параметрами маршрута
+_MAJOR_PARAMS = ('guilds', 'channels', 'webhooks')
+_SNOWFLAKE = re.compile(r'^\d+$')
+
+
+class _Bucket:
+    """Состояние одного bucket'а лимитов."""
+
+    __slots__ = ('limit', 'remaining', 'reset_at')
+
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+
+
+class DiscordRateLimiter:
+    """
+    Потокобезопасный ограничитель запросов к Discord по bucket'ам.
+
+    Лимиты Discord считаются отдельно для каждого токена, поэтому ключ
+    маршрута включает хэш заголовка Authorization.
+    """
+
+    def __init__(self, max_wait: float = RATE_LIMIT_MAX_WAIT):
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._route_buckets: Dict[str, str] = {}  # маршрут -> хэш bucket'а из X-RateLimit-Bucket
+        self._buckets: Dict[str, _Bucket] = {}
+        self._global_reset_at = 0.0
+        self._waits = 0
+        self._wait_seconds = 0.0
+        self._rate_limited = 0
+
+    @staticmethod
+    def route_key(method: str, path: str, authorization: Optional[str] = None) -> str:
+        """
+        Формирует ключ маршрута: метод, шаблон пути и хэш токена.
+
+        Args:
+            method: HTTP метод
+            path: Путь запроса относительно базового URL API
+            authorization: Значение заголовка Authorization
+
+        Returns:
+            str: Ключ маршрута
+        """
+        segments = path.split('?', 1)[0].strip('/').split('/')
+        normalized = []
+        for index, segment in enumerate(segments):
+            major = index > 0 and segments[index - 1] in _MAJOR_PARAMS
+            normalized.append('{id}' if _SNOWFLAKE.match(segment) and not major else segment)
+        token = hashlib.sha1(authorization.encode()).hexdigest()[:12] if authorization else '-'
+        return f"{token}:{method.upper()} /{'/'.join(normalized)}"
+
+    def _bucket_key(self, route: str) -> str:
+        bucket_hash = self._route_buckets.get(route)
+        if bucket_hash is None:
+            return route
+        # Bucket общий для маршрутов с одинаковым хэшем, но раздельный по токену и major параметрам
+        token, _, path = route.partition(':')
+        majors = [part for part in path.split('/') if _SNOWFLAKE.match(part)]
+        return f"{token}:{bucket_hash}:{'/'.join(majors)}"
+
+    async def acquire(self, route: str) -> float:
+        """
+        Ожидает, пока по маршруту можно будет отправить запрос.
+
+        Args:
+            route: Ключ маршрута из route_key()
+
+        Returns:
+            float: Время ожидания (секунды)
+        """
+        waited = 0.0
+        while True:
+            delay = self._reserve(route, waited)
+            if delay <= 0:
+                return waited
+            logger.info(f"[RATE_LIMIT] Ожидание {delay:.2f} с перед запросом {route.partition(':')[2]}")
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def _reserve(self, route: str, waited: float) -> float:
+        """Резервирует слот в bucket'е маршрута или возвращает, сколько еще ждать."""
+        with self._lock:
+            now = time.monotonic()
+            delay = max(self._global_reset_at - now, 0.0)
+            bucket = self._buckets.get(self._bucket_key(route))
+            if bucket is not None and bucket.remaining is not None:
+                if bucket.reset_at <= now:
+                    bucket.remaining = bucket.limit
+                elif bucket.remaining <= 0:
+                    delay = max(delay, bucket.reset_at - now)
+            delay = min(delay, self.max_wait - waited)
+            if delay > 0:
+                return delay
+
+            # Резервируем слот, чтобы параллельные запросы не превысили лимит
+            if bucket is not None and bucket.remaining:
+                bucket.remaining -= 1
+            if waited:
+                self._waits += 1
+                self._wait_seconds += waited
+            return 0.0
+
+    def update(self, route: str, headers: Any, status_code: int, retry_after: Optional[float] = None):
+        """
+        Обновляет состояние лимитов по заголовкам ответа.
+
+        Args:
+            route: Ключ маршрута из route_key()
+            headers: Заголовки ответа Discord
+            status_code: HTTP статус ответа
+            retry_after: Пауза из ответа 429 (секунды)
+        """
+        now = time.monotonic()
+        with self._lock:
+            if status_code == 429:
+                self._rate_limited += 1
+                if headers.get('X-RateLimit-Global') or headers.get('X-RateLimit-Scope') == 'global':
+                    self._global_reset_at = max(self._global_reset_at, now + (retry_after or 1.0))
+                    logger.warning(f"[RATE_LIMIT] Достигнут глобальный лимит Discord на {retry_after} с")
+
+            bucket_hash = headers.get('X-RateLimit-Bucket')
+            if bucket_hash:
+                self._route_buckets[route] = bucket_hash
+            if 'X-RateLimit-Remaining' not in headers:
+                return
+
+            key = self._bucket_key(route)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= RATE_LIMIT_PRUNE_THRESHOLD:
+                    self._prune(now)
+                bucket = self._buckets[key] = _Bucket()
+            try:
+                bucket.limit = int(headers.get('X-RateLimit-Limit', bucket.limit or 1))
+                bucket.remaining = int(headers['X-RateLimit-Remaining'])
+                reset_after = float(headers.get('X-RateLimit-Reset-After', retry_after or 0))
+            except (TypeError, ValueError):
+                logger.debug(f"[RATE_LIMIT] Некорректные заголовки лимитов для {route}")
+                return
+            bucket.reset_at = now + reset_after
+
+    def _prune(self, now: float):
+        """Удаляет bucket'ы, лимиты которых уже сброшены."""
+        for key in [key for key, bucket in self._buckets.items() if bucket.reset_at <= now]:
+            del self._buckets[key]
+
+    def headroom(self) -> Dict[str, Any]:
+        """
+        Возвращает текущий запас по лимитам для метрик.
+
+        Returns:
+            dict: Глобальная блокировка, число исчерпанных bucket'ов, минимальный
+                  остаток (доля от лимита) и статистика ожиданий
+        """
+        now = time.monotonic()
+        with self._lock:
+            active = [bucket for bucket in self._buckets.values()
+                      if bucket.reset_at > now and bucket.limit]
+            return {
+                'global_blocked_for': round(max(self._global_reset_at - now, 0.0), 3),
+                'tracked_buckets': len(active),
+                'exhausted_buckets': sum(1 for bucket in active if bucket.remaining <= 0),
+                'min_headroom': round(min((bucket.remaining / bucket.limit for bucket in active), default=1.0), 3),
+                'waits': self._waits,
+                'wait_seconds': round(self._wait_seconds, 3),
+                'rate_limited_responses': self._rate_limited
+            }
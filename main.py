@@ -31,9 +31,12 @@ load_dotenv()
 
 from hypercorn.config import Config
 from hypercorn.asyncio import serve
-from app import app
+from app import app, apply_member_permissions
+from status_store import get_status_store
+from bot_rpc import member_permissions
+from bot.utils.status_sync import configure_status_sync, LocalStatusSync
 from bot.main import MineBuildBot
-from bot.config import setup_logging
+from bot.config import setup_logging, stop_logging
 
 # Настройка логирования для бота
 bot_logger = setup_logging()
@@ -44,24 +47,37 @@ if platform.system() == 'Windows':
     sys.stdout.reconfigure(encoding='utf-8')
     sys.stderr.reconfigure(encoding='utf-8')
 
-# Настройка дополнительного логирования для main.py
+# Логгер main.py пишет через общий конвейер корневого логгера (консоль, main.log, bot.log)
 main_logger = logging.getLogger("MineBuildMain")
 main_logger.setLevel(logging.INFO)
-main_logger.propagate = False  # Отключаем передачу логов вверх по иерархии
-if not main_logger.handlers:
-    # Создаем консольный обработчик с поддержкой UTF-8
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-    main_logger.addHandler(console_handler)
-    
-    # Добавляем файловый обработчик с кодировкой UTF-8
-    file_handler = logging.FileHandler("main.log", encoding='utf-8')
-    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-    main_logger.addHandler(file_handler)
 
 # Создаем один экземпляр бота для всего приложения
 bot = MineBuildBot()
 
+# Сайт в этом же процессе: бот пишет статусы заявок прямо в хранилище, без HTTP к самому себе
+configure_status_sync(LocalStatusSync())
+
+def on_status_store_event(event, discord_id, record):
+    """Передает истечение статусов заявок из фонового потока хранилища в бота."""
+    if event == 'expired' and bot.is_ready():
+        asyncio.run_coroutine_threadsafe(
+            bot.handle_application_expired(discord_id, record['status']), bot.loop
+        )
+
+get_status_store().add_listener(on_status_store_event)
+
+async def invalidate_member_permissions(before, after):
+    """Обновляет кэш прав сайта и открытые вкладки, как только у участника меняются роли."""
+    if before.roles != after.roles or before.guild_permissions != after.guild_permissions:
+        apply_member_permissions(after.id, member_permissions(after))
+
+async def invalidate_removed_member_permissions(member):
+    """Сбрасывает кэш прав сайта для покинувшего сервер участника."""
+    apply_member_permissions(member.id, None)
+
+bot.add_listener(invalidate_member_permissions, 'on_member_update')
+bot.add_listener(invalidate_removed_member_permissions, 'on_member_remove')
+
 # Добавляем информацию о новой архитектуре
 main_logger.info("=== MineBuild: Запуск интегрированного приложения ===")
 main_logger.info("📱 Веб-сайт: Flask/Quart приложение")
@@ -217,10 +233,9 @@ if __name__ == '__main__':
         traceback.print_exc()  # Выводим полный стек-трейс
     finally:
         main_logger.info("Программа завершена.")
-        # Даем время на запись логов
+        # Дописываем накопленные в очередях логи
         try:
-            for handler in main_logger.handlers:
-                handler.close()
+            stop_logging()
         except:
             pass
         sys.exit(0)
\ No newline at end of file
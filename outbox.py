@@ -0,0 +1,428 @@
+"""
+Надежная очередь исходящих задач (outbox) сайта
+
+Задачи, которые требуют Discord бота (отправка заявки, выдача наград за
+донат), сначала записываются в SQLite, а запрос сразу получает ответ.
+Фоновый обработчик в цикле событий бота выполняет задачи с повторами и
+экспоненциальной паузой, поэтому задачи не теряются при отключении бота
+или перезапуске сайта.
+
+Обработчиков может быть несколько (по одному в каждом воркере сайта):
+задача выдается одному из них в аренду на OUTBOX_LEASE секунд. Обработчик
+прерывает задачу через OUTBOX_JOB_TIMEOUT (меньше срока аренды), поэтому
+задачу с истекшей арендой уже никто не выполняет - ее владелец остановлен,
+и ее забирает другой обработчик.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTBOX_DB_PATH = os.path.join(BASE_DIR, 'data', 'outbox.db')
+
+# Состояния задачи
+JOB_PENDING = 'pending'        # ждет выполнения (в том числе повтора)
+JOB_PROCESSING = 'processing'  # выполняется обработчиком
+JOB_DONE = 'done'              # выполнена
+JOB_FAILED = 'failed'          # исчерпаны попытки или ошибка без повтора
+
+# Повторы: пауза растет вдвое после каждой неудачи
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_BASE_DELAY = 5      # секунды
+OUTBOX_RETRY_MAX_DELAY = 600     # секунды
+# Как часто обработчик проверяет очередь без явного пробуждения (секунды)
+OUTBOX_POLL_INTERVAL = 5
+# Срок аренды задачи обработчиком и предельное время ее выполнения (секунды)
+OUTBOX_LEASE = 300
+OUTBOX_JOB_TIMEOUT = 120
+# Сколько хранить выполненные и неудачные задачи (секунды)
+OUTBOX_RETENTION = 30 * 86400
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox_jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    dedup_key TEXT,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires_at REAL
+) WITHOUT ROWID;
+
+-- Идемпотентность: одна задача на ключ (например, operation_id платежа)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_outbox_jobs_dedup
+    ON outbox_jobs (kind, dedup_key) WHERE dedup_key IS NOT NULL;
+
+-- Выборка готовых к выполнению задач и очистка старых
+CREATE INDEX IF NOT EXISTS idx_outbox_jobs_state
+    ON outbox_jobs (state, next_attempt_at);
+"""
+
+# Столбцы, добавленные после первой версии схемы
+_LEASE_COLUMNS = {'lease_owner': 'TEXT', 'lease_expires_at': 'REAL'}
+
+
+class PermanentJobError(Exception):
+    """Ошибка задачи, которую бессмысленно повторять (например, неверные данные)."""
+
+
+class Outbox:
+    """Очередь задач на базе SQLite (режим WAL)."""
+
+    def __init__(self, db_path: str = DEFAULT_OUTBOX_DB_PATH):
+        """
+        Инициализация очереди.
+
+        Args:
+            db_path: Путь к файлу базы данных
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.executescript(_SCHEMA)
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(outbox_jobs)")}
+        for column, column_type in _LEASE_COLUMNS.items():
+            if column not in columns:
+                conn.execute(f"ALTER TABLE outbox_jobs ADD COLUMN {column} {column_type}")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Возвращает соединение текущего потока."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], dedup_key: Optional[str] = None,
+                job_id: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+        """
+        Добавляет задачу в очередь.
+
+        Args:
+            kind: Тип задачи (определяет обработчик)
+            payload: Данные задачи (JSON)
+            dedup_key: Ключ идемпотентности; повторная задача с тем же ключом не создается
+            job_id: ID задачи (по умолчанию случайный), если он нужен до постановки в очередь
+
+        Returns:
+            tuple: (задача, True если создана новая задача)
+        """
+        now = time.time()
+        job_id = job_id or uuid.uuid4().hex
+        cursor = self._connection().execute(
+            "INSERT OR IGNORE INTO outbox_jobs (id, kind, dedup_key, payload, state, next_attempt_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, dedup_key, json.dumps(payload, ensure_ascii=False), JOB_PENDING, now, now, now)
+        )
+        if cursor.rowcount:
+            return self.get(job_id), True
+        return self.find(kind, dedup_key), False
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Возвращает задачу по ID или None."""
+        row = self._connection().execute("SELECT * FROM outbox_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def find(self, kind: str, dedup_key: str) -> Optional[Dict[str, Any]]:
+        """Возвращает задачу по ключу идемпотентности или None."""
+        row = self._connection().execute(
+            "SELECT * FROM outbox_jobs WHERE kind = ? AND dedup_key = ?", (kind, dedup_key)
+        ).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def claim_due(self, limit: int = 10, now: Optional[float] = None, owner: Optional[str] = None,
+                  lease: float = OUTBOX_LEASE) -> List[Dict[str, Any]]:
+        """
+        Забирает готовые к выполнению задачи в аренду и помечает их как выполняющиеся.
+
+        Готовы задачи, ждущие выполнения, и задачи с истекшей арендой (их
+        обработчик остановился, не завершив задачу).
+
+        Args:
+            limit: Максимум задач
+            now: Текущее время (для тестов)
+            owner: Идентификатор обработчика
+            lease: Срок аренды (секунды)
+
+        Returns:
+            list: Задачи в порядке готовности
+        """
+        now = time.time() if now is None else now
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT * FROM outbox_jobs WHERE state = ? AND next_attempt_at <= ? "
+                "UNION ALL "
+                "SELECT * FROM outbox_jobs WHERE state = ? AND COALESCE(lease_expires_at, 0) <= ? "
+                "ORDER BY next_attempt_at LIMIT ?",
+                (JOB_PENDING, now, JOB_PROCESSING, now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE outbox_jobs SET state = ?, attempts = attempts + 1, updated_at = ?, "
+                "lease_owner = ?, lease_expires_at = ? WHERE id = ?",
+                [(JOB_PROCESSING, now, owner, now + lease, row['id']) for row in rows]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        jobs = []
+        for row in rows:
+            job = self._row_to_dict(row)
+            job['state'] = JOB_PROCESSING
+            job['attempts'] += 1
+            job['lease_owner'] = owner
+            job['lease_expires_at'] = now + lease
+            jobs.append(job)
+        return jobs
+
+    def complete(self, job_id: str, result: Any = None):
+        """Отмечает задачу выполненной."""
+        self._connection().execute(
+            "UPDATE outbox_jobs SET state = ?, result = ?, last_error = NULL, updated_at = ?, "
+            "lease_owner = NULL, lease_expires_at = NULL WHERE id = ?",
+            (JOB_DONE, json.dumps(result, ensure_ascii=False), time.time(), job_id)
+        )
+
+    def retry(self, job_id: str, error: str, delay: float, payload: Optional[Dict[str, Any]] = None):
+        """
+        Возвращает задачу в очередь для повтора через delay секунд.
+
+        Args:
+            job_id: ID задачи
+            error: Текст ошибки
+            delay: Пауза перед повтором (секунды)
+            payload: Обновленные данные задачи (например, с отметками выполненных шагов)
+        """
+        now = time.time()
+        if payload is None:
+            self._connection().execute(
+                "UPDATE outbox_jobs SET state = ?, last_error = ?, next_attempt_at = ?, updated_at = ?, "
+                "lease_owner = NULL, lease_expires_at = NULL WHERE id = ?",
+                (JOB_PENDING, error, now + delay, now, job_id)
+            )
+        else:
+            self._connection().execute(
+                "UPDATE outbox_jobs SET state = ?, last_error = ?, next_attempt_at = ?, updated_at = ?, payload = ?, "
+                "lease_owner = NULL, lease_expires_at = NULL WHERE id = ?",
+                (JOB_PENDING, error, now + delay, now, json.dumps(payload, ensure_ascii=False), job_id)
+            )
+
+    def fail(self, job_id: str, error: str):
+        """Отмечает задачу неудачной без дальнейших повторов."""
+        self._connection().execute(
+            "UPDATE outbox_jobs SET state = ?, last_error = ?, updated_at = ?, "
+            "lease_owner = NULL, lease_expires_at = NULL WHERE id = ?",
+            (JOB_FAILED, error, time.time(), job_id)
+        )
+
+    def release(self, job_id: str, owner: Optional[str]):
+        """
+        Возвращает в очередь задачу, прерванную остановкой обработчика, не дожидаясь
+        окончания аренды. Задачу, аренда которой перешла другому обработчику, не трогает.
+        """
+        now = time.time()
+        self._connection().execute(
+            "UPDATE outbox_jobs SET state = ?, attempts = MAX(attempts - 1, 0), next_attempt_at = ?, "
+            "updated_at = ?, lease_owner = NULL, lease_expires_at = NULL "
+            "WHERE id = ? AND state = ? AND lease_owner IS ?",
+            (JOB_PENDING, now, now, job_id, JOB_PROCESSING, owner)
+        )
+
+    def prune(self, retention: float = OUTBOX_RETENTION, now: Optional[float] = None) -> int:
+        """
+        Удаляет выполненные и неудачные задачи старше срока хранения.
+
+        Args:
+            retention: Срок хранения (секунды)
+            now: Текущее время (для тестов)
+
+        Returns:
+            int: Количество удаленных задач
+        """
+        now = time.time() if now is None else now
+        return self._connection().execute(
+            "DELETE FROM outbox_jobs WHERE state IN (?, ?) AND updated_at < ?",
+            (JOB_DONE, JOB_FAILED, now - retention)
+        ).rowcount
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает количество задач по состояниям."""
+        rows = self._connection().execute("SELECT state, COUNT(*) FROM outbox_jobs GROUP BY state").fetchall()
+        return {row[0]: row[1] for row in rows}
+
+
+class OutboxWorker:
+    """
+    Фоновый обработчик очереди в цикле событий бота.
+
+    Обработчик задачи - корутина handler(payload); ее результат сохраняется
+    в задаче. Изменения payload сохраняются при повторе, поэтому
+    многошаговый обработчик может отмечать в нем выполненные шаги.
+    Исключение или превышение job_timeout приводит к повтору с
+    экспоненциальной паузой, PermanentJobError или исчерпание попыток - к
+    ошибке задачи. Если задан is_ready и он возвращает False (бот не
+    подключен), задачи ждут.
+    """
+
+    def __init__(self, outbox: Outbox, handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[Any]]],
+                 is_ready: Optional[Callable[[], bool]] = None, on_failed=None,
+                 max_attempts: int = OUTBOX_MAX_ATTEMPTS, base_delay: float = OUTBOX_RETRY_BASE_DELAY,
+                 max_delay: float = OUTBOX_RETRY_MAX_DELAY, poll_interval: float = OUTBOX_POLL_INTERVAL,
+                 lease: float = OUTBOX_LEASE, job_timeout: float = OUTBOX_JOB_TIMEOUT):
+        self.outbox = outbox
+        self.handlers = handlers
+        self.is_ready = is_ready
+        self.on_failed = on_failed
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.job_timeout = min(job_timeout, lease)
+        # Владелец аренды: уникален для процесса и экземпляра обработчика
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> asyncio.Task:
+        """Запускает обработчик в текущем цикле событий."""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.ensure_future(self.run())
+        return self._task
+
+    async def stop(self):
+        """Останавливает обработчик."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self):
+        """Будит обработчик сразу после добавления задачи."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run(self):
+        """Основной цикл обработчика."""
+        last_prune = 0.0
+        while True:
+            try:
+                if self.is_ready is None or self.is_ready():
+                    await self.run_once()
+                if time.monotonic() - last_prune > 3600:
+                    last_prune = time.monotonic()
+                    pruned = self.outbox.prune()
+                    if pruned:
+                        logger.info(f"Удалено старых задач очереди: {pruned}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка обработчика очереди задач: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def run_once(self) -> int:
+        """
+        Выполняет все готовые задачи.
+
+        Returns:
+            int: Количество обработанных задач
+        """
+        processed = 0
+        while True:
+            # По одной задаче: аренда отсчитывается с момента выдачи
+            jobs = self.outbox.claim_due(limit=1, owner=self.owner, lease=self.lease)
+            if not jobs:
+                return processed
+            for job in jobs:
+                await self._execute(job)
+                processed += 1
+
+    async def _execute(self, job: Dict[str, Any]):
+        handler = self.handlers.get(job['kind'])
+        if handler is None:
+            self.outbox.fail(job['id'], f"Нет обработчика задач {job['kind']}")
+            return
+
+        try:
+            result = await asyncio.wait_for(handler(job['payload']), timeout=self.job_timeout)
+        except asyncio.CancelledError:
+            # Остановка обработчика: задача сразу возвращается в очередь
+            self.outbox.release(job['id'], self.owner)
+            raise
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                error = f"Задача не выполнена за {self.job_timeout:.0f} с"
+            else:
+                error = str(e) or type(e).__name__
+            if isinstance(e, PermanentJobError) or job['attempts'] >= self.max_attempts:
+                logger.error(f"Задача {job['kind']} {job['id']} не выполнена (попытка {job['attempts']}): {error}")
+                self.outbox.fail(job['id'], error)
+                if self.on_failed is not None:
+                    try:
+                        await self.on_failed(job, error)
+                    except Exception as callback_error:
+                        logger.error(f"Ошибка обработки неудачной задачи {job['id']}: {callback_error}")
+            else:
+                delay = min(self.base_delay * 2 ** (job['attempts'] - 1), self.max_delay)
+                logger.warning(f"Задача {job['kind']} {job['id']} будет повторена через {delay:.0f} с: {error}")
+                self.outbox.retry(job['id'], error, delay, payload=job['payload'])
+            return
+
+        self.outbox.complete(job['id'], result)
+        logger.info(f"Задача {job['kind']} {job['id']} выполнена (попытка {job['attempts']})")
+
+
+# Глобальный экземпляр очереди
+_outbox_instance = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox() -> Outbox:
+    """Получает глобальный экземпляр очереди задач."""
+    global _outbox_instance
+    if _outbox_instance is None:
+        with _outbox_lock:
+            if _outbox_instance is None:
+                _outbox_instance = Outbox(os.environ.get('OUTBOX_DB', DEFAULT_OUTBOX_DB_PATH))
+    return _outbox_instance
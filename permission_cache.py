@@ -0,0 +1,109 @@
+"""
+Общий кэш прав пользователей Discord
+
+Хранит права (админ, майнбилдовец) в памяти процесса по user_id, чтобы
+все вкладки и устройства одного пользователя использовали одну проверку.
+Записи живут TTL и сбрасываются ботом сразу при изменении ролей участника.
+"""
+
+import time
+import threading
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Время жизни записи с выданными правами (секунды)
+PERMISSION_CACHE_TTL = 300
+# Время жизни записи без прав - такие пользователи чаще всего ждут роль (секунды)
+PERMISSION_CACHE_NEGATIVE_TTL = 60
+
+
+class PermissionCache:
+    """
+    Потокобезопасный TTL-кэш прав пользователей.
+
+    Кэшируются и отрицательные результаты (нет ни одного права) - с более
+    коротким TTL, чтобы новые роли подхватывались даже без события от бота.
+    """
+
+    def __init__(self, ttl: float = PERMISSION_CACHE_TTL, negative_ttl: float = PERMISSION_CACHE_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, user_id) -> Optional[Dict[str, bool]]:
+        """
+        Получает права пользователя из кэша.
+
+        Args:
+            user_id: Discord ID пользователя
+
+        Returns:
+            dict: is_admin и is_minebuild_member или None, если записи нет или она устарела
+        """
+        key = str(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                return None
+            self._hits += 1
+            return dict(entry[1])
+
+    def set(self, user_id, is_admin: bool, is_minebuild_member: bool) -> Dict[str, bool]:
+        """
+        Сохраняет права пользователя.
+
+        Args:
+            user_id: Discord ID пользователя
+            is_admin: Есть ли права администратора
+            is_minebuild_member: Есть ли роль майнбилдовца
+
+        Returns:
+            dict: Сохраненные права
+        """
+        permissions = {'is_admin': bool(is_admin), 'is_minebuild_member': bool(is_minebuild_member)}
+        ttl = self.ttl if any(permissions.values()) else self.negative_ttl
+        with self._lock:
+            self._entries[str(user_id)] = (time.monotonic() + ttl, permissions)
+        return dict(permissions)
+
+    def invalidate(self, user_id=None):
+        """
+        Сбрасывает права пользователя (или весь кэш, если user_id не указан).
+
+        Args:
+            user_id: Discord ID пользователя
+        """
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(user_id), None)
+        logger.debug(f"Сброшен кэш прав {'всех пользователей' if user_id is None else user_id}")
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает статистику попаданий в кэш."""
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self._hits, 'misses': self._misses}
+
+
+# Глобальный экземпляр кэша
+_cache_instance = None
+_cache_lock = threading.Lock()
+
+
+def get_permission_cache() -> PermissionCache:
+    """Получает глобальный экземпляр кэша прав."""
+    global _cache_instance
+    if _cache_instance is None:
+        with _cache_lock:
+            if _cache_instance is None:
+                _cache_instance = PermissionCache()
+    return _cache_instance
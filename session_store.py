@@ -0,0 +1,295 @@
+"""
+Серверное хранилище сессий сайта
+
+В cookie хранится только непрозрачный ID сессии, а сами данные (пользователь,
+права, статус заявки) лежат на сервере: в памяти процесса (LRU, для разработки)
+или в SQLite (для продакшена). Данные загружаются только при первом обращении
+к сессии и записываются только если сессия изменилась.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import secrets
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from quart.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SESSION_DB_PATH = os.path.join(BASE_DIR, 'data', 'sessions.db')
+
+# Максимум сессий в памяти для LRU-хранилища
+MEMORY_SESSION_LIMIT = 10000
+# Интервал между проходами фонового удаления истекших сессий (секунды)
+SESSION_SWEEP_INTERVAL = 300
+# Длина случайной части ID сессии (байты)
+SESSION_ID_BYTES = 32
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS web_sessions (
+    sid TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_web_sessions_expires_at ON web_sessions (expires_at);
+"""
+
+
+class MemorySessionBackend:
+    """Хранилище сессий в памяти процесса с вытеснением давно не использованных (LRU)."""
+
+    def __init__(self, max_entries: int = MEMORY_SESSION_LIMIT):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, sid: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[sid]
+                return None
+            self._entries.move_to_end(sid)
+            return json.loads(entry[1])
+
+    def save(self, sid: str, data: Dict[str, Any], expires_at: float):
+        with self._lock:
+            self._entries[sid] = (expires_at, json.dumps(data))
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, sid: str):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+    def delete_expired(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [sid for sid, entry in self._entries.items() if entry[0] <= now]
+            for sid in expired:
+                del self._entries[sid]
+        return len(expired)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteSessionBackend:
+    """Хранилище сессий в SQLite: переживает перезапуск и позволяет отзывать сессии."""
+
+    def __init__(self, db_path: str = DEFAULT_SESSION_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Возвращает соединение текущего потока."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Каждая операция - один оператор, поэтому достаточно автокоммита
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    def load(self, sid: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT data FROM web_sessions WHERE sid = ? AND expires_at > ?", (sid, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, sid: str, data: Dict[str, Any], expires_at: float):
+        self._connection().execute(
+            "INSERT INTO web_sessions (sid, data, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(sid) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at",
+            (sid, json.dumps(data), expires_at)
+        )
+
+    def delete(self, sid: str):
+        self._connection().execute("DELETE FROM web_sessions WHERE sid = ?", (sid,))
+
+    def delete_expired(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        return self._connection().execute("DELETE FROM web_sessions WHERE expires_at <= ?", (now,)).rowcount
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM web_sessions").fetchone()[0]
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """
+    Сессия, данные которой хранятся на сервере.
+
+    Данные загружаются из хранилища при первом обращении к сессии, поэтому
+    запросы, которые сессию не трогают (статика, публичные страницы), не
+    обращаются к хранилищу.
+    """
+
+    def __init__(self, sid: str, loader=None, new: bool = False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(None, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.accessed = False
+        self.previous_sid = None
+        self._loader = loader
+
+    @property
+    def loaded(self) -> bool:
+        """Были ли данные сессии загружены (или сессия новая)."""
+        return self._loader is None
+
+    def _load(self):
+        self.accessed = True
+        if self._loader is not None:
+            loader, self._loader = self._loader, None
+            data = loader()
+            if data:
+                dict.update(self, data)
+            else:
+                # Неизвестный или истекший ID не переиспользуем (защита от фиксации сессии)
+                self.sid = secrets.token_urlsafe(SESSION_ID_BYTES)
+                self.new = True
+
+    def regenerate(self):
+        """Выдает сессии новый ID с теми же данными (например, после входа)."""
+        self._load()
+        if not self.new:
+            self.previous_sid = self.sid
+        self.sid = secrets.token_urlsafe(SESSION_ID_BYTES)
+        self.new = True
+        self.modified = True
+
+
+def _lazy(name):
+    method = getattr(CallbackDict, name)
+
+    def wrapper(self, *args, **kwargs):
+        self._load()
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in ('__getitem__', '__setitem__', '__delitem__', '__contains__', '__iter__', '__len__', '__repr__',
+              'get', 'keys', 'values', 'items', 'copy', 'pop', 'popitem', 'setdefault', 'update', 'clear'):
+    setattr(ServerSession, _name, _lazy(_name))
+
+
+class ServerSessionInterface(SessionInterface):
+    """Интерфейс сессий Quart поверх серверного хранилища."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    @staticmethod
+    def _is_valid_sid(sid: Optional[str]) -> bool:
+        return bool(sid) and len(sid) <= 64 and all(c.isalnum() or c in '-_' for c in sid)
+
+    async def open_session(self, app, request) -> ServerSession:
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if self._is_valid_sid(sid):
+            return ServerSession(sid, loader=lambda: self.backend.load(sid))
+        return ServerSession(secrets.token_urlsafe(SESSION_ID_BYTES), new=True)
+
+    async def save_session(self, app, session: ServerSession, response) -> None:
+        if response is None:
+            return
+
+        name = self.get_cookie_name(app)
+        cookie_options = {
+            'domain': self.get_cookie_domain(app),
+            'path': self.get_cookie_path(app),
+            'secure': self.get_cookie_secure(app),
+            'samesite': self.get_cookie_samesite(app),
+            'httponly': self.get_cookie_httponly(app),
+        }
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        # Запись только если сессия изменилась
+        if not session.modified:
+            return
+
+        if session.previous_sid:
+            self.backend.delete(session.previous_sid)
+
+        if not session:
+            self.backend.delete(session.sid)
+            if not session.new:
+                response.delete_cookie(name, **cookie_options)
+            return
+
+        # Непостоянная сессия живет до закрытия браузера, но на сервере тоже не дольше срока жизни
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        self.backend.save(session.sid, dict(session), time.time() + lifetime)
+        response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session), **cookie_options)
+
+    def start_sweeper(self, interval: float = SESSION_SWEEP_INTERVAL) -> threading.Thread:
+        """
+        Запускает фоновый поток, удаляющий истекшие сессии.
+
+        Args:
+            interval: Интервал между проходами (секунды)
+
+        Returns:
+            threading.Thread: Запущенный daemon-поток
+        """
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    removed = self.backend.delete_expired()
+                    if removed:
+                        logger.info(f"Удалено истекших сессий: {removed}")
+                except Exception as e:
+                    logger.error(f"Ошибка при удалении истекших сессий: {e}")
+
+        thread = threading.Thread(target=run, name='session-sweeper', daemon=True)
+        thread.start()
+        return thread
+
+
+def create_session_interface(backend_name: str = 'sqlite', db_path: Optional[str] = None) -> ServerSessionInterface:
+    """
+    Создает интерфейс серверных сессий с указанным хранилищем.
+
+    Args:
+        backend_name: 'memory' (LRU в памяти, для разработки) или 'sqlite'
+        db_path: Путь к базе сессий для SQLite
+
+    Returns:
+        ServerSessionInterface: Интерфейс сессий для app.session_interface
+    """
+    if backend_name == 'memory':
+        backend = MemorySessionBackend()
+    elif backend_name == 'sqlite':
+        backend = SQLiteSessionBackend(db_path or DEFAULT_SESSION_DB_PATH)
+    else:
+        raise ValueError(f"Неизвестное хранилище сессий: {backend_name}")
+
+    logger.info(f"Серверные сессии: хранилище {backend_name}")
+    return ServerSessionInterface(backend)
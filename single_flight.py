@@ -0,0 +1,85 @@
+"""
+Объединение одновременных одинаковых запросов (single-flight)
+
+Если несколько корутин одновременно запрашивают один и тот же ключ (например,
+права одного пользователя из разных вкладок), выполняется только один запрос,
+а его результат получают все ожидающие.
+"""
+
+import asyncio
+import logging
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Группа выполняющихся запросов с общим результатом по ключу."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._started = 0
+        self._shared = 0
+
+    def start(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """
+        Запускает запрос по ключу или возвращает уже выполняющийся.
+
+        Args:
+            key: Ключ запроса
+            factory: Функция, создающая корутину запроса
+
+        Returns:
+            asyncio.Future: Задача с результатом запроса
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            self._shared += 1
+            return task
+
+        task = asyncio.ensure_future(factory())
+        self._calls[key] = task
+        self._started += 1
+        task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return task
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Выполняет запрос по ключу, разделяя результат с одновременными вызовами.
+
+        Отмена одного ожидающего не отменяет общий запрос.
+
+        Args:
+            key: Ключ запроса
+            factory: Функция, создающая корутину запроса
+
+        Returns:
+            Результат запроса (исключение запроса получают все ожидающие)
+        """
+        return await asyncio.shield(self.start(key, factory))
+
+    def get(self, key: Hashable) -> Optional[asyncio.Future]:
+        """Возвращает выполняющийся запрос по ключу или None."""
+        return self._calls.get(key)
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает статистику: запущено запросов, объединено вызовов, выполняется сейчас."""
+        return {'started': self._started, 'shared': self._shared, 'in_flight': len(self._calls)}
+
+
+def single_flight(key: Callable[..., Hashable]):
+    """
+    Декоратор асинхронного метода: одновременные вызовы с одним ключом
+    выполняются один раз. Группа берется из атрибута `flights` объекта.
+
+    Args:
+        key: Функция, вычисляющая ключ из аргументов метода
+    """
+    def decorator(method):
+        @wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            flight_key = (method.__name__, key(*args, **kwargs))
+            return await self.flights.run(flight_key, lambda: method(self, *args, **kwargs))
+        return wrapper
+    return decorator
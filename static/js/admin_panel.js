@@ -242,6 +242,19 @@ class AdminPanel {
             );
             container.appendChild(item);
         });
+
+        // Обновление прав пользователей сайта
+        const permissions = this.config.system?.permissions || {};
+        Object.entries(permissions).forEach(([key, value]) => {
+            const item = this.createConfigItem(
+                `system.permissions.${key}`,
+                key,
+                value,
+                `Обновление прав "${key}" (в секундах)`,
+                'number'
+            );
+            container.appendChild(item);
+        });
     }
 
     /**
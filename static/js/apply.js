@@ -376,6 +376,10 @@ class ApplicationForm {
 
                     if (response.ok) {
                         this.showSuccessMessage();
+                        // Заявка принята в очередь - следим, как бот передает ее кураторам
+                        if (responseData.status_url) {
+                            setTimeout(() => this.trackSubmission(responseData.status_url), 500);
+                        }
                     } else {
                         console.error('Ошибка сервера:', responseData);
                         this.showErrorMessage(responseData.error || 'Произошла ошибка при отправке заявки');
@@ -407,6 +411,7 @@ class ApplicationForm {
                     <i class="fas fa-check-circle"></i>
                     <h2>Заявка успешно отправлена!</h2>
                     <p>Ваша заявка отправлена на рассмотрение. Результат будет отправлен вам в личные сообщения Discord.</p>
+                    <p class="submission-progress"></p>
                     <a href="/" class="btn btn-primary home-button">
                         <i class="fas fa-home"></i> На главную
                     </a>
@@ -429,6 +434,36 @@ class ApplicationForm {
         });
     }
 
+    async trackSubmission(statusUrl, attempt = 0) {
+        const messages = {
+            pending: 'Передаем заявку кураторам...',
+            processing: 'Передаем заявку кураторам...',
+            done: 'Заявка доставлена кураторам в Discord.',
+            failed: 'Не удалось передать заявку кураторам. Пожалуйста, подайте ее заново позже.'
+        };
+
+        try {
+            const response = await fetch(statusUrl);
+            if (response.ok) {
+                const submission = await response.json();
+                const progress = this.slidesContainer.querySelector('.submission-progress');
+                if (progress) {
+                    progress.textContent = messages[submission.state] || '';
+                }
+                if (submission.delivered || submission.failed) {
+                    return;
+                }
+            }
+        } catch (error) {
+            console.warn('Не удалось получить состояние заявки:', error);
+        }
+
+        // Опрашиваем недолго: дальше заявка дождется бота в очереди и без открытой страницы
+        if (attempt < 40) {
+            setTimeout(() => this.trackSubmission(statusUrl, attempt + 1), 3000);
+        }
+    }
+
     showErrorMessage(message) {
         const errorDiv = document.createElement('div');
         errorDiv.className = 'error-message global';
@@ -0,0 +1,962 @@
+"""
+Хранилище статусов заявок MineBuild
+Встроенная SQLite база (режим WAL) с точечным поиском по Discord ID
+вместо перечитывания всего application_statuses.json на каждый запрос.
+Каждый переход статуса дополнительно пишется в журнал (история заявителя).
+Журнал - ограниченная история для просмотра и версии хранилища; текущее
+состояние всегда берется из application_statuses и из журнала не восстанавливается.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+import queue
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Путь к базе статусов по умолчанию (можно переопределить переменной окружения)
+DEFAULT_DB_PATH = os.path.join(BASE_DIR, 'data', 'application_statuses.db')
+
+# Старый JSON файл со статусами - импортируется в базу один раз
+LEGACY_JSON_PATH = os.path.join(BASE_DIR, 'application_statuses.json')
+
+# Допустимые статусы заявки
+VALID_STATUSES = ('pending', 'candidate', 'approved', 'rejected')
+
+# Из журнала переходов удаляется старая история, когда в нем набирается больше
+# порога лишних записей; для каждого заявителя остаются последние переходы
+JOURNAL_TRIM_THRESHOLD = 10000
+JOURNAL_KEEP_PER_USER = 20
+JOURNAL_TRIM_INTERVAL = 600  # секунды между проверками фонового потока очистки
+
+# Интервал между проходами фонового удаления просроченных статусов (секунды)
+EXPIRY_SWEEP_INTERVAL = 60
+EXPIRY_SWEEP_BATCH = 500  # максимум записей одного статуса за проход
+
+# Максимум записей в кэше статусов процесса (вытесняются давно не читавшиеся)
+STATUS_CACHE_SIZE = 10000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS application_statuses (
+    discord_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    reason TEXT NOT NULL DEFAULT '',
+    timestamp REAL NOT NULL
+) WITHOUT ROWID;
+
+-- Журнал переходов статусов (только добавление). status = NULL - статус очищен
+CREATE TABLE IF NOT EXISTS application_status_journal (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    discord_id TEXT NOT NULL,
+    status TEXT,
+    reason TEXT NOT NULL DEFAULT '',
+    timestamp REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_status_journal_discord_id
+    ON application_status_journal (discord_id, seq);
+
+-- Вторичный индекс для очередей модераторов: статус -> заявители по времени
+CREATE INDEX IF NOT EXISTS idx_application_statuses_status
+    ON application_statuses (status, timestamp, discord_id);
+
+-- Счетчики заявок по статусам, поддерживаются триггерами при каждом изменении
+CREATE TABLE IF NOT EXISTS application_status_counts (
+    status TEXT PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_application_statuses_insert
+AFTER INSERT ON application_statuses
+BEGIN
+    INSERT INTO application_status_counts (status, count) VALUES (new.status, 1)
+        ON CONFLICT(status) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_application_statuses_delete
+AFTER DELETE ON application_statuses
+BEGIN
+    UPDATE application_status_counts SET count = count - 1 WHERE status = old.status;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_application_statuses_update
+AFTER UPDATE OF status ON application_statuses
+WHEN old.status <> new.status
+BEGIN
+    UPDATE application_status_counts SET count = count - 1 WHERE status = old.status;
+    INSERT INTO application_status_counts (status, count) VALUES (new.status, 1)
+        ON CONFLICT(status) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+) WITHOUT ROWID;
+"""
+
+
+class StatusStore:
+    """Хранилище статусов заявок на базе SQLite."""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, legacy_json_path: Optional[str] = LEGACY_JSON_PATH):
+        """
+        Инициализация хранилища.
+
+        Args:
+            db_path: Путь к файлу базы данных
+            legacy_json_path: Путь к старому JSON файлу для одноразовой миграции
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        self._listeners: List[Callable[[str, str, Optional[Dict[str, Any]]], None]] = []
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.executescript(_SCHEMA)
+        self._init_counts(conn)
+
+        if legacy_json_path:
+            self.migrate_from_json(legacy_json_path)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Возвращает соединение текущего потока (sqlite3 не разделяет соединения между потоками)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None - транзакции открываем явно через BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            'status': row['status'],
+            'timestamp': row['timestamp'],
+            'reason': row['reason']
+        }
+
+    def get(self, discord_id) -> Optional[Dict[str, Any]]:
+        """
+        Получает статус заявки по Discord ID.
+
+        Args:
+            discord_id: ID пользователя Discord
+
+        Returns:
+            dict или None: Данные статуса (status, timestamp, reason) или None
+        """
+        row = self._connection().execute(
+            "SELECT status, reason, timestamp FROM application_statuses WHERE discord_id = ?",
+            (str(discord_id),)
+        ).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def set(self, discord_id, status: str, reason: str = '') -> Dict[str, Any]:
+        """
+        Сохраняет или обновляет статус заявки.
+
+        Args:
+            discord_id: ID пользователя Discord
+            status: Новый статус
+            reason: Причина (для отказов)
+
+        Returns:
+            dict: Сохраненные данные статуса
+        """
+        return self.apply_batch([('set', discord_id, status, reason)])[0]
+
+    def delete(self, discord_id) -> bool:
+        """
+        Удаляет статус заявки.
+
+        Args:
+            discord_id: ID пользователя Discord
+
+        Returns:
+            bool: True если статус был удален, False если его не было
+        """
+        return self.apply_batch([('delete', discord_id)])[0]
+
+    def apply_batch(self, operations: List[tuple]) -> List[Any]:
+        """
+        Применяет несколько изменений статусов в одной транзакции.
+
+        Args:
+            operations: Список операций ('set', discord_id, status, reason) или ('delete', discord_id)
+
+        Returns:
+            list: Результат каждой операции (запись статуса для set, bool для delete)
+        """
+        for operation in operations:
+            if operation[0] == 'set' and operation[2] not in VALID_STATUSES:
+                raise ValueError(f"Недопустимый статус заявки: {operation[2]}")
+
+        results = []
+        conn = self._connection()
+        with _transaction(conn):
+            version_before = self._read_version(conn)
+            for operation in operations:
+                if operation[0] == 'set':
+                    _, discord_id, status, reason = operation
+                    results.append(self._write_status(conn, discord_id, status, reason))
+                else:
+                    results.append(self._write_delete(conn, operation[1]))
+            version_after = self._read_version(conn)
+
+        self._after_write([
+            (str(operation[1]), result if operation[0] == 'set' else None)
+            for operation, result in zip(operations, results)
+        ], version_before, version_after)
+        for operation, result in zip(operations, results):
+            if operation[0] == 'set':
+                self._emit('set', str(operation[1]), result)
+            elif result:
+                self._emit('deleted', str(operation[1]), None)
+        return results
+
+    def _after_write(self, changes: List[Tuple[str, Optional[Dict[str, Any]]]],
+                     version_before: int, version_after: int):
+        """
+        Вызывается после коммита изменений.
+
+        Args:
+            changes: Пары (discord_id, новая запись или None)
+            version_before: Версия хранилища в транзакции до изменений
+            version_after: Версия хранилища после изменений
+        """
+
+    def add_listener(self, callback: Callable[[str, str, Optional[Dict[str, Any]]], None]):
+        """
+        Подписывает обработчик на события хранилища.
+
+        Обработчик вызывается как callback(event, discord_id, record) из потока,
+        в котором произошло событие: 'set' (статус сохранен), 'deleted'
+        (статус удален) и 'expired' (статус истек).
+
+        Args:
+            callback: Функция-обработчик события
+        """
+        self._listeners.append(callback)
+
+    def _emit(self, event: str, discord_id: str, record: Optional[Dict[str, Any]]):
+        """Оповещает подписчиков о событии; ошибки обработчиков не мешают остальным."""
+        for callback in list(self._listeners):
+            try:
+                callback(event, discord_id, record)
+            except Exception as e:
+                logger.error(f"Ошибка в обработчике события {event} для {discord_id}: {e}")
+
+    def expire_stale(self, ttls: Dict[str, float], now: Optional[float] = None,
+                     limit: int = EXPIRY_SWEEP_BATCH) -> List[Dict[str, Any]]:
+        """
+        Удаляет статусы, которые дольше TTL находятся в своем статусе.
+
+        Просроченные записи выбираются диапазоном по индексу (status, timestamp),
+        без полного перебора. Для каждой удаленной записи публикуется событие 'expired'.
+
+        Args:
+            ttls: Статус -> TTL в секундах (0 или отсутствие - без ограничения)
+            now: Текущее время (для тестов)
+            limit: Максимум записей на один статус за проход
+
+        Returns:
+            list: Удаленные записи (с discord_id)
+        """
+        now = time.time() if now is None else now
+        expired = []
+        conn = self._connection()
+        with _transaction(conn):
+            version_before = self._read_version(conn)
+            for status, ttl in ttls.items():
+                if not ttl or ttl <= 0:
+                    continue
+                rows = conn.execute(
+                    "SELECT discord_id, status, reason, timestamp FROM application_statuses "
+                    "WHERE status = ? AND timestamp < ? ORDER BY timestamp LIMIT ?",
+                    (status, now - ttl, limit)
+                ).fetchall()
+                for row in rows:
+                    conn.execute("DELETE FROM application_statuses WHERE discord_id = ?", (row['discord_id'],))
+                    self._append_journal(conn, row['discord_id'], None, 'expired', now)
+                    expired.append(dict(self._row_to_dict(row), discord_id=row['discord_id']))
+            version_after = self._read_version(conn)
+
+        if expired:
+            self._after_write([(record['discord_id'], None) for record in expired], version_before, version_after)
+            logger.info(f"Истек срок {len(expired)} статусов заявок")
+            for record in expired:
+                self._emit('expired', record['discord_id'], record)
+        return expired
+
+    def start_expiry_sweeper(self, ttl_getter: Callable[[], Dict[str, float]],
+                             interval: float = EXPIRY_SWEEP_INTERVAL) -> threading.Thread:
+        """
+        Запускает фоновый поток, периодически удаляющий просроченные статусы.
+
+        Args:
+            ttl_getter: Функция, возвращающая актуальные TTL по статусам (секунды)
+            interval: Интервал между проходами (секунды)
+
+        Returns:
+            threading.Thread: Запущенный daemon-поток
+        """
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    # Пока проход упирается в лимит - продолжаем без паузы
+                    while len(self.expire_stale(ttl_getter())) >= EXPIRY_SWEEP_BATCH:
+                        pass
+                except Exception as e:
+                    logger.error(f"Ошибка при удалении просроченных статусов: {e}")
+
+        thread = threading.Thread(target=run, name='status-expiry-sweeper', daemon=True)
+        thread.start()
+        return thread
+
+    def _write_status(self, conn: sqlite3.Connection, discord_id, status: str, reason: str) -> Dict[str, Any]:
+        """Записывает статус (вызывается внутри транзакции записи)."""
+        record = {'status': status, 'timestamp': time.time(), 'reason': reason or ''}
+        conn.execute(
+            "INSERT INTO application_statuses (discord_id, status, reason, timestamp) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(discord_id) DO UPDATE SET status = excluded.status, "
+            "reason = excluded.reason, timestamp = excluded.timestamp",
+            (str(discord_id), record['status'], record['reason'], record['timestamp'])
+        )
+        self._append_journal(conn, discord_id, record['status'], record['reason'], record['timestamp'])
+        return record
+
+    def _write_delete(self, conn: sqlite3.Connection, discord_id) -> bool:
+        """Удаляет статус (вызывается внутри транзакции записи)."""
+        cursor = conn.execute(
+            "DELETE FROM application_statuses WHERE discord_id = ?",
+            (str(discord_id),)
+        )
+        deleted = cursor.rowcount > 0
+        if deleted:
+            self._append_journal(conn, discord_id, None, '', time.time())
+        return deleted
+
+    @staticmethod
+    def _append_journal(conn: sqlite3.Connection, discord_id, status: Optional[str], reason: str, timestamp: float):
+        """Добавляет переход в журнал (вызывается внутри транзакции записи)."""
+        conn.execute(
+            "INSERT INTO application_status_journal (discord_id, status, reason, timestamp) VALUES (?, ?, ?, ?)",
+            (str(discord_id), status, reason, timestamp)
+        )
+
+    def history(self, discord_id) -> List[Dict[str, Any]]:
+        """
+        Возвращает историю переходов статуса заявителя (от старых к новым).
+
+        Args:
+            discord_id: ID пользователя Discord
+
+        Returns:
+            list: Записи журнала (status, reason, timestamp); status None - статус очищен
+        """
+        rows = self._connection().execute(
+            "SELECT status, reason, timestamp FROM application_status_journal "
+            "WHERE discord_id = ? ORDER BY seq",
+            (str(discord_id),)
+        ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def journal_size(self) -> int:
+        """Возвращает количество записей в журнале переходов."""
+        return self._connection().execute("SELECT COUNT(*) FROM application_status_journal").fetchone()[0]
+
+    def journal_excess(self, keep_per_user: int = JOURNAL_KEEP_PER_USER) -> int:
+        """
+        Возвращает количество записей журнала сверх последних keep_per_user
+        у каждого заявителя - столько удалит очистка журнала.
+
+        Считается по индексу (discord_id, seq) без чтения самих записей.
+        """
+        row = self._connection().execute(
+            "SELECT COALESCE(SUM(entries - ?), 0) FROM ("
+            "    SELECT COUNT(*) AS entries FROM application_status_journal GROUP BY discord_id"
+            ") WHERE entries > ?",
+            (keep_per_user, keep_per_user)
+        ).fetchone()
+        return row[0]
+
+    def trim_journal(self, threshold: int = JOURNAL_TRIM_THRESHOLD,
+                     keep_per_user: int = JOURNAL_KEEP_PER_USER) -> int:
+        """
+        Удаляет старую историю из журнала переходов, если в нем набралось больше порога лишних записей.
+
+        Текущее состояние всегда лежит в application_statuses, поэтому из журнала
+        можно удалять старые переходы: для каждого заявителя остаются последние keep_per_user.
+
+        Args:
+            threshold: Сколько удаляемых записей должно накопиться для очистки
+            keep_per_user: Сколько последних переходов хранить для каждого заявителя
+
+        Returns:
+            int: Количество удаленных записей
+        """
+        if self.journal_excess(keep_per_user) <= threshold:
+            return 0
+
+        conn = self._connection()
+        with _transaction(conn):
+            cursor = conn.execute(
+                "DELETE FROM application_status_journal WHERE seq IN ("
+                "    SELECT seq FROM ("
+                "        SELECT seq, ROW_NUMBER() OVER (PARTITION BY discord_id ORDER BY seq DESC) AS rn"
+                "        FROM application_status_journal"
+                "    ) WHERE rn > ?"
+                ")",
+                (keep_per_user,)
+            )
+        removed = cursor.rowcount
+        logger.info(f"Из журнала статусов удалено {removed} старых записей")
+        return removed
+
+    def start_journal_trimmer(self, interval: float = JOURNAL_TRIM_INTERVAL) -> threading.Thread:
+        """
+        Запускает фоновый поток, периодически удаляющий старую историю из журнала переходов.
+
+        Args:
+            interval: Интервал между проверками размера журнала (секунды)
+
+        Returns:
+            threading.Thread: Запущенный daemon-поток
+        """
+        def run():
+            checked_version = None
+            while True:
+                time.sleep(interval)
+                try:
+                    # Без новых переходов удалять нечего - журнал не сканируем
+                    version = self.version()
+                    if version == checked_version:
+                        continue
+                    checked_version = version
+                    self.trim_journal()
+                except Exception as e:
+                    logger.error(f"Ошибка при очистке журнала статусов: {e}")
+
+        thread = threading.Thread(target=run, name='status-journal-trimmer', daemon=True)
+        thread.start()
+        return thread
+
+    def get_many(self, discord_ids: List[Any]) -> Tuple[int, Dict[str, Optional[Dict[str, Any]]]]:
+        """
+        Получает статусы нескольких заявителей из одного снимка базы.
+
+        Args:
+            discord_ids: Список ID пользователей Discord
+
+        Returns:
+            tuple: (версия хранилища, словарь discord_id -> данные статуса или None)
+        """
+        keys = list(dict.fromkeys(str(discord_id) for discord_id in discord_ids))
+        conn = self._connection()
+        # Версия и строки читаются в одной транзакции чтения - это один снимок
+        conn.execute("BEGIN")
+        try:
+            version = self._read_version(conn)
+            found = {}
+            for offset in range(0, len(keys), 500):
+                chunk = keys[offset:offset + 500]
+                rows = conn.execute(
+                    "SELECT discord_id, status, reason, timestamp FROM application_statuses "
+                    f"WHERE discord_id IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                found.update((row['discord_id'], self._row_to_dict(row)) for row in rows)
+        finally:
+            conn.execute("COMMIT")
+        return version, {key: found.get(key) for key in keys}
+
+    def version(self) -> int:
+        """
+        Возвращает версию хранилища - номер последнего перехода в журнале.
+
+        Версия растет при каждом изменении статуса и не уменьшается при очистке журнала.
+        """
+        return self._read_version(self._connection())
+
+    @staticmethod
+    def _read_version(conn: sqlite3.Connection) -> int:
+        row = conn.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'application_status_journal'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _init_counts(self, conn: sqlite3.Connection):
+        """Один раз заполняет счетчики по статусам для базы, созданной до их появления."""
+        with _transaction(conn):
+            initialized = conn.execute(
+                "SELECT value FROM store_meta WHERE key = 'counts_initialized_at'"
+            ).fetchone()
+            if initialized:
+                return
+            conn.execute("DELETE FROM application_status_counts")
+            conn.execute(
+                "INSERT INTO application_status_counts (status, count) "
+                "SELECT status, COUNT(*) FROM application_statuses GROUP BY status"
+            )
+            conn.execute(
+                "INSERT INTO store_meta (key, value) VALUES ('counts_initialized_at', ?)",
+                (str(time.time()),)
+            )
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Возвращает количество заявок в каждом статусе.
+
+        Returns:
+            dict: Статус -> количество заявок (для всех допустимых статусов)
+        """
+        rows = self._connection().execute(
+            "SELECT status, count FROM application_status_counts"
+        ).fetchall()
+        counts = {status: 0 for status in VALID_STATUSES}
+        counts.update((row['status'], row['count']) for row in rows)
+        return counts
+
+    def list_by_status(self, status: str, after: Optional[str] = None,
+                       limit: int = 50) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Возвращает страницу заявителей с указанным статусом (keyset-пагинация).
+
+        Заявители упорядочены по времени установки статуса. Каждая страница - один
+        проход по индексу (status, timestamp, discord_id) без OFFSET.
+
+        Args:
+            status: Статус заявки
+            after: Курсор из предыдущей страницы или None для первой страницы
+            limit: Размер страницы
+
+        Returns:
+            tuple: (список записей с discord_id, курсор следующей страницы или None)
+        """
+        if status not in VALID_STATUSES:
+            raise ValueError(f"Недопустимый статус заявки: {status}")
+
+        query = ("SELECT discord_id, status, reason, timestamp FROM application_statuses "
+                 "WHERE status = ?")
+        params: List[Any] = [status]
+        if after:
+            after_timestamp, after_discord_id = _decode_cursor(after)
+            query += " AND (timestamp, discord_id) > (?, ?)"
+            params += [after_timestamp, after_discord_id]
+        query += " ORDER BY timestamp, discord_id LIMIT ?"
+        # Берем на одну запись больше, чтобы понять, есть ли следующая страница
+        params.append(limit + 1)
+
+        rows = self._connection().execute(query, params).fetchall()
+        items = [dict(self._row_to_dict(row), discord_id=row['discord_id']) for row in rows[:limit]]
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = _encode_cursor(last['timestamp'], last['discord_id'])
+        return items, next_cursor
+
+    def count(self) -> int:
+        """Возвращает количество сохраненных статусов."""
+        return self._connection().execute("SELECT COUNT(*) FROM application_statuses").fetchone()[0]
+
+    def migrate_from_json(self, json_path: str) -> int:
+        """
+        Одноразово импортирует статусы из старого JSON файла.
+
+        Повторный вызов ничего не делает: факт миграции запоминается в store_meta.
+
+        Args:
+            json_path: Путь к application_statuses.json
+
+        Returns:
+            int: Количество импортированных записей
+        """
+        conn = self._connection()
+        migrated = conn.execute(
+            "SELECT value FROM store_meta WHERE key = 'json_migrated_at'"
+        ).fetchone()
+        if migrated or not os.path.exists(json_path):
+            return 0
+
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                statuses = json.load(f)
+        except Exception as e:
+            logger.error(f"Ошибка при чтении {json_path} для миграции статусов: {e}")
+            return 0
+
+        rows = []
+        for discord_id, data in statuses.items():
+            if not isinstance(data, dict) or not data.get('status'):
+                logger.warning(f"Пропущена некорректная запись статуса для {discord_id}: {data}")
+                continue
+            rows.append((
+                str(discord_id),
+                data['status'],
+                data.get('reason') or '',
+                float(data.get('timestamp') or time.time())
+            ))
+
+        with _transaction(conn):
+            # Уже существующие записи в базе новее файла - не перезаписываем их
+            conn.executemany(
+                "INSERT OR IGNORE INTO application_statuses (discord_id, status, reason, timestamp) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+            conn.executemany(
+                "INSERT INTO application_status_journal (discord_id, status, reason, timestamp) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO store_meta (key, value) VALUES ('json_migrated_at', ?)",
+                (str(time.time()),)
+            )
+
+        logger.info(f"Импортировано {len(rows)} статусов заявок из {json_path} в {self.db_path}")
+        return len(rows)
+
+    def close(self):
+        """Закрывает соединение текущего потока."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class CachedStatusStore(StatusStore):
+    """
+    Хранилище статусов с read-through кэшем в памяти процесса.
+
+    Чтение статуса - поиск в словаре (LRU на STATUS_CACHE_SIZE записей).
+    Кэш соответствует версии хранилища _version. Собственная запись
+    переносится в кэш, только если до нее в базе не было чужих изменений;
+    изменение файла базы (mtime/inode) проверяется сравнением версий, и при
+    записи другим процессом кэш сбрасывается.
+    """
+
+    def __init__(self, *args, check_interval: float = 1.0, max_size: int = STATUS_CACHE_SIZE, **kwargs):
+        """
+        Args:
+            check_interval: Как часто (в секундах) сверять файл базы на изменения
+            max_size: Максимум записей в кэше
+        """
+        self._cache: "OrderedDict[str, Optional[Dict[str, Any]]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._max_size = max_size
+        self._check_interval = check_interval
+        self._next_check = 0.0
+        self._file_signature = None
+        self._version = 0
+        # Номер поколения кэша: растет при каждой записи и сбросе, чтобы промах
+        # не положил в кэш строку, прочитанную до параллельной записи
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        super().__init__(*args, **kwargs)
+        self._file_signature = self._read_file_signature()
+        self._version = self.version()
+
+    def _read_file_signature(self):
+        """Снимок (inode, mtime, size) файла базы и WAL журнала."""
+        signature = []
+        for path in (self.db_path, self.db_path + '-wal'):
+            try:
+                st = os.stat(path)
+                signature.append((st.st_ino, st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _check_file_changed(self):
+        """Сбрасывает кэш, если базу изменил другой процесс."""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self._check_interval
+
+        signature = self._read_file_signature()
+        if signature == self._file_signature:
+            return
+        # Файл меняют и собственные записи - чужую запись выдает только версия
+        version = self.version()
+        with self._cache_lock:
+            self._file_signature = signature
+            if version != self._version:
+                self._clear(version)
+                logger.debug("Базу статусов изменил другой процесс, кэш статусов сброшен")
+
+    def _clear(self, version: int):
+        """Сбрасывает кэш (вызывается под _cache_lock)."""
+        self._cache.clear()
+        self._version = version
+        self._generation += 1
+        self.invalidations += 1
+
+    def _remember(self, key: str, record: Optional[Dict[str, Any]]):
+        """Кладет запись в кэш, вытесняя давно не читавшиеся (вызывается под _cache_lock)."""
+        self._cache[key] = record
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._max_size:
+            self._cache.popitem(last=False)
+
+    def get(self, discord_id) -> Optional[Dict[str, Any]]:
+        self._check_file_changed()
+
+        key = str(discord_id)
+        with self._cache_lock:
+            cached = key in self._cache
+            if cached:
+                record = self._cache[key]
+                self._cache.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+                generation = self._generation
+
+        if not cached:
+            record = super().get(key)
+            with self._cache_lock:
+                if generation == self._generation:
+                    self._remember(key, record)
+
+        # Отдаем копию, чтобы вызывающий код не испортил закэшированную запись
+        return dict(record) if record else None
+
+    def _after_write(self, changes: List[Tuple[str, Optional[Dict[str, Any]]]],
+                     version_before: int, version_after: int):
+        with self._cache_lock:
+            if version_before != self._version:
+                # Перед этой записью базу изменил другой процесс - кэш устарел
+                self._clear(version_after)
+                return
+            for key, record in changes:
+                self._remember(key, dict(record) if record else None)
+            self._version = version_after
+            self._generation += 1
+
+    def invalidate(self, discord_id=None):
+        """
+        Явно сбрасывает кэш.
+
+        Args:
+            discord_id: ID пользователя или None для сброса всего кэша
+        """
+        with self._cache_lock:
+            if discord_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(str(discord_id), None)
+            self._generation += 1
+            self.invalidations += 1
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Возвращает счетчики попаданий и промахов кэша."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'size': len(self._cache)
+        }
+
+
+class StatusWriter:
+    """
+    Объединяет изменения статусов, пришедшие в коротком окне, в одну запись.
+
+    Все изменения пачки применяются одной транзакцией SQLite (атомарно, один
+    fsync журнала WAL). Вызывающий код получает Future, который завершается,
+    когда изменение надежно записано на диск.
+    """
+
+    def __init__(self, store: StatusStore, window: float = 0.05, max_batch: int = 500):
+        """
+        Args:
+            store: Хранилище, в которое пишутся изменения
+            window: Окно накопления изменений (секунды)
+            max_batch: Максимальный размер пачки
+        """
+        self.store = store
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'batches': 0,
+            'operations': 0,
+            'last_batch_size': 0,
+            'max_batch_size': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0
+        }
+        self._thread = threading.Thread(target=self._run, name='status-writer', daemon=True)
+        self._thread.start()
+
+    def set(self, discord_id, status: str, reason: str = '') -> Future:
+        """
+        Ставит в очередь сохранение статуса.
+
+        Returns:
+            Future: Результат - сохраненная запись статуса
+        """
+        if status not in VALID_STATUSES:
+            raise ValueError(f"Недопустимый статус заявки: {status}")
+        return self._submit(('set', str(discord_id), status, reason or ''))
+
+    def delete(self, discord_id) -> Future:
+        """
+        Ставит в очередь удаление статуса.
+
+        Returns:
+            Future: Результат - True если статус был удален
+        """
+        return self._submit(('delete', str(discord_id)))
+
+    def _submit(self, operation: tuple) -> Future:
+        future = Future()
+        self._queue.put((operation, future))
+        return future
+
+    def _run(self):
+        """Цикл фонового потока записи."""
+        # Для соединения потока записи коммит должен быть надежным (fsync WAL)
+        self.store._connection().execute("PRAGMA synchronous=FULL")
+
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch: List[tuple]):
+        """Применяет пачку изменений одной транзакцией и завершает Future."""
+        started = time.perf_counter()
+        try:
+            results = self.store.apply_batch([operation for operation, _ in batch])
+        except Exception as e:
+            logger.error(f"Ошибка при записи пачки из {len(batch)} изменений статусов: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        flush_ms = (time.perf_counter() - started) * 1000
+        with self._metrics_lock:
+            metrics = self._metrics
+            metrics['batches'] += 1
+            metrics['operations'] += len(batch)
+            metrics['last_batch_size'] = len(batch)
+            metrics['max_batch_size'] = max(metrics['max_batch_size'], len(batch))
+            metrics['last_flush_ms'] = flush_ms
+            metrics['max_flush_ms'] = max(metrics['max_flush_ms'], flush_ms)
+            metrics['total_flush_ms'] += flush_ms
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+        logger.debug(f"Записана пачка из {len(batch)} изменений статусов за {flush_ms:.1f} мс")
+
+    def metrics(self) -> Dict[str, Any]:
+        """Возвращает метрики размера пачек и задержки записи."""
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        batches = metrics.pop('batches')
+        total_flush_ms = metrics.pop('total_flush_ms')
+        metrics['batches'] = batches
+        metrics['avg_batch_size'] = metrics['operations'] / batches if batches else 0
+        metrics['avg_flush_ms'] = total_flush_ms / batches if batches else 0.0
+        metrics['queued'] = self._queue.qsize()
+        return metrics
+
+
+def _encode_cursor(timestamp: float, discord_id: str) -> str:
+    """Кодирует позицию в индексе статусов в курсор пагинации."""
+    return f"{timestamp!r}_{discord_id}"
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, str]:
+    """Декодирует курсор пагинации; ValueError при некорректном курсоре."""
+    timestamp, separator, discord_id = cursor.partition('_')
+    if not separator or not discord_id:
+        raise ValueError(f"Некорректный курсор: {cursor}")
+    return float(timestamp), discord_id
+
+
+class _transaction:
+    """Контекстный менеджер для записи в BEGIN IMMEDIATE транзакции."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self):
+        # IMMEDIATE сразу берет блокировку на запись - параллельные записи
+        # из других потоков/процессов ждут, а не теряют изменения
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
+
+
+# Глобальный экземпляр хранилища
+_store_instance: Optional[CachedStatusStore] = None
+_store_lock = threading.Lock()
+
+
+def get_status_store() -> CachedStatusStore:
+    """Получает глобальный экземпляр хранилища статусов (с кэшем)."""
+    global _store_instance
+    if _store_instance is None:
+        with _store_lock:
+            if _store_instance is None:
+                db_path = os.environ.get('APPLICATION_STATUS_DB', DEFAULT_DB_PATH)
+                _store_instance = CachedStatusStore(db_path)
+                _store_instance.start_journal_trimmer()
+                # TTL статусов берутся из конфигурации бота при каждом проходе
+                from bot.config_manager import get_application_status_ttls
+                _store_instance.start_expiry_sweeper(get_application_status_ttls)
+    return _store_instance
+
+
+_writer_instance: Optional[StatusWriter] = None
+
+
+def get_status_writer() -> StatusWriter:
+    """Получает глобальный экземпляр объединяющей записи статусов."""
+    global _writer_instance
+    if _writer_instance is None:
+        store = get_status_store()
+        with _store_lock:
+            if _writer_instance is None:
+                _writer_instance = StatusWriter(store)
+    return _writer_instance
@@ -1,42 +1,250 @@
-import pytest
-import sys
+import asyncio
 import os
+import sys
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from quart import session
 
 # Добавляем корневую директорию проекта в путь Python
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import app as app_module
+import status_store as status_store_module
 from app import app
+from permission_cache import PermissionCache
+from status_store import StatusStore
+
 
 @pytest.fixture
 def client():
-    """Фикстура для создания тестового клиента Flask."""
+    """Фикстура для создания тестового клиента Quart."""
     app.config['TESTING'] = True
-    with app.test_client() as client:
-        yield client
+    return app.test_client()
+
 
-def test_index_route(client):
+async def test_index_route(client):
     """Тест главной страницы."""
-    response = client.get('/')
+    response = await client.get('/')
     assert response.status_code == 200
 
-def test_about_route(client):
+
+async def test_about_route(client):
     """Тест страницы about."""
-    response = client.get('/about')
+    response = await client.get('/about')
     assert response.status_code == 200
 
-def test_rules_route(client):
+
+async def test_rules_route(client):
     """Тест страницы rules."""
-    response = client.get('/rules')
+    response = await client.get('/rules')
     assert response.status_code == 200
 
-def test_build_route(client):
+
+async def test_build_route(client):
     """Тест страницы build."""
-    response = client.get('/build')
+    response = await client.get('/build')
     assert response.status_code == 200
 
-def test_apply_route(client):
+
+async def test_apply_route(client):
     """Тест страницы apply - проверяем редирект на авторизацию."""
-    response = client.get('/apply')
+    response = await client.get('/apply')
     # Страница подачи заявки требует авторизации, поэтому ожидаем редирект
     assert response.status_code == 302
-    assert '/login' in response.location or '/auth/discord' in response.location
\ No newline at end of file
+    assert '/login' in response.location or '/auth/discord' in response.location
+
+
+@pytest.fixture
+def status_store(tmp_path, monkeypatch):
+    """Подменяет глобальное хранилище статусов временной базой."""
+    store = status_store_module.CachedStatusStore(str(tmp_path / 'statuses.db'), legacy_json_path=None)
+    monkeypatch.setattr(status_store_module, '_store_instance', store)
+    monkeypatch.setattr(status_store_module, '_writer_instance', status_store_module.StatusWriter(store, window=0))
+    return store
+
+
+API_HEADERS = {'X-API-Key': os.getenv('INTERNAL_API_KEY', 'your-secret-api-key')}
+
+
+async def test_batch_application_status(client, status_store):
+    """Тест пакетного получения статусов с поддержкой ETag."""
+    status_store.set('1', 'candidate')
+
+    response = await client.post('/api/application-status/batch',
+                                 json={'discord_ids': ['1', '2']}, headers=API_HEADERS)
+    assert response.status_code == 200
+    data = await response.get_json()
+    assert data['statuses']['1']['status'] == 'candidate'
+    assert data['statuses']['2'] is None
+
+    etag = response.headers['ETag']
+    response = await client.post('/api/application-status/batch', json={'discord_ids': ['2', '1']},
+                                 headers={**API_HEADERS, 'If-None-Match': etag})
+    assert response.status_code == 304
+
+    status_store.set('2', 'pending')
+    response = await client.post('/api/application-status/batch', json={'discord_ids': ['1', '2']},
+                                 headers={**API_HEADERS, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert (await response.get_json())['statuses']['2']['status'] == 'pending'
+
+
+async def test_bulk_application_statuses(client, status_store):
+    """Пачка изменений из очереди бота применяется целиком, некорректная отклоняется."""
+    status_store.set('2', 'pending')
+
+    response = await client.post('/api/application-statuses', json={'updates': [
+        {'discord_id': '1', 'status': 'rejected', 'reason': 'мало информации', 'seq': 1},
+        {'discord_id': '2', 'status': None, 'reason': '', 'seq': 2},
+    ]}, headers=API_HEADERS)
+    assert response.status_code == 200
+    assert (await response.get_json())['applied'] == 2
+    assert status_store.get('1')['reason'] == 'мало информации'
+    assert status_store.get('2') is None
+
+    response = await client.post('/api/application-statuses', json={'updates': [
+        {'discord_id': '3', 'status': 'approved'},
+        {'discord_id': '4', 'status': 'unknown'},
+    ]}, headers=API_HEADERS)
+    assert response.status_code == 400
+    assert status_store.get('3') is None
+
+
+async def test_stale_permissions_refresh_in_background(monkeypatch):
+    """Устаревшие права отдаются сразу, а проверка в Discord идет в фоне."""
+
+    cache = PermissionCache()
+    monkeypatch.setattr(app_module, 'get_permission_cache', lambda: cache)
+    monkeypatch.setattr(app_module, 'get_permission_refresh_windows',
+                        lambda: {'refresh_interval': 60, 'stale_window': 3600})
+
+    release = asyncio.Event()
+
+    async def slow_check(*args):
+        await release.wait()
+        return True
+
+    discord_auth = app_module.discord_auth
+    monkeypatch.setattr(discord_auth, 'get_access_token', lambda user_id: asyncio.sleep(0, 'token'))
+    monkeypatch.setattr(discord_auth, 'check_admin_permissions', slow_check)
+    monkeypatch.setattr(discord_auth, 'check_minebuild_member', slow_check)
+
+    async with app.test_request_context('/'):
+        session['user_id'] = '1'
+        session['is_admin'] = False
+        session['is_minebuild_member'] = False
+        session['permissions_check_time'] = (datetime.now() - timedelta(minutes=5)).isoformat()
+
+        permissions = await app_module.check_and_update_user_permissions()
+        assert permissions == {'is_admin': False, 'is_minebuild_member': False}
+
+        release.set()
+        await app_module.discord_auth.flights.get(('permissions', '1'))
+
+        permissions = await app_module.check_and_update_user_permissions()
+        assert permissions == {'is_admin': True, 'is_minebuild_member': True}
+        assert session['is_admin'] is True
+
+
+async def test_forced_permission_refresh_skips_cache(monkeypatch):
+    """Принудительное обновление прав проверяет Discord, даже если права есть в кэше."""
+
+    cache = PermissionCache()
+    cache.set('1', False, False)
+    monkeypatch.setattr(app_module, 'get_permission_cache', lambda: cache)
+
+    checks = []
+
+    async def check(*args):
+        checks.append(args)
+        return True
+
+    discord_auth = app_module.discord_auth
+    monkeypatch.setattr(discord_auth, 'get_access_token', lambda user_id: asyncio.sleep(0, 'token'))
+    monkeypatch.setattr(discord_auth, 'check_admin_permissions', check)
+    monkeypatch.setattr(discord_auth, 'check_minebuild_member', check)
+
+    async with app.test_request_context('/'):
+        session['user_id'] = '1'
+
+        assert await app_module.check_and_update_user_permissions() == {'is_admin': False, 'is_minebuild_member': False}
+        assert checks == []
+
+        permissions = await app_module.check_and_update_user_permissions(force=True)
+        assert permissions == {'is_admin': True, 'is_minebuild_member': True}
+        assert len(checks) == 2
+        assert cache.get('1')['is_admin'] is True
+
+
+async def test_application_status_conditional_request(client, status_store):
+    """Повторный запрос статуса с If-None-Match получает 304, пока статус не изменился."""
+    status_store.set('1', 'pending')
+
+    response = await client.post('/api/application-status', json={'discord_id': '1'}, headers=API_HEADERS)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    headers = dict(API_HEADERS, **{'If-None-Match': etag})
+    response = await client.post('/api/application-status', json={'discord_id': '1'}, headers=headers)
+    assert response.status_code == 304
+
+    status_store.set('1', 'approved')
+    response = await client.post('/api/application-status', json={'discord_id': '1'}, headers=headers)
+    assert response.status_code == 200
+    assert (await response.get_json())['status'] == 'approved'
+
+
+async def test_application_status_etag_matches_body_across_processes(client, status_store):
+    """Запись другого процесса не дает отдать устаревший статус под новым ETag."""
+
+    status_store.set('1', 'pending')
+    assert status_store.get('1')['status'] == 'pending'  # запись в кэше процесса
+    other_process = StatusStore(status_store.db_path, legacy_json_path=None)
+    other_process.set('1', 'approved')
+
+    response = await client.post('/api/application-status', json={'discord_id': '1'}, headers=API_HEADERS)
+    assert (await response.get_json())['status'] == 'approved'
+    assert response.headers['ETag'].strip('"') == f"{other_process.version()}-1"
+
+
+async def test_donation_retry_skips_completed_steps(monkeypatch):
+    """Повтор доната выполняет только невыполненные шаги."""
+
+    calls = []
+
+    async def run_donation_step(step, nickname, amount):
+        calls.append(step)
+        if step == 'suffix' and calls.count('suffix') == 1:
+            raise RuntimeError('RCON недоступен')
+
+    bot = SimpleNamespace(get_donation_steps=lambda amount: ['announce', 'role', 'suffix'],
+                          run_donation_step=run_donation_step)
+    monkeypatch.setattr(app_module.app, 'bot', bot, raising=False)
+
+    donation = {'nickname': 'Steve', 'amount': 500.0}
+    with pytest.raises(RuntimeError):
+        await app_module.fulfill_donation(donation)
+    assert donation['completed_steps'] == ['announce', 'role']
+
+    assert await app_module.fulfill_donation(donation) == ['announce', 'role', 'suffix']
+    assert calls == ['announce', 'role', 'suffix', 'suffix']
+
+
+async def test_application_delivery_is_bounded(monkeypatch):
+    """Зависшая отправка заявки прерывается по таймауту, а ключ идемпотентности передается боту."""
+
+    calls = []
+
+    async def create_application_message(discord_id, embed, submission_id=None):
+        calls.append(submission_id)
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(app_module.app, 'bot', SimpleNamespace(create_application_message=create_application_message),
+                        raising=False)
+    monkeypatch.setattr(app_module, 'APPLICATION_DELIVERY_TIMEOUT', 0.01)
+
+    application = {'discord_id': '1', 'nickname': 'Steve', 'submission_id': 'abc'}
+    assert await app_module.process_application_in_discord(application) is False
+    assert calls == ['abc']
@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+import pytest
+
+import bot.main as bot_main
+from bot.main import MineBuildBot
+from bot.utils.applications import ApplicationDeliveries
+
+
+@pytest.fixture
+def delivery(tmp_path, monkeypatch):
+    deliveries = ApplicationDeliveries(str(tmp_path / 'deliveries.db'))
+    sent = []
+
+    async def fake_send(channel, discord_id, embed, submission_id=None):
+        sent.append(submission_id)
+        return 1000 + len(sent)
+
+    async def fake_find(channel, submission_id):
+        return None
+
+    monkeypatch.setattr(bot_main, 'get_application_deliveries', lambda: deliveries)
+    monkeypatch.setattr(bot_main, 'send_application_message', fake_send)
+    monkeypatch.setattr(bot_main, 'find_application_message', fake_find)
+    bot = SimpleNamespace(channel_for_applications=object())
+    return bot, deliveries, sent
+
+
+async def test_repeated_submission_is_sent_once(delivery):
+    bot, deliveries, sent = delivery
+
+    assert await MineBuildBot.create_application_message(bot, '1', None, submission_id='s1') is True
+    assert await MineBuildBot.create_application_message(bot, '1', None, submission_id='s1') is True
+    assert sent == ['s1']
+    assert deliveries.get('s1')['message_id'] == 1001
+
+
+async def test_unknown_outcome_is_resolved_from_channel(delivery, monkeypatch):
+    bot, deliveries, sent = delivery
+    deliveries.begin('s1')
+
+    # Прошлая попытка еще может выполняться - повторять рано
+    with pytest.raises(RuntimeError):
+        await MineBuildBot.create_application_message(bot, '1', None, submission_id='s1')
+
+    # Попытка завершилась, и ее сообщение нашлось в канале
+    deliveries._connection().execute("UPDATE application_deliveries SET started_at = 0")
+
+    async def found(channel, submission_id):
+        return 555
+
+    monkeypatch.setattr(bot_main, 'find_application_message', found)
+    assert await MineBuildBot.create_application_message(bot, '1', None, submission_id='s1') is True
+    assert sent == []
+    assert deliveries.get('s1')['message_id'] == 555
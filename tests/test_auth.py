@@ -0,0 +1,244 @@
+"""
+Тесты HTTP клиента DiscordAuth
+"""
+
+import pytest
+
+import auth
+from auth import DiscordAuth
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None, payload=None):
+        self.url = 'https://discord.com/api'
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._payload = payload or {}
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise auth.DiscordHTTPError(self)
+
+
+def returning(value):
+    """Асинхронная подмена метода, возвращающая value."""
+    async def fake(*args, **kwargs):
+        return value
+    return fake
+
+
+@pytest.fixture
+def discord_auth(monkeypatch):
+    instance = DiscordAuth()
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(auth.asyncio, 'sleep', fake_sleep)
+    instance.sleeps = sleeps
+    return instance
+
+
+async def test_request_retries_on_rate_limit(discord_auth, monkeypatch):
+    """Ответ 429 повторяется после паузы из Retry-After."""
+    responses = [FakeResponse(429, headers={'Retry-After': '0.5'}), FakeResponse(200)]
+
+    async def fake_send(method, url, **kwargs):
+        return responses.pop(0)
+
+    monkeypatch.setattr(discord_auth, '_send', fake_send)
+
+    response = await discord_auth._request('GET', f"{discord_auth.DISCORD_API_BASE}/users/@me")
+
+    assert response.status_code == 200
+    assert discord_auth.sleeps == [0.5]
+
+
+async def test_request_gives_up_after_max_retries(discord_auth, monkeypatch):
+    """После исчерпания повторов возвращается последний ответ 429."""
+    monkeypatch.setattr(discord_auth, '_send', returning(FakeResponse(429, payload={'retry_after': 60})))
+
+    response = await discord_auth._request('GET', f"{discord_auth.DISCORD_API_BASE}/users/@me")
+
+    assert response.status_code == 429
+    assert discord_auth.sleeps == [auth.DISCORD_MAX_RETRY_AFTER] * auth.DISCORD_MAX_RETRIES
+
+
+async def test_fetch_login_data_derives_permissions(discord_auth, monkeypatch):
+    """Права при входе вычисляются из одного списка серверов и записи участника."""
+    discord_auth.GUILD_ID = '42'
+    monkeypatch.setattr(auth, 'get_whitelist_role_id', lambda: 7)
+    monkeypatch.setattr(discord_auth, 'get_user_info', returning({'id': '1', 'username': 'steve'}))
+    monkeypatch.setattr(discord_auth, 'get_user_guilds',
+                        returning([{'id': '5', 'permissions': '8'}, {'id': '42', 'permissions': '8'}]))
+    monkeypatch.setattr(discord_auth, 'get_guild_member', returning({'roles': ['7']}))
+
+    login_data = await discord_auth.fetch_login_data('token')
+
+    assert login_data['user']['id'] == '1'
+    assert login_data['guild_member'] is True
+    assert login_data['is_admin'] is True
+    assert login_data['is_minebuild_member'] is True
+
+
+async def test_fetch_login_data_for_non_member(discord_auth, monkeypatch):
+    """Пользователь вне сервера не получает ни админских прав, ни роли."""
+    discord_auth.GUILD_ID = '42'
+    monkeypatch.setattr(discord_auth, 'get_user_info', returning({'id': '1', 'username': 'steve'}))
+    monkeypatch.setattr(discord_auth, 'get_user_guilds', returning([{'id': '5', 'permissions': '8'}]))
+    monkeypatch.setattr(discord_auth, 'get_guild_member', returning(None))
+
+    login_data = await discord_auth.fetch_login_data('token')
+
+    assert login_data['guild_member'] is False
+    assert login_data['is_admin'] is False
+    assert login_data['is_minebuild_member'] is False
+
+
+def test_permission_cache_ttl_and_invalidation(monkeypatch):
+    """Отрицательные записи живут меньше, invalidate сбрасывает запись сразу."""
+    import permission_cache
+    from permission_cache import PermissionCache
+
+    now = [1000.0]
+    monkeypatch.setattr(permission_cache.time, 'monotonic', lambda: now[0])
+    cache = PermissionCache(ttl=300, negative_ttl=60)
+
+    cache.set('1', True, False)
+    cache.set('2', False, False)
+    now[0] += 100
+    assert cache.get('1') == {'is_admin': True, 'is_minebuild_member': False}
+    assert cache.get('2') is None
+
+    cache.invalidate(1)
+    assert cache.get('1') is None
+    assert cache.stats()['hits'] == 1
+
+
+async def test_role_checks_use_bot_member_cache(discord_auth, monkeypatch):
+    """Права и роль берутся из кэша бота без запросов к Discord."""
+    from types import SimpleNamespace
+
+    member = SimpleNamespace(
+        roles=[SimpleNamespace(id=7)],
+        guild_permissions=SimpleNamespace(administrator=True)
+    )
+    guild = SimpleNamespace(get_member=lambda user_id: member if user_id == 1 else None)
+    discord_auth.bot = SimpleNamespace(is_ready=lambda: True, get_guild=lambda guild_id: guild)
+    discord_auth.GUILD_ID = '42'
+    monkeypatch.setattr(auth, 'get_whitelist_role_id', lambda: 7)
+
+    async def no_network(*args, **kwargs):
+        raise AssertionError('запрос к Discord не ожидался')
+
+    monkeypatch.setattr(discord_auth, '_send', no_network)
+
+    assert await discord_auth.check_admin_permissions('token', '1') is True
+    assert await discord_auth.check_minebuild_member('1', 'token') is True
+    assert discord_auth.get_cached_member('2') is None
+
+
+async def test_token_refresh_is_single_flight(discord_auth, monkeypatch, tmp_path):
+    """Токен близкий к истечению обновляется в фоне одним запросом на пользователя."""
+    import asyncio
+    from token_store import TokenStore
+
+    discord_auth.token_store = TokenStore(str(tmp_path / 'tokens.db'))
+    discord_auth.store_tokens('1', {'access_token': 'old', 'refresh_token': 'r1', 'expires_in': 60})
+
+    release = asyncio.Event()
+    calls = []
+
+    async def fake_request(method, url, **kwargs):
+        calls.append(kwargs['data'])
+        await release.wait()
+        return FakeResponse(200, payload={'access_token': 'new', 'refresh_token': 'r2', 'expires_in': 604800})
+
+    monkeypatch.setattr(discord_auth, '_request', fake_request)
+
+    assert await discord_auth.get_access_token('1') == 'old'
+    assert await discord_auth.get_access_token('1') == 'old'
+    refresh = discord_auth.flights.get(('refresh_token', '1'))
+
+    release.set()
+    await refresh
+
+    assert [call['refresh_token'] for call in calls] == ['r1']
+    assert await discord_auth.get_access_token('1') == 'new'
+    assert discord_auth.flights.stats()['in_flight'] == 0
+
+
+async def test_revoked_refresh_token_is_dropped(discord_auth, monkeypatch, tmp_path):
+    """Отозванный refresh token удаляется, истекший токен не возвращается."""
+    from token_store import TokenStore
+
+    discord_auth.token_store = TokenStore(str(tmp_path / 'tokens.db'))
+    discord_auth.store_tokens('1', {'access_token': 'old', 'refresh_token': 'r1', 'expires_in': 0})
+    monkeypatch.setattr(discord_auth, '_request', returning(FakeResponse(400, payload={'error': 'invalid_grant'})))
+
+    assert await discord_auth.get_access_token('1') is None
+    assert discord_auth.token_store.get('1') is None
+
+
+async def test_concurrent_role_checks_share_one_request(discord_auth, monkeypatch):
+    """Одновременные проверки роли одного пользователя выполняют один запрос."""
+    import asyncio
+
+    discord_auth.GUILD_ID = '42'
+    discord_auth.BOT_TOKEN = 'bot'
+    monkeypatch.setattr(auth, 'get_whitelist_role_id', lambda: 7)
+
+    release = asyncio.Event()
+    calls = []
+
+    async def fake_request(method, url, **kwargs):
+        calls.append(url)
+        await release.wait()
+        return FakeResponse(200, payload={'roles': ['7']})
+
+    monkeypatch.setattr(discord_auth, '_request', fake_request)
+
+    checks = [asyncio.ensure_future(discord_auth.check_minebuild_member('1', 'token')) for _ in range(5)]
+    release.set()
+
+    assert await asyncio.gather(*checks) == [True] * 5
+    assert len(calls) == 1
+    assert discord_auth.flights.stats() == {'started': 1, 'shared': 4, 'in_flight': 0}
+
+
+async def test_membership_refresh_without_token_logs_out(discord_auth, monkeypatch):
+    """Без действующего токена пользователь разлогинивается, а не уходит в цикл редиректов на /login."""
+    from quart import Quart, session
+
+    app = Quart(__name__)
+    app.secret_key = 'test'
+    monkeypatch.setattr(discord_auth, 'get_access_token', returning(None))
+
+    async with app.test_request_context('/apply'):
+        session['user_id'] = '1'
+        session['guild_member'] = True
+
+        assert await discord_auth.refresh_guild_membership() is False
+        assert 'user_id' not in session
+
+
+async def test_refresh_token_rotated_by_other_process_is_kept(discord_auth, monkeypatch, tmp_path):
+    """Проигравший гонку обновления процесс не удаляет токены, сохраненные победителем."""
+    from token_store import TokenStore
+
+    discord_auth.token_store = TokenStore(str(tmp_path / 'tokens.db'))
+    discord_auth.store_tokens('1', {'access_token': 'old', 'refresh_token': 'r1', 'expires_in': 0})
+
+    async def rejected_after_rotation(method, url, **kwargs):
+        # Другой воркер обменял r1 раньше и сохранил новые токены
+        discord_auth.token_store.save('1', {'access_token': 'new', 'refresh_token': 'r2', 'expires_in': 604800})
+        return FakeResponse(400, payload={'error': 'invalid_grant'})
+
+    monkeypatch.setattr(discord_auth, '_request', rejected_after_rotation)
+
+    assert await discord_auth.get_access_token('1') == 'new'
+    assert discord_auth.token_store.get('1')['refresh_token'] == 'r2'
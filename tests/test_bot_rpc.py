@@ -0,0 +1,147 @@
+"""
+Тесты вызовов бота из отдельного процесса сайта через Unix-сокет
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+import bot_rpc
+from bot_rpc import BotRPCClient, BotRPCError, BotRPCServer
+
+
+class FakeBot:
+    """Бот с методами, которые сайт вызывает через сокет."""
+
+    def __init__(self):
+        self.applications = []
+        self.listeners = {}
+        member = SimpleNamespace(roles=[SimpleNamespace(id=7)],
+                                 guild_permissions=SimpleNamespace(administrator=False))
+        self.guild = SimpleNamespace(get_member=lambda user_id: member if user_id == 1 else None)
+
+    def is_ready(self):
+        return True
+
+    def add_listener(self, callback, name):
+        self.listeners[name] = callback
+
+    def remove_listener(self, callback, name):
+        self.listeners.pop(name, None)
+
+    def get_guild(self, guild_id):
+        return self.guild
+
+    async def create_application_message(self, discord_id, embed, submission_id=None):
+        self.applications.append((discord_id, embed, submission_id))
+        return True
+
+    async def handle_donation(self, nickname, amount):
+        return True
+
+    async def run_donation_step(self, step, nickname, amount):
+        raise RuntimeError(f"RCON недоступен ({step})")
+
+    async def report_donation_failure(self, nickname, step):
+        pass
+
+    async def handle_application_expired(self, discord_id, status):
+        pass
+
+
+@pytest.fixture
+async def rpc(tmp_path, monkeypatch):
+    monkeypatch.setattr('bot.config.GUILD_ID', 42)
+    bot = FakeBot()
+    server = BotRPCServer(bot, str(tmp_path / 'bot.sock'))
+    await server.start()
+    client = BotRPCClient(server.path, timeout=5, ping_interval=0.01)
+    await client.start()
+    for _ in range(100):
+        if client.is_ready():
+            break
+        await asyncio.sleep(0.01)
+    yield bot, server, client
+    await client.close()
+    await server.close()
+
+
+async def test_client_calls_bot_methods(rpc):
+    bot, server, client = rpc
+    assert client.is_ready()
+
+    embed = discord.Embed(title="Заявка на сервер", color=0x00E5A1)
+    embed.add_field(name='Игровой никнейм в Minecraft', value='Steve', inline=True)
+    assert await client.create_application_message('1', embed, submission_id='abc') is True
+    discord_id, received, submission_id = bot.applications[0]
+    assert (discord_id, submission_id) == ('1', 'abc')
+    assert received.fields[0].value == 'Steve'
+
+    assert await client.get_member_info(1) == {'is_admin': False, 'role_ids': [7]}
+    assert await client.get_member_info(2) is None
+    assert client.get_donation_steps(500) == ['announce', 'role', 'suffix']
+
+    # Ошибка шага доната возвращается вызывающему, и очередь повторит задачу
+    with pytest.raises(BotRPCError, match='RCON'):
+        await client.run_donation_step('suffix', 'Steve', 500)
+
+
+async def test_client_reports_unavailable_bot(rpc):
+    bot, server, client = rpc
+    await server.close()
+    for _ in range(100):
+        if not client.is_ready():
+            break
+        await asyncio.sleep(0.01)
+
+    assert not client.is_ready()
+    with pytest.raises(BotRPCError):
+        await client.handle_donation('Steve', 100)
+
+
+async def test_events_reach_every_worker(rpc, monkeypatch):
+    """События бота получают все воркеры, событие воркера - остальные воркеры."""
+    bot, server, client = rpc
+    monkeypatch.setattr('bot.config_manager.get_whitelist_role_id', lambda: 7)
+    received = {'first': [], 'second': []}
+    client.on_event = lambda *event: received['first'].append(event)
+    second = BotRPCClient(server.path, timeout=5, ping_interval=0.01,
+                          on_event=lambda *event: received['second'].append(event))
+    try:
+        await second.start()
+        for _ in range(100):
+            if second.is_ready():
+                break
+            await asyncio.sleep(0.01)
+
+        member = SimpleNamespace(id=1, roles=[SimpleNamespace(id=7)],
+                                 guild_permissions=SimpleNamespace(administrator=False))
+        before = SimpleNamespace(roles=[], guild_permissions=member.guild_permissions)
+        await bot.listeners['on_member_update'](before, member)
+        client.publish('application_status', 1, {'status': 'approved', 'reason': ''})
+        for _ in range(100):
+            if len(received['second']) == 2:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await second.close()
+
+    permissions = ('permissions', '1', {'is_admin': False, 'is_minebuild_member': True})
+    assert received['first'] == [permissions]
+    assert received['second'] == [permissions, ('application_status', '1', {'status': 'approved', 'reason': ''})]
+
+
+async def test_slow_worker_is_disconnected(rpc, monkeypatch):
+    bot, server, client = rpc
+    monkeypatch.setattr(bot_rpc, 'BOT_RPC_MAX_BUFFER', -1)
+
+    server.broadcast('permissions', 1, None)
+    assert not server._clients
+
+
+def test_frame_size_is_limited(monkeypatch):
+    monkeypatch.setattr(bot_rpc, 'BOT_RPC_MAX_FRAME', 16)
+    with pytest.raises(BotRPCError):
+        bot_rpc.encode_frame({'data': 'x' * 32})
@@ -0,0 +1,61 @@
+"""
+Тесты учета лимитов Discord API
+"""
+
+import discord_ratelimit
+from discord_ratelimit import DiscordRateLimiter
+
+
+def test_route_key_keeps_major_params_only():
+    """ID пользователя обобщается, ID сервера остается частью маршрута."""
+    first = DiscordRateLimiter.route_key('GET', '/guilds/42/members/1', 'Bot x')
+    second = DiscordRateLimiter.route_key('get', '/guilds/42/members/2', 'Bot x')
+    other_token = DiscordRateLimiter.route_key('GET', '/guilds/42/members/1', 'Bearer y')
+
+    assert first == second
+    assert first.endswith('GET /guilds/42/members/{id}')
+    assert first != other_token
+
+
+async def test_acquire_waits_for_exhausted_bucket(monkeypatch):
+    """Запрос в исчерпанный bucket ждет его сброса вместо получения 429."""
+    now = [100.0]
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    monkeypatch.setattr(discord_ratelimit.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(discord_ratelimit.asyncio, 'sleep', fake_sleep)
+
+    limiter = DiscordRateLimiter()
+    route = limiter.route_key('GET', '/users/@me', 'Bearer token')
+    limiter.update(route, {
+        'X-RateLimit-Bucket': 'abc',
+        'X-RateLimit-Limit': '5',
+        'X-RateLimit-Remaining': '0',
+        'X-RateLimit-Reset-After': '2.5'
+    }, 200)
+
+    assert limiter.headroom()['exhausted_buckets'] == 1
+    assert await limiter.acquire(route) == 2.5
+    assert sleeps == [2.5]
+    assert limiter.headroom()['waits'] == 1
+
+
+async def test_global_rate_limit_blocks_every_route(monkeypatch):
+    """Глобальный 429 придерживает запросы по всем маршрутам."""
+    now = [0.0]
+
+    async def fake_sleep(seconds):
+        now[0] += seconds
+
+    monkeypatch.setattr(discord_ratelimit.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(discord_ratelimit.asyncio, 'sleep', fake_sleep)
+
+    limiter = DiscordRateLimiter()
+    limiter.update(limiter.route_key('GET', '/users/@me', 'a'), {'X-RateLimit-Global': 'true'}, 429, retry_after=1.5)
+
+    assert limiter.headroom()['global_blocked_for'] == 1.5
+    assert await limiter.acquire(limiter.route_key('GET', '/users/@me/guilds', 'b')) == 1.5
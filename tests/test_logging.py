@@ -0,0 +1,71 @@
+"""
+Тесты конвейера логирования
+"""
+
+import time
+import logging
+
+from bot import config as bot_config
+from bot.config import LogSamplingFilter, add_root_log_handlers, start_queue_logging
+
+
+def make_record(msg, level=logging.INFO):
+    return logging.LogRecord('auth', level, __file__, 1, msg, None, None)
+
+
+def test_sampling_filter_caps_repeated_messages():
+    """Одинаковый шаблон пропускается не чаще лимита, предупреждения - всегда."""
+    sampling = LogSamplingFilter(max_records=2, interval=60)
+
+    passed = [sampling.filter(make_record('[AUTH] Проверка %s')) for _ in range(5)]
+
+    assert passed == [True, True, False, False, False]
+    assert sampling.filter(make_record('[AUTH] Другое сообщение'))
+    assert sampling.filter(make_record('[AUTH] Проверка %s', logging.WARNING))
+    assert sampling.dropped == 3
+
+
+def test_queue_logging_writes_through_listener():
+    """Записи доходят до обработчиков через фоновый QueueListener."""
+    records = []
+
+    class ListHandler(logging.Handler):
+        def emit(self, record):
+            records.append(record.getMessage())
+
+    logger = logging.getLogger('test_queue_logging')
+    logger.propagate = False
+    listener = start_queue_logging(logger, [ListHandler()])
+
+    logger.warning("сообщение %d", 1)
+    bot_config._log_listeners.remove(listener)
+    listener.stop()
+
+    assert records == ['сообщение 1']
+
+
+def test_entry_points_share_root_pipeline():
+    """Сайт и бот добавляют свои файлы в один конвейер корневого логгера, не отключая друг друга."""
+    site_records, bot_records = [], []
+
+    class ListHandler(logging.Handler):
+        def __init__(self, records):
+            super().__init__()
+            self.records = records
+
+        def emit(self, record):
+            self.records.append(record.getMessage())
+
+    site_handler, bot_handler = ListHandler(site_records), ListHandler(bot_records)
+    listener = add_root_log_handlers([site_handler])
+    assert add_root_log_handlers([bot_handler]) is listener
+    try:
+        logging.getLogger('test_root_pipeline').warning("общая запись")
+        deadline = time.monotonic() + 2
+        while not (site_records and bot_records) and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        listener.handlers = tuple(h for h in listener.handlers if h not in (site_handler, bot_handler))
+
+    assert site_records == ['общая запись']
+    assert bot_records == ['общая запись']
@@ -0,0 +1,125 @@
+"""
+Тесты очереди исходящих задач
+"""
+
+import asyncio
+
+from outbox import Outbox, OutboxWorker, PermanentJobError, JOB_DONE, JOB_FAILED, JOB_PENDING
+
+
+def make_outbox(tmp_path):
+    return Outbox(str(tmp_path / 'outbox.db'))
+
+
+def test_enqueue_is_idempotent_by_key(tmp_path):
+    outbox = make_outbox(tmp_path)
+
+    job, created = outbox.enqueue('donation', {'amount': 100}, dedup_key='op-1')
+    again, created_again = outbox.enqueue('donation', {'amount': 100}, dedup_key='op-1')
+
+    assert created is True
+    assert created_again is False
+    assert again['id'] == job['id']
+    assert outbox.stats() == {JOB_PENDING: 1}
+
+
+async def test_worker_retries_with_backoff_then_completes(tmp_path):
+    """Неудачная задача повторяется после паузы, успешная сохраняет результат."""
+    outbox = make_outbox(tmp_path)
+    job, _ = outbox.enqueue('application', {'discord_id': '1'})
+    calls = []
+
+    async def handler(payload):
+        calls.append(payload)
+        if len(calls) == 1:
+            raise RuntimeError('бот недоступен')
+        return True
+
+    worker = OutboxWorker(outbox, {'application': handler}, base_delay=5)
+
+    assert await worker.run_once() == 1
+    stored = outbox.get(job['id'])
+    assert stored['state'] == JOB_PENDING
+    assert stored['last_error'] == 'бот недоступен'
+    assert stored['next_attempt_at'] > stored['updated_at'] + 4
+
+    # Пауза еще не прошла - задача не выполняется
+    assert await worker.run_once() == 0
+
+    # После паузы задача выполняется повторно
+    [due] = outbox.claim_due(now=stored['next_attempt_at'])
+    assert due['attempts'] == 2
+    await worker._execute(due)
+
+    stored = outbox.get(job['id'])
+    assert stored['state'] == JOB_DONE
+    assert stored['result'] is True
+    assert len(calls) == 2
+
+
+async def test_permanent_error_fails_job_and_notifies(tmp_path):
+    outbox = make_outbox(tmp_path)
+    job, _ = outbox.enqueue('application', {'discord_id': '1'})
+    failed = []
+
+    async def handler(payload):
+        raise PermanentJobError('неверные данные')
+
+    async def on_failed(failed_job, error):
+        failed.append((failed_job['id'], error))
+
+    worker = OutboxWorker(outbox, {'application': handler}, on_failed=on_failed)
+    await worker.run_once()
+
+    assert outbox.get(job['id'])['state'] == JOB_FAILED
+    assert failed == [(job['id'], 'неверные данные')]
+
+
+def test_prune_keeps_recent_and_pending_jobs(tmp_path):
+    outbox = make_outbox(tmp_path)
+    old, _ = outbox.enqueue('application', {})
+    pending, _ = outbox.enqueue('application', {})
+    outbox.complete(old['id'], True)
+
+    now = outbox.get(old['id'])['updated_at']
+    assert outbox.prune(retention=60, now=now + 30) == 0
+    assert outbox.prune(retention=60, now=now + 120) == 1
+    assert outbox.get(pending['id'])['state'] == JOB_PENDING
+    assert outbox.get(old['id']) is None
+
+
+def test_leased_job_is_claimed_once_until_lease_expires(tmp_path):
+    """Задачу выполняет один обработчик; после истечения аренды ее забирает другой."""
+    outbox = make_outbox(tmp_path)
+    job, _ = outbox.enqueue('application', {})
+    now = job['created_at']
+
+    claimed = outbox.claim_due(now=now, owner='worker-1', lease=60)
+    assert [item['id'] for item in claimed] == [job['id']]
+    assert outbox.claim_due(now=now + 30, owner='worker-2', lease=60) == []
+
+    reclaimed = outbox.claim_due(now=now + 61, owner='worker-2', lease=60)
+    assert reclaimed[0]['lease_owner'] == 'worker-2'
+    assert reclaimed[0]['attempts'] == 2
+
+    # Прежний владелец не может вернуть в очередь чужую задачу
+    outbox.release(job['id'], 'worker-1')
+    assert outbox.get(job['id'])['lease_owner'] == 'worker-2'
+    outbox.release(job['id'], 'worker-2')
+    assert outbox.get(job['id'])['state'] == JOB_PENDING
+
+
+async def test_worker_times_out_hung_job(tmp_path):
+    outbox = make_outbox(tmp_path)
+    job, _ = outbox.enqueue('application', {})
+
+    async def handler(payload):
+        await asyncio.sleep(10)
+
+    worker = OutboxWorker(outbox, {'application': handler}, job_timeout=0.01)
+    await worker.run_once()
+
+    stored = outbox.get(job['id'])
+    assert stored['state'] == JOB_PENDING
+    assert stored['lease_owner'] is None
+    assert 'не выполнена за' in stored['last_error']
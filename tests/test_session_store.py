@@ -0,0 +1,90 @@
+"""
+Тесты серверного хранилища сессий
+"""
+
+import pytest
+from quart import Quart, session
+
+from session_store import (
+    MemorySessionBackend,
+    SQLiteSessionBackend,
+    ServerSession,
+    ServerSessionInterface,
+)
+
+
+def test_session_loads_lazily():
+    """Хранилище не читается, пока к сессии не обратились."""
+    calls = []
+    server_session = ServerSession('sid', loader=lambda: calls.append(1) or {'user_id': '1'})
+
+    assert not server_session.loaded and calls == []
+    assert server_session['user_id'] == '1'
+    assert calls == [1] and not server_session.modified
+
+
+def test_unknown_session_id_is_replaced():
+    """Несуществующий ID из cookie не используется повторно."""
+    server_session = ServerSession('forged', loader=lambda: None)
+    server_session['user_id'] = '1'
+
+    assert server_session.sid != 'forged' and server_session.new
+
+
+def test_sqlite_backend_expiry(tmp_path):
+    """Истекшие сессии не загружаются и удаляются при проходе очистки."""
+    backend = SQLiteSessionBackend(str(tmp_path / 'sessions.db'))
+    backend.save('alive', {'a': 1}, expires_at=4102444800)
+    backend.save('old', {'a': 2}, expires_at=1)
+
+    assert backend.load('alive') == {'a': 1}
+    assert backend.load('old') is None
+    assert backend.delete_expired() == 1
+    assert backend.count() == 1
+
+
+async def test_cookie_holds_only_session_id():
+    """В cookie только ID, данные на сервере, неизмененная сессия не перезаписывается."""
+    backend = MemorySessionBackend()
+    app = Quart(__name__)
+    app.secret_key = 'test'
+    app.session_interface = ServerSessionInterface(backend)
+    saves = []
+    original_save = backend.save
+    backend.save = lambda *args: saves.append(args[0]) or original_save(*args)
+
+    @app.route('/login')
+    async def login():
+        session['access_token'] = 'secret-token'
+        return 'ok'
+
+    @app.route('/read')
+    async def read():
+        return session.get('access_token', '')
+
+    @app.route('/logout')
+    async def logout():
+        session.clear()
+        return 'ok'
+
+    client = app.test_client()
+    response = await client.get('/login')
+    cookie = response.headers['Set-Cookie']
+    assert 'secret-token' not in cookie and len(saves) == 1
+
+    response = await client.get('/read')
+    assert await response.get_data(as_text=True) == 'secret-token'
+    assert 'Set-Cookie' not in response.headers and len(saves) == 1
+
+    await client.get('/logout')
+    assert backend.count() == 0
+
+
+def test_regenerate_drops_previous_id():
+    """После regenerate данные сохраняются под новым ID, старый ID запоминается для удаления."""
+    server_session = ServerSession('before-login', loader=lambda: {'oauth_state': 'x'})
+    server_session.regenerate()
+
+    assert server_session.previous_sid == 'before-login'
+    assert server_session.sid != 'before-login'
+    assert server_session['oauth_state'] == 'x' and server_session.modified
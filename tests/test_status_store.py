@@ -0,0 +1,260 @@
+"""
+Тесты для хранилища статусов заявок
+"""
+
+import json
+import threading
+import time
+
+import pytest
+
+from status_store import StatusStore, CachedStatusStore, StatusWriter
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Хранилище во временной директории без миграции из JSON."""
+    return StatusStore(str(tmp_path / 'statuses.db'), legacy_json_path=None)
+
+
+def test_set_get_delete(store):
+    """Проверяем базовые операции со статусом."""
+    assert store.get('1') is None
+
+    store.set('1', 'pending')
+    store.set(2, 'rejected', 'Слишком короткая заявка')
+
+    assert store.get('1')['status'] == 'pending'
+    assert store.get('2') == {
+        'status': 'rejected',
+        'timestamp': store.get('2')['timestamp'],
+        'reason': 'Слишком короткая заявка'
+    }
+
+    assert store.delete('1') is True
+    assert store.delete('1') is False
+    assert store.get('1') is None
+
+
+def test_invalid_status_rejected(store):
+    """Неизвестный статус не сохраняется."""
+    with pytest.raises(ValueError):
+        store.set('1', 'unknown')
+
+
+def test_migrate_from_json_runs_once(tmp_path):
+    """Миграция из JSON выполняется только один раз."""
+    json_path = tmp_path / 'application_statuses.json'
+    json_path.write_text(json.dumps({
+        '10': {'status': 'candidate', 'timestamp': 1700000000.0, 'reason': ''},
+        '11': {'status': 'pending', 'timestamp': 1700000001.0}
+    }), encoding='utf-8')
+
+    store = StatusStore(str(tmp_path / 'statuses.db'), legacy_json_path=str(json_path))
+    assert store.get('10') == {'status': 'candidate', 'timestamp': 1700000000.0, 'reason': ''}
+    assert store.count() == 2
+
+    store.delete('10')
+    assert store.migrate_from_json(str(json_path)) == 0
+    assert store.get('10') is None
+
+
+def test_concurrent_writes_are_not_lost(store):
+    """Параллельные записи из разных потоков не теряют друг друга."""
+    def worker(offset):
+        for i in range(20):
+            store.set(f'{offset}-{i}', 'pending')
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert store.count() == 100
+
+
+def test_cached_store_counts_hits_and_misses(tmp_path):
+    """Повторное чтение статуса обслуживается из кэша."""
+    store = CachedStatusStore(str(tmp_path / 'statuses.db'), legacy_json_path=None)
+    store.set('1', 'pending')
+
+    assert store.get('1')['status'] == 'pending'
+    assert store.get('2') is None
+    assert store.get('2') is None
+
+    stats = store.cache_stats()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 1
+
+
+def test_cached_store_sees_writes_from_other_instance(tmp_path):
+    """Кэш сбрасывается, если базу изменил другой процесс."""
+    db_path = str(tmp_path / 'statuses.db')
+    cached = CachedStatusStore(db_path, legacy_json_path=None, check_interval=0)
+    other = StatusStore(db_path, legacy_json_path=None)
+
+    assert cached.get('1') is None
+    other.set('1', 'candidate')
+
+    assert cached.get('1')['status'] == 'candidate'
+    assert cached.cache_stats()['invalidations'] >= 1
+
+
+def test_cached_store_miss_does_not_overwrite_concurrent_write(tmp_path, monkeypatch):
+    """Строка, прочитанная до параллельной записи, не попадает в кэш."""
+    store = CachedStatusStore(str(tmp_path / 'statuses.db'), legacy_json_path=None)
+    store.set('1', 'pending')
+    store.invalidate()
+    read_row = StatusStore.get
+
+    def get_then_write(self, discord_id):
+        record = read_row(self, discord_id)
+        # Запись коммитится между чтением строки и заполнением кэша
+        monkeypatch.setattr(StatusStore, 'get', read_row)
+        store.set('1', 'approved')
+        return record
+
+    monkeypatch.setattr(StatusStore, 'get', get_then_write)
+
+    assert store.get('1')['status'] == 'pending'
+    assert store.get('1')['status'] == 'approved'
+
+
+def test_cached_store_own_write_does_not_hide_foreign_write(tmp_path):
+    """Своя запись после чужой сбрасывает кэш, а не закрепляет устаревшие строки."""
+    db_path = str(tmp_path / 'statuses.db')
+    cached = CachedStatusStore(db_path, legacy_json_path=None, check_interval=3600)
+    other = StatusStore(db_path, legacy_json_path=None)
+
+    assert cached.get('1') is None
+    other.set('1', 'candidate')
+    cached.set('2', 'pending')
+
+    assert cached.get('1')['status'] == 'candidate'
+    assert cached.get('2')['status'] == 'pending'
+
+
+def test_cached_store_is_bounded(tmp_path):
+    """Промахи по неизвестным ID не растят кэш без ограничения."""
+    store = CachedStatusStore(str(tmp_path / 'statuses.db'), legacy_json_path=None, max_size=2)
+    store.set('1', 'pending')
+    for discord_id in ('2', '3', '4'):
+        assert store.get(discord_id) is None
+
+    assert store.cache_stats()['size'] == 2
+    assert store.get('1')['status'] == 'pending'
+
+
+def test_journal_records_transitions(store):
+    """Каждый переход статуса попадает в журнал."""
+    store.set('1', 'pending')
+    store.set('1', 'candidate')
+    store.delete('1')
+    store.delete('1')
+
+    history = store.history('1')
+    assert [entry['status'] for entry in history] == ['pending', 'candidate', None]
+
+
+def test_trim_journal_keeps_latest_transitions(store):
+    """Очистка журнала оставляет последние переходы каждого заявителя."""
+    for _ in range(5):
+        store.set('1', 'pending')
+        store.set('1', 'candidate')
+    store.set('2', 'pending')
+
+    assert store.journal_excess(keep_per_user=2) == 8
+    assert store.trim_journal(threshold=100) == 0
+    removed = store.trim_journal(threshold=3, keep_per_user=2)
+
+    assert removed == 8
+    assert [entry['status'] for entry in store.history('1')] == ['pending', 'candidate']
+    assert len(store.history('2')) == 1
+    assert store.get('1')['status'] == 'candidate'
+    assert store.journal_excess(keep_per_user=2) == 0
+
+
+def test_status_writer_coalesces_updates(store):
+    """Изменения, пришедшие в одном окне, записываются одной пачкой."""
+    writer = StatusWriter(store, window=0.2)
+
+    futures = [writer.set(str(i), 'pending') for i in range(10)]
+    futures.append(writer.delete('3'))
+
+    results = [future.result(timeout=5) for future in futures]
+    assert results[0]['status'] == 'pending'
+    assert results[-1] is True
+    assert store.get('3') is None
+    assert store.count() == 9
+
+    metrics = writer.metrics()
+    assert metrics['operations'] == 11
+    assert metrics['max_batch_size'] > 1
+
+
+def test_get_many_and_version(store):
+    """Пакетное чтение возвращает статусы и версию из одного снимка."""
+    assert store.version() == 0
+    store.set('1', 'pending')
+    store.set('2', 'candidate')
+    store.delete('2')
+
+    version, statuses = store.get_many(['1', 2, '3', '1'])
+    assert version == store.version() == 3
+    assert list(statuses) == ['1', '2', '3']
+    assert statuses['1']['status'] == 'pending'
+    assert statuses['2'] is None and statuses['3'] is None
+
+
+def test_counts_follow_every_change(store):
+    """Счетчики по статусам обновляются при каждом изменении."""
+    store.set('1', 'pending')
+    store.set('2', 'pending')
+    store.set('2', 'candidate')
+    store.set('3', 'candidate')
+    store.delete('3')
+
+    counts = store.counts()
+    assert counts['pending'] == 1
+    assert counts['candidate'] == 1
+    assert counts['approved'] == 0
+
+
+def test_list_by_status_paginates(store):
+    """Keyset-пагинация проходит всю очередь без повторов."""
+    for i in range(7):
+        store.set(str(i), 'candidate')
+    store.set('x', 'pending')
+
+    seen = []
+    cursor = None
+    while True:
+        items, cursor = store.list_by_status('candidate', after=cursor, limit=3)
+        seen.extend(item['discord_id'] for item in items)
+        if cursor is None:
+            break
+
+    assert seen == [str(i) for i in range(7)]
+
+
+def test_expire_stale_removes_only_expired(tmp_path):
+    """Просроченные статусы удаляются, журналируются и публикуют событие."""
+    store = CachedStatusStore(str(tmp_path / 'statuses.db'), legacy_json_path=None)
+    store.set('old', 'pending')
+    store.set('kept', 'candidate')
+    store.set('done', 'approved')
+    assert store.get('old') is not None
+
+    events = []
+    store.add_listener(lambda event, discord_id, record: events.append((event, discord_id, record['status'])))
+
+    now = time.time() + 100
+    expired = store.expire_stale({'pending': 50, 'candidate': 0}, now=now)
+
+    assert [record['discord_id'] for record in expired] == ['old']
+    assert events == [('expired', 'old', 'pending')]
+    assert store.get('old') is None
+    assert store.get('kept') is not None and store.get('done') is not None
+    assert store.history('old')[-1]['reason'] == 'expired'
+    assert store.counts()['pending'] == 0
@@ -0,0 +1,122 @@
+"""
+Тесты синхронизации статусов заявок бота с сайтом
+"""
+
+from bot.utils.status_sync import LocalStatusSync, QueuedStatusSync, StatusOutbox
+from status_store import CachedStatusStore, StatusWriter
+
+
+async def test_local_status_sync_writes_through_status_writer(tmp_path):
+    """Локальная синхронизация пишет в хранилище через поток записи, не блокируя цикл."""
+    store = CachedStatusStore(str(tmp_path / 'statuses.db'), legacy_json_path=None)
+    sync = LocalStatusSync(StatusWriter(store, window=0))
+
+    assert await sync.update('1', 'candidate') is True
+    assert store.get('1')['status'] == 'candidate'
+
+    assert await sync.clear('1') is True
+    assert store.get('1') is None
+
+
+async def test_local_status_sync_reports_invalid_status(tmp_path):
+    store = CachedStatusStore(str(tmp_path / 'statuses.db'), legacy_json_path=None)
+    sync = LocalStatusSync(StatusWriter(store, window=0))
+
+    assert await sync.update('1', 'unknown') is False
+
+
+class FlakySite:
+    """Транспорт, имитирующий недоступный, а затем восстановившийся сайт."""
+
+    def __init__(self):
+        self.online = False
+        self.batches = []
+
+    async def send_batch(self, updates):
+        if not self.online:
+            return None
+        self.batches.append(updates)
+        return 200
+
+    async def close(self):
+        pass
+
+
+async def test_queued_status_sync_sends_latest_status_after_outage(tmp_path):
+    site = FlakySite()
+    sync = QueuedStatusSync(site, StatusOutbox(str(tmp_path / 'outbox.db')), batch_size=2)
+
+    await sync.update('1', 'candidate')
+    await sync.update('2', 'rejected', 'причина')
+    await sync.update('1', 'approved')
+    await sync.clear('3')
+    assert await sync.flush() is False
+    assert sync.outbox.count() == 3
+
+    # После перезапуска бота очередь сохраняется
+    sync.outbox = StatusOutbox(str(tmp_path / 'outbox.db'))
+    site.online = True
+    assert await sync.flush() is True
+    await sync.close()
+
+    sent = [(u['discord_id'], u['status']) for batch in site.batches for u in batch]
+    assert sent == [('2', 'rejected'), ('1', 'approved'), ('3', None)]
+    assert len(site.batches) == 2
+    assert sync.outbox.count() == 0
+
+
+async def test_status_outbox_keeps_update_replaced_during_send(tmp_path):
+    outbox = StatusOutbox(str(tmp_path / 'outbox.db'))
+    outbox.put('1', 'candidate')
+    in_flight = outbox.peek()
+
+    outbox.put('1', 'approved')
+    outbox.ack(in_flight)
+
+    assert [u['status'] for u in outbox.peek()] == ['approved']
+
+
+class StrictSite:
+    """Транспорт, отвергающий пачку целиком, если в ней есть недопустимый статус."""
+
+    def __init__(self, status=400):
+        self.status = status
+        self.batches = []
+
+    async def send_batch(self, updates):
+        if any(update['status'] == 'unknown' for update in updates):
+            return self.status
+        self.batches.append(updates)
+        return 200
+
+    async def close(self):
+        pass
+
+
+async def test_queued_status_sync_sets_aside_rejected_update(tmp_path):
+    """Отвергнутое сайтом изменение не блокирует остальные."""
+    site = StrictSite()
+    sync = QueuedStatusSync(site, StatusOutbox(str(tmp_path / 'outbox.db')))
+
+    await sync.update('1', 'candidate')
+    await sync.update('2', 'unknown')
+    await sync.update('3', 'approved')
+    assert await sync.flush() is True
+    await sync.close()
+
+    sent = [u['discord_id'] for batch in site.batches for u in batch]
+    assert sent == ['1', '3']
+    assert sync.outbox.count() == 0
+    rejected = sync.outbox._connection().execute(
+        "SELECT discord_id, http_status FROM rejected_status_updates").fetchall()
+    assert [tuple(row) for row in rejected] == [('2', 400)]
+
+
+async def test_queued_status_sync_retries_rate_limited_batch(tmp_path):
+    site = StrictSite(status=429)
+    sync = QueuedStatusSync(site, StatusOutbox(str(tmp_path / 'outbox.db')))
+
+    await sync.update('1', 'unknown')
+    assert await sync.flush() is False
+    await sync.close()
+    assert sync.outbox.count() == 1
@@ -0,0 +1,44 @@
+"""
+Тесты рассылки событий пользователям сайта
+"""
+
+import asyncio
+import threading
+
+from user_events import UserEventHub, format_sse
+
+
+def test_format_sse():
+    assert format_sse('permissions', {'is_admin': True}) == 'event: permissions\ndata: {"is_admin": true}\n\n'
+    assert format_sse(None) == ': ping\n\n'
+
+
+async def test_publish_from_other_thread_reaches_subscribers():
+    """События из фонового потока доставляются всем вкладкам пользователя."""
+    hub = UserEventHub()
+    first = hub.subscribe('1')
+    second = hub.subscribe('1')
+    other = hub.subscribe('2')
+
+    thread = threading.Thread(target=hub.publish, args=('1', 'application_status', {'status': 'approved'}))
+    thread.start()
+    thread.join()
+
+    assert await asyncio.wait_for(first.get(), 1) == ('application_status', {'status': 'approved'})
+    assert await asyncio.wait_for(second.get(), 1) == ('application_status', {'status': 'approved'})
+    assert other.empty()
+
+    hub.unsubscribe('1', first)
+    hub.unsubscribe('1', second)
+    assert hub.subscriber_count() == 1
+
+
+async def test_slow_subscriber_keeps_latest_events():
+    """Переполненная очередь теряет старые события, а не новые."""
+    hub = UserEventHub(queue_size=2)
+    queue = hub.subscribe('1')
+
+    for status in ('pending', 'candidate', 'approved'):
+        hub.publish('1', 'application_status', {'status': status})
+
+    assert [queue.get_nowait()[1]['status'] for _ in range(2)] == ['candidate', 'approved']
@@ -0,0 +1,136 @@
+"""
+Серверное хранилище OAuth токенов Discord
+
+Хранит access_token, refresh_token и время истечения по user_id, чтобы
+токен можно было обновить без повторного входа пользователя.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TOKEN_DB_PATH = os.path.join(BASE_DIR, 'data', 'oauth_tokens.db')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS oauth_tokens (
+    user_id TEXT PRIMARY KEY,
+    access_token TEXT NOT NULL,
+    refresh_token TEXT,
+    expires_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class TokenStore:
+    """Хранилище OAuth токенов пользователей на базе SQLite."""
+
+    def __init__(self, db_path: str = DEFAULT_TOKEN_DB_PATH):
+        """
+        Инициализация хранилища.
+
+        Args:
+            db_path: Путь к файлу базы данных
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Возвращает соединение текущего потока."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, user_id) -> Optional[Dict[str, Any]]:
+        """
+        Получает токены пользователя.
+
+        Args:
+            user_id: Discord ID пользователя
+
+        Returns:
+            dict: access_token, refresh_token, expires_at или None
+        """
+        row = self._connection().execute(
+            "SELECT access_token, refresh_token, expires_at FROM oauth_tokens WHERE user_id = ?",
+            (str(user_id),)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def save(self, user_id, token_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Сохраняет ответ token endpoint Discord.
+
+        Args:
+            user_id: Discord ID пользователя
+            token_data: Ответ Discord (access_token, refresh_token, expires_in)
+
+        Returns:
+            dict: Сохраненные токены
+        """
+        now = time.time()
+        record = {
+            'access_token': token_data['access_token'],
+            'refresh_token': token_data.get('refresh_token'),
+            'expires_at': now + float(token_data.get('expires_in', 0))
+        }
+        self._connection().execute(
+            "INSERT INTO oauth_tokens (user_id, access_token, refresh_token, expires_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?) ON CONFLICT(user_id) DO UPDATE SET "
+            "access_token = excluded.access_token, refresh_token = excluded.refresh_token, "
+            "expires_at = excluded.expires_at, updated_at = excluded.updated_at",
+            (str(user_id), record['access_token'], record['refresh_token'], record['expires_at'], now)
+        )
+        return record
+
+    def delete(self, user_id, refresh_token: Optional[str] = None) -> bool:
+        """
+        Удаляет токены пользователя (например, после отзыва доступа).
+
+        Args:
+            user_id: Discord ID пользователя
+            refresh_token: Удалить, только если сохранен этот refresh token. Если
+                другой процесс уже обновил токены, новые токены не удаляются
+
+        Returns:
+            bool: True если токены удалены
+        """
+        if refresh_token is None:
+            cursor = self._connection().execute("DELETE FROM oauth_tokens WHERE user_id = ?", (str(user_id),))
+        else:
+            cursor = self._connection().execute(
+                "DELETE FROM oauth_tokens WHERE user_id = ? AND refresh_token = ?",
+                (str(user_id), refresh_token)
+            )
+        return cursor.rowcount > 0
+
+
+# Глобальный экземпляр хранилища
+_token_store_instance = None
+_token_store_lock = threading.Lock()
+
+
+def get_token_store() -> TokenStore:
+    """Получает глобальный экземпляр хранилища токенов."""
+    global _token_store_instance
+    if _token_store_instance is None:
+        with _token_store_lock:
+            if _token_store_instance is None:
+                _token_store_instance = TokenStore(os.environ.get('OAUTH_TOKEN_DB', DEFAULT_TOKEN_DB_PATH))
+    return _token_store_instance
@@ -0,0 +1,130 @@
+"""
+Рассылка событий пользователям сайта (Server-Sent Events)
+
+Бот и хранилище статусов публикуют события (изменились роли, изменился
+статус заявки), а открытые вкладки пользователя получают их через поток
+/api/events без периодического опроса сервера.
+"""
+
+import json
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Максимум непрочитанных событий одного подписчика; медленные вкладки теряют старые события
+SUBSCRIBER_QUEUE_SIZE = 32
+# Интервал комментариев-пингов в потоке, чтобы прокси не закрывали соединение (секунды)
+SSE_HEARTBEAT_INTERVAL = 25
+# Пауза перед переподключением браузера после обрыва (миллисекунды)
+SSE_RETRY_MS = 5000
+
+
+def format_sse(event: Optional[str], data: Any = None) -> str:
+    """
+    Форматирует одно сообщение потока Server-Sent Events.
+
+    Args:
+        event: Имя события (None - комментарий-пинг)
+        data: Данные события, сериализуются в JSON
+
+    Returns:
+        str: Сообщение в формате text/event-stream
+    """
+    if event is None:
+        return ": ping\n\n"
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class UserEventHub:
+    """
+    Подписки вкладок на события пользователей.
+
+    Подписки живут в цикле событий сайта; публиковать события можно из
+    любого потока (например, из потока записи хранилища статусов).
+    """
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def subscribe(self, user_id) -> asyncio.Queue:
+        """
+        Подписывает вкладку на события пользователя. Вызывается из цикла событий сайта.
+
+        Args:
+            user_id: Discord ID пользователя
+
+        Returns:
+            asyncio.Queue: Очередь событий (event, data)
+        """
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(str(user_id), set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id, queue: asyncio.Queue):
+        """Отписывает вкладку от событий пользователя."""
+        key = str(user_id)
+        with self._lock:
+            queues = self._subscribers.get(key)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[key]
+
+    def publish(self, user_id, event: str, data: Dict[str, Any]):
+        """
+        Отправляет событие всем вкладкам пользователя. Безопасно вызывать из любого потока.
+
+        Args:
+            user_id: Discord ID пользователя
+            event: Имя события
+            data: Данные события
+        """
+        with self._lock:
+            queues = list(self._subscribers.get(str(user_id), ()))
+        if not queues or self._loop is None or self._loop.is_closed():
+            return
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is self._loop:
+            self._deliver(queues, event, data)
+        else:
+            self._loop.call_soon_threadsafe(self._deliver, queues, event, data)
+
+    @staticmethod
+    def _deliver(queues, event: str, data: Dict[str, Any]):
+        for queue in queues:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait((event, data))
+
+    def subscriber_count(self) -> int:
+        """Возвращает число открытых подписок."""
+        with self._lock:
+            return sum(len(queues) for queues in self._subscribers.values())
+
+
+# Глобальный экземпляр
+_hub_instance = None
+_hub_lock = threading.Lock()
+
+
+def get_user_event_hub() -> UserEventHub:
+    """Получает глобальный экземпляр рассылки событий."""
+    global _hub_instance
+    if _hub_instance is None:
+        with _hub_lock:
+            if _hub_instance is None:
+                _hub_instance = UserEventHub()
+    return _hub_instance